@@ -1,7 +1,16 @@
+import os
+import sys
+import threading
+import time
+
+# Shared helpers (thread budget, instrumentation) live at the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import runtime_config
+
+# transformers would otherwise import TensorFlow (installed for the progress model): seconds of startup, ~400 MB
+os.environ.setdefault('USE_TF', '0')
+
 import torch
-import torchaudio
-import io
-import numpy as np
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from transformers import AutoConfig, Wav2Vec2Processor
@@ -9,40 +18,118 @@ from transformers import AutoConfig, Wav2Vec2Processor
 # --- Imports from your existing files ---
 import config as conf
 from model import Wav2Vec2ForSpeechClassification as Model
+from optimized import load_optimized_model
+from embedding_cache import EmbeddingCache, audio_hash, encoder_namespace
+import audio_frontend
+import model_bundle
+
+import instrumentation as metrics
+metrics.init('voice_api_server')
 
 # --- 1. Initialize Flask App ---
 app = Flask(__name__)
 CORS(app)  # Enable cross-origin requests
 
-# --- 2. Load Model and Processor (do this only once) ---
+# --- 2. Configure CPU threading (must happen before the first forward pass) ---
+# The shared budget first; explicit VOICE_*_THREADS settings override it
+runtime_config.configure(torch_threads=conf.intra_op_threads, torch_interop_threads=conf.inter_op_threads)
+inference_slots = threading.BoundedSemaphore(max(1, conf.max_concurrent_requests))
+print(f"Torch threads: intra_op={torch.get_num_threads()}, inter_op={torch.get_num_interop_threads()}, "
+      f"max_concurrent={conf.max_concurrent_requests}, inference_mode={conf.use_inference_mode}")
+
+
+def inference_context():
+    return torch.inference_mode() if conf.use_inference_mode else torch.no_grad()
+
+
+# --- 3. Load Model and Processor (do this only once) ---
 try:
     # This path should point to your trained model checkpoint folder
     exp_name = './asd_model' # Make sure this is the correct path to your model
     print(f"Loading model from: {exp_name}")
     
-    config = AutoConfig.from_pretrained(exp_name)
-    model = Model.from_pretrained(exp_name, config=config).to(conf.device)
-    processor = Wav2Vec2Processor.from_pretrained(conf.model_name) # Uses 'facebook/wav2vec2-base-960h' from conf.py
+    # A bundle from model_bundle.py loads offline, with its weights memory-mapped
+    use_bundle = model_bundle.is_bundle(conf.model_bundle_dir)
+    stale = use_bundle and model_bundle.stale_reason(conf.model_bundle_dir, exp_name)
+    if stale:
+        # Retrained after the bundle was built: serve the checkpoint's weights, not the bundle's.
+        # The bundled processor is still used; retraining does not change it
+        print(f"Ignoring the weights in bundle {conf.model_bundle_dir}: {stale}; "
+              f"rebuild it with model_bundle.py create")
+    load_started = time.perf_counter()
+    with metrics.timer('model_load'):
+        if conf.inference_backend == 'pytorch' and use_bundle and not stale and conf.device.type == 'cpu':
+            exp_name = conf.model_bundle_dir
+            print(f"Loading memory-mapped bundle from: {exp_name}")
+            model = model_bundle.load_model(exp_name)
+        elif conf.inference_backend == 'pytorch':
+            config = AutoConfig.from_pretrained(exp_name)
+            model = Model.from_pretrained(exp_name, config=config).to(conf.device)
+            model.eval() # Set model to evaluation mode
+        else:
+            # Serve the int8/ONNX artifact produced by export_model.py (CPU only)
+            print(f"Using optimized '{conf.inference_backend}' model from: {conf.optimized_model_dir}")
+            model = load_optimized_model(conf.optimized_model_dir, conf.inference_backend)
+        if use_bundle:
+            processor = model_bundle.load_processor(conf.model_bundle_dir)
+        else:
+            processor = Wav2Vec2Processor.from_pretrained(conf.model_name) # Uses 'facebook/wav2vec2-base-960h' from conf.py
+    print(f"Model and processor loaded in {time.perf_counter() - load_started:.2f}s (weights {exp_name}, "
+          f"{'bundle ' + conf.model_bundle_dir if use_bundle else 'hub processor ' + conf.model_name})")
     
-    model.eval() # Set model to evaluation mode
+    # When the processor only normalizes, the tensor front-end can replace it entirely
+    skip_processor = bool(getattr(processor.feature_extractor, 'do_normalize', False))
+
+    # Embeddings are only available from the PyTorch model (exports end at the logits)
+    embedding_cache = None
+    if conf.inference_backend == 'pytorch' and conf.embedding_cache_enabled:
+        embedding_cache = EmbeddingCache(conf.embedding_cache_dir,
+                                         encoder_namespace(model, exp_name, conf.embedding_cache_dir))
     print("Model loaded successfully!")
 
 except Exception as e:
     print(f"Error loading model: {e}")
     model = None # Set model to None if loading fails
+    skip_processor = False
+    embedding_cache = None
 
-# --- 3. Define the Prediction Function (adapted from your utils.py) ---
-def predict_voice_prob(waveform):
-    if model is None:
-        raise RuntimeError("Model is not loaded. Cannot perform prediction.")
-        
+# --- 4. Define the Prediction Functions (adapted from your utils.py) ---
+def to_input_values(waveform, normalized=False):
+    if normalized:
+        # Already a normalized float32 tensor from audio_frontend; no processor round-trip
+        return waveform if waveform.ndim == 2 else waveform.unsqueeze(0)
     # Process the audio waveform
     features = processor(waveform, sampling_rate=conf.sampling_rate, return_tensors="pt", padding=True)
-    input_values = features.input_values.to(conf.device)
+    return features.input_values
+
 
-    with torch.no_grad():
-        logits = model(input_values).logits
+def get_embedding(input_values):
+    """Pooled encoder embedding for one clip, served from the disk cache when possible.
 
+    Returns (embedding array of shape (1, hidden_size), audio hash, cache_hit).
+    """
+    key = audio_hash(input_values)
+    if embedding_cache is not None:
+        cached = embedding_cache.get(key)
+        if cached is not None:
+            metrics.inc('embedding_cache_total', result='hit')
+            return cached, key, True
+        metrics.inc('embedding_cache_total', result='miss')
+
+    with inference_context(), metrics.timer('inference', part='encoder'):
+        embedding = model(input_values.to(conf.device), return_feature=True).cpu().numpy()
+    if embedding_cache is not None:
+        embedding_cache.put(key, embedding)
+    return embedding, key, False
+
+
+def score_embedding(embedding):
+    """Head-only scoring of a cached or freshly computed embedding."""
+    with inference_context(), metrics.timer('inference', part='head'):
+        return model.classify_features(torch.from_numpy(embedding).to(conf.device))
+
+
+def scores_to_result(logits):
     # Get probabilities
     scores = torch.nn.functional.softmax(logits, dim=1)
     
@@ -56,43 +143,177 @@ def predict_voice_prob(waveform):
         "confidence": autistic_confidence
     }
 
-# --- 4. Create the API Endpoint ---
+
+def predict_voice_prob(waveform, normalized=False):
+    if model is None:
+        raise RuntimeError("Model is not loaded. Cannot perform prediction.")
+        
+    input_values = to_input_values(waveform, normalized)
+
+    if conf.inference_backend != 'pytorch':
+        with inference_context(), metrics.timer('inference', part='full'):
+            return scores_to_result(model(input_values))
+
+    embedding, key, cache_hit = get_embedding(input_values)
+    result = scores_to_result(score_embedding(embedding))
+    result.update({"audio_hash": key, "embedding_cached": cache_hit})
+    return result
+
+
+def read_upload_input_values():
+    """Decode the uploaded 'audio_file' into model input_values, or None if missing.
+
+    Returns (input_values, trim stats from audio_frontend.trim_silence).
+    """
+    if 'audio_file' not in request.files:
+        return None, None
+    with metrics.timer('decode'):
+        # Decode, downmix and resample (cached resampler per source rate)
+        waveform = audio_frontend.load_waveform(request.files['audio_file'].read())
+    with metrics.timer('vad'):
+        # Silence is cut before normalization so its statistics come from speech
+        waveform, trim = audio_frontend.trim_silence(waveform)
+    metrics.observe('audio_seconds', trim['original_s'], part='original')
+    metrics.observe('audio_seconds', trim['kept_s'], part='kept')
+    with metrics.timer('normalize'):
+        if skip_processor:
+            return audio_frontend.normalize(waveform).unsqueeze(0), trim
+        return to_input_values(waveform.numpy()), trim
+
+
+def embeddings_unavailable():
+    if model is None:
+        return jsonify({"error": "Model is not loaded."}), 503
+    if conf.inference_backend != 'pytorch':
+        return jsonify({"error": "Embeddings require VOICE_INFERENCE_BACKEND=pytorch."}), 501
+    return None
+
+# --- 5. Create the API Endpoints ---
 @app.route("/predict-voice", methods=["POST"])
 def handle_prediction():
     if 'audio_file' not in request.files:
         return jsonify({"error": "No audio file provided"}), 400
 
-    audio_file = request.files['audio_file']
-    
     try:
-        # Read bytes and load with torchaudio
-        file_bytes = audio_file.read()
-        waveform, sr = torchaudio.load(io.BytesIO(file_bytes))
-        
-        # Convert to mono if multi-channel
-        if waveform.ndim > 1:
-            waveform = waveform.mean(dim=0)
-        else:
-            waveform = waveform.squeeze(0)
-        
-        # Resample if needed
-        if sr != conf.sampling_rate:
-            resampler = torchaudio.transforms.Resample(sr, conf.sampling_rate)
-            waveform = resampler(waveform.unsqueeze(0)).squeeze(0)
+        input_values, trim = read_upload_input_values()
         
-        # Convert to numpy for the processor
-        waveform = waveform.numpy()
-        
-        # Get prediction
-        result = predict_voice_prob(waveform)
+        # Get prediction (bounded number of concurrent forward passes)
+        with metrics.timer('queue_wait'):
+            acquired = inference_slots.acquire(timeout=conf.request_queue_timeout)
+        if not acquired:
+            metrics.inc('requests_total', endpoint='predict-voice', status='busy')
+            return jsonify({"error": "Server busy, please retry."}), 503
+        try:
+            result = predict_voice_prob(input_values, normalized=True)
+        finally:
+            inference_slots.release()
         
+        result["audio_trim"] = trim
+        metrics.inc('requests_total', endpoint='predict-voice', status='ok')
         return jsonify(result)
 
     except Exception as e:
         print(f"An error occurred during prediction: {e}")
+        metrics.inc('requests_total', endpoint='predict-voice', status='error')
         return jsonify({"error": "Failed to process audio file."}), 500
 
-# --- 5. Run the Server ---
+@app.route("/embed-voice", methods=["POST"])
+def handle_embedding():
+    error = embeddings_unavailable()
+    if error:
+        return error
+    if 'audio_file' not in request.files:
+        return jsonify({"error": "No audio file provided"}), 400
+
+    try:
+        input_values, trim = read_upload_input_values()
+        if not inference_slots.acquire(timeout=conf.request_queue_timeout):
+            return jsonify({"error": "Server busy, please retry."}), 503
+        try:
+            embedding, key, cache_hit = get_embedding(input_values)
+        finally:
+            inference_slots.release()
+        return jsonify({"audio_hash": key, "embedding": embedding[0].tolist(), "embedding_cached": cache_hit,
+                        "audio_trim": trim})
+
+    except Exception as e:
+        print(f"An error occurred during embedding: {e}")
+        return jsonify({"error": "Failed to process audio file."}), 500
+
+@app.route("/rescore-voice", methods=["POST"])
+def handle_rescore():
+    """Score a previously seen recording by hash using only the classification head."""
+    error = embeddings_unavailable()
+    if error:
+        return error
+    key = (request.get_json(silent=True) or {}).get("audio_hash")
+    if not key:
+        return jsonify({"error": "audio_hash is required"}), 400
+    embedding = embedding_cache.get(key) if embedding_cache is not None else None
+    if embedding is None:
+        return jsonify({"error": "No cached embedding for this audio_hash"}), 404
+
+    # Head-only, but still a forward pass: it counts against VOICE_MAX_CONCURRENT like /predict-voice
+    with metrics.timer('queue_wait'):
+        acquired = inference_slots.acquire(timeout=conf.request_queue_timeout)
+    if not acquired:
+        metrics.inc('requests_total', endpoint='rescore-voice', status='busy')
+        return jsonify({"error": "Server busy, please retry."}), 503
+    try:
+        result = scores_to_result(score_embedding(embedding))
+    finally:
+        inference_slots.release()
+    result.update({"audio_hash": key, "embedding_cached": True})
+    metrics.inc('requests_total', endpoint='rescore-voice', status='ok')
+    return jsonify(result)
+
+@app.route("/similar-voice", methods=["POST"])
+def handle_similar():
+    """Nearest cached recordings by cosine similarity, for an upload or a known audio_hash."""
+    error = embeddings_unavailable()
+    if error:
+        return error
+    if embedding_cache is None:
+        return jsonify({"error": "Embedding cache is disabled."}), 501
+
+    try:
+        body = request.get_json(silent=True) or {}
+        top_k = int(request.form.get("top_k", body.get("top_k", 5)))
+        if 'audio_file' in request.files:
+            input_values = read_upload_input_values()[0]
+            if not inference_slots.acquire(timeout=conf.request_queue_timeout):
+                return jsonify({"error": "Server busy, please retry."}), 503
+            try:
+                embedding, key, _ = get_embedding(input_values)
+            finally:
+                inference_slots.release()
+        elif body.get("audio_hash"):
+            key = body["audio_hash"]
+            embedding = embedding_cache.get(key)
+            if embedding is None:
+                return jsonify({"error": "No cached embedding for this audio_hash"}), 404
+        else:
+            return jsonify({"error": "Provide audio_file or audio_hash"}), 400
+
+        matches = embedding_cache.most_similar(embedding, top_k=top_k, exclude=key)
+        return jsonify({"audio_hash": key, "matches": [{"audio_hash": k, "similarity": round(v, 6)} for k, v in matches]})
+
+    except Exception as e:
+        print(f"An error occurred during similarity lookup: {e}")
+        return jsonify({"error": "Failed to process request."}), 500
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    if request.args.get("format") == "json":
+        return jsonify(metrics.export_json())
+    return metrics.export_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+@app.route("/health", methods=["GET"])
+def health():
+    return jsonify({"status": "ok" if model is not None else "model_not_loaded", "backend": conf.inference_backend})
+
+# --- 6. Run the Server ---
 if __name__ == "__main__":
+    # Set VOICE_INFERENCE_BACKEND=torchscript|onnx to serve the optimized model (see config.py)
     # Run on a different port than your React app, e.g., 5001
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
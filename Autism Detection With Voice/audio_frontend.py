@@ -0,0 +1,127 @@
+"""
+Audio front-end for voice uploads: decode, mono downmix, resample and normalize
+entirely on torch tensors.
+
+Resamplers are cached per source rate so the sinc kernel is only built once per
+rate instead of once per request. `normalize` reproduces the zero-mean /
+unit-variance step of Wav2Vec2FeatureExtractor (do_normalize=True), so its
+output can be fed to the model without the processor's NumPy round-trip.
+
+`trim_silence` is an energy-based voice activity stage run before
+normalization: frames quieter than the clip's own speech level (and its noise
+floor) are dropped at the edges, or also inside the clip in 'compact' mode,
+so the encoder only sees the part of the recording that holds speech.
+"""
+import functools
+import io
+
+import torch
+import torchaudio
+
+import config as conf
+
+# Same epsilon Wav2Vec2FeatureExtractor.zero_mean_unit_var_norm uses
+NORM_EPS = 1e-7
+
+
+@functools.lru_cache(maxsize=16)
+def get_resampler(orig_freq, new_freq=conf.sampling_rate):
+    """Cached Resample transform; the module holds no per-call state so it is safe to share."""
+    return torchaudio.transforms.Resample(orig_freq, new_freq)
+
+
+def decode(file_bytes):
+    """Decode an uploaded audio file into a (channels, samples) float32 tensor and its sample rate."""
+    waveform, sr = torchaudio.load(io.BytesIO(file_bytes))
+    return waveform.to(torch.float32), sr
+
+
+def to_mono(waveform):
+    if waveform.ndim > 1:
+        return waveform.mean(dim=0)
+    return waveform
+
+
+def resample(waveform, sr, target_sr=conf.sampling_rate):
+    if sr == target_sr:
+        return waveform
+    return get_resampler(sr, target_sr)(waveform.unsqueeze(0)).squeeze(0)
+
+
+def normalize(waveform):
+    """Zero-mean, unit-variance normalization matching the wav2vec2 feature extractor."""
+    mean = waveform.mean()
+    var = waveform.var(unbiased=False)
+    return (waveform - mean) / torch.sqrt(var + NORM_EPS)
+
+
+def frame_energy_db(waveform, frame):
+    """Mean power of each `frame`-sample frame in dB (the last frame is zero-padded)."""
+    pad = (-waveform.numel()) % frame
+    frames = torch.nn.functional.pad(waveform, (0, pad)).view(-1, frame)
+    return 10.0 * torch.log10(frames.pow(2).mean(dim=1) + 1e-10)
+
+
+def speech_segments(energy_db, threshold_db, margin_db, padding, min_silence):
+    """[(start_frame, end_frame)] of speech, each widened by `padding` frames and
+    merged across gaps shorter than `min_silence` frames."""
+    floor = torch.quantile(energy_db, 0.1).item()
+    cutoff = max(energy_db.max().item() + threshold_db, floor + margin_db)
+    mask = (energy_db > cutoff).float().view(1, 1, -1)
+    if padding:
+        mask = torch.nn.functional.max_pool1d(mask, 2 * padding + 1, stride=1, padding=padding)
+    edges = torch.diff(mask.view(-1).int(), prepend=torch.zeros(1, dtype=torch.int),
+                       append=torch.zeros(1, dtype=torch.int))
+    starts = torch.nonzero(edges == 1).view(-1).tolist()
+    ends = torch.nonzero(edges == -1).view(-1).tolist()
+    segments = []
+    for start, end in zip(starts, ends):
+        if segments and start - segments[-1][1] < min_silence:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return segments
+
+
+def trim_silence(waveform, mode=conf.vad_mode, sr=conf.sampling_rate, threshold_db=conf.vad_threshold_db,
+                 margin_db=conf.vad_noise_margin_db, frame_ms=conf.vad_frame_ms, padding_ms=conf.vad_padding_ms,
+                 min_silence_ms=conf.vad_min_silence_ms, min_speech_ms=conf.vad_min_speech_ms):
+    """Drop non-speech audio from a mono waveform.
+
+    Returns (waveform, stats) where stats reports the mode and the original,
+    kept and removed seconds. The input is returned unchanged when mode is 'off'
+    or less than `min_speech_ms` of speech is found (nothing to trim safely).
+    """
+    original_s = waveform.numel() / sr
+    stats = {'mode': mode, 'original_s': round(original_s, 3), 'kept_s': round(original_s, 3), 'removed_s': 0.0}
+    if mode == 'off' or waveform.numel() == 0:
+        return waveform, stats
+    if mode not in ('trim', 'compact'):
+        raise ValueError(f"Unknown VAD mode '{mode}' (expected off, trim or compact)")
+
+    frame = max(1, int(sr * frame_ms / 1000))
+    segments = speech_segments(frame_energy_db(waveform, frame), threshold_db, margin_db,
+                               padding=int(padding_ms / frame_ms), min_silence=int(min_silence_ms / frame_ms))
+    if mode == 'trim' and segments:
+        segments = [(segments[0][0], segments[-1][1])]
+    kept = sum(end - start for start, end in segments) * frame
+    if kept < sr * min_speech_ms / 1000:
+        stats['speech_found'] = False
+        return waveform, stats
+
+    pieces = [waveform[start * frame:end * frame] for start, end in segments]
+    trimmed = pieces[0] if len(pieces) == 1 else torch.cat(pieces)
+    kept_s = trimmed.numel() / sr
+    stats.update(kept_s=round(kept_s, 3), removed_s=round(original_s - kept_s, 3), segments=len(segments))
+    return trimmed, stats
+
+
+def load_waveform(file_bytes):
+    """Decode bytes into a mono float32 waveform at conf.sampling_rate."""
+    waveform, sr = decode(file_bytes)
+    return resample(to_mono(waveform), sr)
+
+
+def prepare_input_values(file_bytes):
+    """Decode, downmix, resample and normalize; returns model-ready input_values of shape (1, samples)."""
+    return normalize(load_waveform(file_bytes)).unsqueeze(0)
@@ -0,0 +1,101 @@
+"""
+Benchmark the voice upload front-end at common source rates.
+
+Compares the previous per-request path (new Resample per call, NumPy round-trip
+through Wav2Vec2Processor) with audio_frontend (cached resampler, tensor
+normalization). Inputs are synthetic 16-bit PCM WAV files built in memory.
+
+Usage:
+    python bench_audio_frontend.py --seconds 10 --repeats 20
+"""
+import argparse
+import io
+import statistics
+import time
+import wave
+
+import numpy as np
+import torch
+import torchaudio
+
+import audio_frontend
+import config as conf
+
+RATES = [8000, 22050, 44100, 48000]
+
+
+def make_wav_bytes(sr, seconds, channels=1, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sr * seconds)) / sr
+    signal = 0.4 * np.sin(2 * np.pi * 220.0 * t) + 0.05 * rng.standard_normal(t.shape)
+    pcm = (np.clip(signal, -1.0, 1.0) * 32767).astype('<i2')
+    pcm = np.repeat(pcm[:, None], channels, axis=1)
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def numpy_normalize(x):
+    return (x - x.mean()) / np.sqrt(x.var() + audio_frontend.NORM_EPS)
+
+
+def legacy_path(file_bytes, processor):
+    waveform, sr = torchaudio.load(io.BytesIO(file_bytes))
+    waveform = waveform.mean(dim=0) if waveform.ndim > 1 else waveform.squeeze(0)
+    if sr != conf.sampling_rate:
+        resampler = torchaudio.transforms.Resample(sr, conf.sampling_rate)
+        waveform = resampler(waveform.unsqueeze(0)).squeeze(0)
+    waveform = waveform.numpy()
+    if processor is not None:
+        return processor(waveform, sampling_rate=conf.sampling_rate, return_tensors="pt", padding=True).input_values
+    return torch.from_numpy(numpy_normalize(waveform)).unsqueeze(0)
+
+
+def cached_path(file_bytes):
+    return audio_frontend.prepare_input_values(file_bytes)
+
+
+def time_ms(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cached vs. per-request audio front-end.")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--no-processor", action="store_true", help="Use a NumPy stand-in instead of Wav2Vec2Processor")
+    args = parser.parse_args()
+
+    processor = None
+    if not args.no_processor:
+        try:
+            from transformers import Wav2Vec2Processor
+            processor = Wav2Vec2Processor.from_pretrained(conf.model_name)
+        except Exception as e:
+            print(f"Processor unavailable ({e}); using NumPy normalization for the legacy path")
+
+    print(f"{args.seconds:.0f}s clips, {args.channels} channel(s), median of {args.repeats} runs")
+    print(f"{'rate':>7s} {'legacy_ms':>10s} {'cached_ms':>10s} {'speedup':>8s} {'max_abs_diff':>13s}")
+    for sr in RATES:
+        data = make_wav_bytes(sr, args.seconds, channels=args.channels)
+        audio_frontend.get_resampler.cache_clear()
+        cached_path(data)  # first call builds and caches the resampler, as the first request would
+
+        legacy = time_ms(lambda: legacy_path(data, processor), args.repeats)
+        cached = time_ms(lambda: cached_path(data), args.repeats)
+        diff = (legacy_path(data, processor) - cached_path(data)).abs().max().item()
+        print(f"{sr:>7d} {legacy:>10.2f} {cached:>10.2f} {legacy / max(cached, 1e-6):>7.2f}x {diff:>13.2e}")
+
+
+if __name__ == "__main__":
+    main()
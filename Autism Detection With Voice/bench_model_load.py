@@ -0,0 +1,110 @@
+"""
+Startup time and memory of the voice model: checkpoint + hub processor vs. memory-mapped bundle.
+
+Each mode runs in --workers fresh processes started together (as a multi-worker
+server would), which load the model and processor, score one clip and report:
+
+    import_s        torch + transformers import (the same for both modes)
+    load_s          model + processor load time
+    first_call_ms   first forward pass (mmap pages are faulted in here)
+    private_mb      memory only this process holds (Private_Clean + Private_Dirty)
+    pss_mb          proportional share: shared pages are split between the workers
+
+The bundle's weights are file-backed pages shared by every worker whatever the
+transformers version; how much of a checkpoint's weights end up copied into
+private memory depends on the installed transformers. The 'checkpoint' mode
+needs the processor from --processor (hub id or local folder); the logits of
+both modes are compared.
+
+Usage:
+    python bench_model_load.py --model-dir ./asd_model --bundle ./asd_model_bundle --workers 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+WORKER = r'''
+import json, os, sys, time
+start = time.perf_counter()
+import torch
+import transformers
+from model import Wav2Vec2ForSpeechClassification as Model
+import_s = time.perf_counter() - start
+start = time.perf_counter()
+mode, model_dir, processor_source = sys.argv[1:4]
+if mode == 'bundle':
+    import model_bundle
+    model = model_bundle.load_model(model_dir)
+    processor = model_bundle.load_processor(model_dir)
+else:
+    from transformers import AutoConfig, Wav2Vec2Processor
+    model = Model.from_pretrained(model_dir, config=AutoConfig.from_pretrained(model_dir)).eval()
+    processor = Wav2Vec2Processor.from_pretrained(processor_source)
+load_s = time.perf_counter() - start
+generator = torch.Generator().manual_seed(0)
+clip = torch.randn(16000 * 4, generator=generator).numpy()
+start = time.perf_counter()
+with torch.inference_mode():
+    logits = model(processor(clip, sampling_rate=16000, return_tensors='pt').input_values).logits
+first_call_ms = (time.perf_counter() - start) * 1000
+memory = {}
+with open('/proc/self/smaps_rollup') as f:
+    for line in f:
+        parts = line.split()
+        if len(parts) >= 2 and parts[1].isdigit():
+            memory[parts[0].rstrip(':')] = int(parts[1]) / 1024
+sys.stdout.write(json.dumps({'import_s': import_s, 'load_s': load_s, 'first_call_ms': first_call_ms,
+                             'private_mb': memory['Private_Clean'] + memory['Private_Dirty'],
+                             'pss_mb': memory['Pss'], 'logits': logits[0].tolist()}) + '\n')
+sys.stdout.flush()
+# Stay alive until every worker has measured, so shared pages are counted as shared
+sys.stdin.read()
+'''
+
+
+def run_mode(mode, model_dir, processor, workers):
+    env = dict(os.environ, USE_TF='0')
+    if mode == 'bundle':
+        env['HF_HUB_OFFLINE'] = '1'
+    procs = [subprocess.Popen([sys.executable, '-c', WORKER, mode, model_dir, processor], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=env)
+             for _ in range(workers)]
+    results = []
+    for proc in procs:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"{mode}: worker failed (exit {proc.wait()})")
+        results.append(json.loads(line))
+    for proc in procs:
+        proc.communicate('')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare voice model startup from a checkpoint vs. a bundle.")
+    parser.add_argument("--model-dir", default="./asd_model")
+    parser.add_argument("--processor", default="facebook/wav2vec2-base-960h", help="Processor for 'checkpoint' mode")
+    parser.add_argument("--bundle", default="./asd_model_bundle")
+    parser.add_argument("--workers", type=int, default=3)
+    args = parser.parse_args()
+
+    report = {'workers': args.workers, 'modes': {}}
+    logits = {}
+    for mode, path in (('checkpoint', args.model_dir), ('bundle', args.bundle)):
+        results = run_mode(mode, path, args.processor, args.workers)
+        logits[mode] = results[0]['logits']
+        report['modes'][mode] = {
+            'import_s': round(max(r['import_s'] for r in results), 2),
+            'load_s': round(max(r['load_s'] for r in results), 2),
+            'first_call_ms': round(max(r['first_call_ms'] for r in results), 1),
+            'private_mb_per_worker': round(max(r['private_mb'] for r in results), 1),
+            'pss_mb_total': round(sum(r['pss_mb'] for r in results), 1),
+        }
+    report['max_logit_diff'] = max(abs(a - b) for a, b in zip(logits['checkpoint'], logits['bundle']))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark voice-activity trimming on long clips and check it against the untrimmed baseline.
+
+Each clip is scored three times: untrimmed ('off'), edge-trimmed ('trim') and
+with internal pauses removed too ('compact'). Per mode the report gives the
+audio seconds encoded, front-end + encoder latency and, against 'off', the max
+|p_autistic| difference and label agreement.
+
+Clips come from --clips (a folder of recordings) or, when omitted, seeded
+synthetic recordings of --seconds each: voiced bursts separated by pauses, with
+several seconds of room noise before and after, like a parent's phone clip.
+
+The trained checkpoint in --model-dir is used when present. Without it a
+randomly initialized wav2vec2-base of the same shape is timed instead; its
+probabilities carry no meaning, so parity is reported but not enforced.
+
+Usage:
+    python bench_vad.py --seconds 30 60 --repeats 3
+    python bench_vad.py --clips ./parity_clips --model-dir ./asd_model
+Exit code is 1 when a trained model misses the parity thresholds.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import torch
+
+import audio_frontend
+import config as conf
+from compare_models import autistic_prob, collect_clips
+from model import Wav2Vec2ForSpeechClassification as Model
+
+MODES = ('off', 'trim', 'compact')
+
+
+def synthetic_recording(seconds, seed=0):
+    """Room noise with voiced bursts (0.5-2.5 s) and pauses in the middle 60% of the clip."""
+    rng = np.random.default_rng(seed)
+    sr = conf.sampling_rate
+    total = int(seconds * sr)
+    signal = 0.004 * rng.standard_normal(total)
+    position, end = int(0.2 * total), int(0.8 * total)
+    while position < end:
+        length = min(int(rng.uniform(0.5, 2.5) * sr), end - position)
+        t = np.arange(length) / sr
+        f0 = rng.uniform(180.0, 320.0)
+        burst = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 5))
+        burst *= 0.3 * (0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(2.0, 5.0) * t)) * np.hanning(length)
+        signal[position:position + length] += burst
+        position += length + int(rng.uniform(0.2, 1.5) * sr)
+    return (signal / np.abs(signal).max()).astype(np.float32)
+
+
+def load_model(model_dir):
+    if os.path.isdir(model_dir):
+        from transformers import AutoConfig
+        return Model.from_pretrained(model_dir, config=AutoConfig.from_pretrained(model_dir)).eval(), True
+    from transformers import Wav2Vec2Config
+    torch.manual_seed(0)
+    return Model(Wav2Vec2Config(num_labels=2)).eval(), False
+
+
+def score(model, waveform, mode):
+    """(p_autistic, trim stats, latency ms) for one clip through the server's front-end."""
+    start = time.perf_counter()
+    trimmed, stats = audio_frontend.trim_silence(waveform, mode=mode)
+    with torch.inference_mode():
+        logits = model(audio_frontend.normalize(trimmed).unsqueeze(0)).logits
+    return autistic_prob(logits), stats, (time.perf_counter() - start) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VAD trimming before wav2vec2 and check parity.")
+    parser.add_argument("--model-dir", default="./asd_model")
+    parser.add_argument("--clips", default=None, help="Folder of audio clips (default: synthetic recordings)")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[30.0, 60.0], help="Synthetic clip lengths")
+    parser.add_argument("--count", type=int, default=2, help="Synthetic clips per length")
+    parser.add_argument("--repeats", type=int, default=2, help="Timed calls per clip and mode")
+    parser.add_argument("--max-prob-diff", type=float, default=0.05, help="Max allowed |p_off - p_trimmed| per clip")
+    parser.add_argument("--min-agreement", type=float, default=1.0, help="Min fraction of clips with the same label")
+    args = parser.parse_args()
+
+    if args.clips:
+        clips = collect_clips(args.clips)
+    else:
+        clips = [(f"synthetic_{s:.0f}s_{i}", synthetic_recording(s, seed=i))
+                 for s in args.seconds for i in range(args.count)]
+    model, trained = load_model(args.model_dir)
+    score(model, torch.from_numpy(clips[0][1][:conf.sampling_rate]), 'off')  # warm-up
+
+    results = {mode: {'probs': [], 'latency': [], 'encoded_s': [], 'original_s': []} for mode in MODES}
+    for _, wave in clips:
+        waveform = torch.from_numpy(wave)
+        for mode in MODES:
+            for _ in range(args.repeats):
+                prob, stats, latency = score(model, waveform, mode)
+                results[mode]['latency'].append(latency)
+            results[mode]['probs'].append(prob)
+            results[mode]['encoded_s'].append(stats['kept_s'])
+            results[mode]['original_s'].append(stats['original_s'])
+
+    report = {'clips': len(clips), 'trained_model': trained, 'audio_s': round(sum(results['off']['original_s']), 1),
+              'modes': {}}
+    baseline = results['off']
+    failed = False
+    for mode in MODES:
+        r = results[mode]
+        diffs = [abs(a - b) for a, b in zip(baseline['probs'], r['probs'])]
+        agreement = sum((a > 0.5) == (b > 0.5) for a, b in zip(baseline['probs'], r['probs'])) / len(r['probs'])
+        p50 = statistics.median(r['latency'])
+        row = {
+            'encoded_s': round(sum(r['encoded_s']), 1),
+            'removed_pct': round(100.0 * (1 - sum(r['encoded_s']) / sum(r['original_s'])), 1),
+            'p50_ms': round(p50, 1),
+            'speedup_p50': round(statistics.median(baseline['latency']) / p50, 2),
+            'max_prob_diff': round(max(diffs), 5),
+            'label_agreement': round(agreement, 4),
+        }
+        if mode != 'off' and trained:
+            passed = row['max_prob_diff'] <= args.max_prob_diff and agreement >= args.min_agreement
+            row['parity'] = 'PASS' if passed else 'FAIL'
+            failed = failed or not passed
+        report['modes'][mode] = row
+
+    print(json.dumps(report, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
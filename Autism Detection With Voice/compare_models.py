@@ -0,0 +1,160 @@
+"""
+Accuracy-parity check and latency/memory benchmark: fp32 model vs. optimized artifacts.
+
+Clips come from --clips (a folder of audio files) or, when omitted, from a fixed
+set of seeded synthetic clips so runs are comparable across machines.
+
+Usage:
+    python compare_models.py --clips ./parity_clips --backends torchscript onnx
+Exit code is 1 when any backend misses the parity thresholds.
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import torch
+from transformers import AutoConfig, Wav2Vec2Processor
+
+import audio_frontend
+import config as conf
+from model import Wav2Vec2ForSpeechClassification as Model
+from optimized import load_optimized_model
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.mp3', '.ogg', '.webm', '.m4a')
+
+
+def rss_mb():
+    """Current resident set size of this process in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is a peak (KB on Linux, bytes on macOS) but is the best we have here
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def load_clip(path):
+    with open(path, 'rb') as f:
+        return audio_frontend.load_waveform(f.read()).numpy()
+
+
+def synthetic_clips(count=8, seed=1234):
+    """Deterministic voiced-like clips (harmonics + noise) of 1-8 seconds."""
+    rng = np.random.default_rng(seed)
+    clips = []
+    for i in range(count):
+        seconds = 1.0 + 7.0 * i / max(1, count - 1)
+        t = np.arange(int(seconds * conf.sampling_rate)) / conf.sampling_rate
+        f0 = rng.uniform(180.0, 320.0)
+        signal = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 5))
+        signal = signal * (0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(2.0, 5.0) * t))
+        signal = signal + 0.05 * rng.standard_normal(t.shape)
+        clips.append((f"synthetic_{i}", (signal / np.abs(signal).max()).astype(np.float32)))
+    return clips
+
+
+def collect_clips(clips_dir):
+    if not clips_dir:
+        return synthetic_clips()
+    names = sorted(n for n in os.listdir(clips_dir) if n.lower().endswith(AUDIO_EXTENSIONS))
+    if not names:
+        raise SystemExit(f"No audio files found in {clips_dir}")
+    return [(name, load_clip(os.path.join(clips_dir, name))) for name in names]
+
+
+def autistic_prob(logits):
+    return torch.nn.functional.softmax(logits, dim=1)[0][1].item()
+
+
+def run_backend(forward, inputs, repeats):
+    """Return per-clip probabilities and per-call latencies (ms)."""
+    probs, latencies = [], []
+    with torch.no_grad():
+        forward(inputs[0])  # warm-up (graph optimization, allocator)
+        for input_values in inputs:
+            for _ in range(repeats):
+                start = time.perf_counter()
+                logits = forward(input_values)
+                latencies.append((time.perf_counter() - start) * 1000.0)
+            probs.append(autistic_prob(logits))
+    return probs, latencies
+
+
+def summarize_latency(latencies):
+    ordered = sorted(latencies)
+    return {
+        'mean_ms': round(statistics.fmean(ordered), 2),
+        'p50_ms': round(ordered[len(ordered) // 2], 2),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the fp32 voice model against its optimized exports.")
+    parser.add_argument("--model-dir", default="./asd_model")
+    parser.add_argument("--optimized-dir", default=conf.optimized_model_dir)
+    parser.add_argument("--backends", nargs="+", default=["torchscript", "onnx"], choices=["torchscript", "onnx"])
+    parser.add_argument("--clips", default=None, help="Folder of audio clips (default: seeded synthetic clips)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed calls per clip")
+    parser.add_argument("--max-prob-diff", type=float, default=0.05, help="Max allowed |p_fp32 - p_opt| per clip")
+    parser.add_argument("--min-agreement", type=float, default=1.0, help="Min fraction of clips with the same label")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    clips = collect_clips(args.clips)
+    processor = Wav2Vec2Processor.from_pretrained(conf.model_name)
+    inputs = [processor(wave, sampling_rate=conf.sampling_rate, return_tensors="pt").input_values for _, wave in clips]
+
+    rss_before = rss_mb()
+    config = AutoConfig.from_pretrained(args.model_dir)
+    fp32 = Model.from_pretrained(args.model_dir, config=config).to('cpu').eval()
+    report = {'clips': len(clips), 'backends': {}}
+    baseline_probs, latencies = run_backend(lambda x: fp32(x).logits, inputs, args.repeats)
+    report['backends']['fp32'] = {'rss_mb': round(rss_mb() - rss_before, 1), **summarize_latency(latencies)}
+
+    failed = False
+    for backend in args.backends:
+        gc.collect()
+        rss_before = rss_mb()
+        try:
+            forward = load_optimized_model(args.optimized_dir, backend)
+        except (OSError, RuntimeError, ValueError) as e:
+            report['backends'][backend] = {'error': str(e)}
+            failed = True
+            continue
+        probs, latencies = run_backend(forward, inputs, args.repeats)
+        diffs = [abs(a - b) for a, b in zip(baseline_probs, probs)]
+        agreement = sum((a > 0.5) == (b > 0.5) for a, b in zip(baseline_probs, probs)) / len(probs)
+        passed = max(diffs) <= args.max_prob_diff and agreement >= args.min_agreement
+        failed = failed or not passed
+        stats = summarize_latency(latencies)
+        report['backends'][backend] = {
+            'rss_mb': round(rss_mb() - rss_before, 1),
+            **stats,
+            'speedup_p50': round(report['backends']['fp32']['p50_ms'] / max(1e-6, stats['p50_ms']), 2),
+            'max_prob_diff': round(max(diffs), 5),
+            'label_agreement': round(agreement, 4),
+            'parity': 'PASS' if passed else 'FAIL',
+        }
+        del forward
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Clips: {report['clips']}")
+        for name, row in report['backends'].items():
+            print(f"  {name:12s} " + ", ".join(f"{k}={v}" for k, v in row.items()))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+import os
+
 import torch
 
 # --- Model & Audio Settings ---
@@ -7,4 +9,53 @@ pooling_mode = 'mean'
 
 # --- Device Configuration ---
 # This will automatically use your GPU if you have one, otherwise it will use the CPU
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
\ No newline at end of file
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+# --- Optimized Inference ---
+# Which artifact the API server serves from:
+#   'pytorch'     -> the fp32 checkpoint in ./asd_model (default)
+#   'torchscript' -> model_int8.pt produced by export_model.py
+#   'onnx'        -> model.onnx / model_int8.onnx produced by export_model.py
+inference_backend = os.environ.get('VOICE_INFERENCE_BACKEND', 'pytorch')
+optimized_model_dir = os.environ.get('VOICE_OPTIMIZED_MODEL_DIR', './asd_model_optimized')
+# Offline bundle from model_bundle.py (config + processor + safetensors weights, memory-mapped).
+# Used instead of ./asd_model and the hub processor whenever it exists; '' disables it.
+model_bundle_dir = os.environ.get('VOICE_MODEL_BUNDLE', './asd_model_bundle')
+
+# --- CPU Threading & Concurrency ---
+# 0 leaves PyTorch's default (one thread per core). Under Flask's threaded server
+# each request would otherwise try to use every core at once.
+intra_op_threads = int(os.environ.get('VOICE_INTRA_OP_THREADS', 0))
+inter_op_threads = int(os.environ.get('VOICE_INTER_OP_THREADS', 0))
+# torch.inference_mode() skips autograd version tracking entirely (cheaper than no_grad)
+use_inference_mode = os.environ.get('VOICE_INFERENCE_MODE', '1') == '1'
+# Forward passes allowed to run at once; extra requests wait up to request_queue_timeout seconds
+max_concurrent_requests = int(os.environ.get('VOICE_MAX_CONCURRENT', 2))
+request_queue_timeout = float(os.environ.get('VOICE_QUEUE_TIMEOUT', 30))
+
+# --- Embedding Cache ---
+# Pooled wav2vec2 embeddings are stored by audio content hash so re-scoring a
+# recording (or scoring it with an updated head) skips the encoder.
+embedding_cache_enabled = os.environ.get('VOICE_EMBEDDING_CACHE', '1') == '1'
+embedding_cache_dir = os.environ.get('VOICE_EMBEDDING_CACHE_DIR', './embedding_cache')
+# /similar-voice keeps the cached embeddings in memory; entries written by other
+# server processes are picked up at most this many seconds later
+embedding_index_refresh_s = float(os.environ.get('VOICE_EMBEDDING_INDEX_REFRESH', 60))
+
+# --- Voice Activity Trimming ---
+# Non-speech audio is cut before wav2vec2, whose cost grows with clip length.
+#   'off'     -> the whole clip is encoded (default)
+#   'trim'    -> leading/trailing silence is removed
+#   'compact' -> internal pauses longer than vad_min_silence_ms are removed too
+# Trimming changes the scores, so it stays off until bench_vad.py --clips shows
+# parity with the untrimmed baseline on real recordings.
+vad_mode = os.environ.get('VOICE_VAD_MODE', 'off')
+# A frame is speech when louder than both (loudest frame + threshold) and (noise floor + margin)
+vad_threshold_db = float(os.environ.get('VOICE_VAD_THRESHOLD_DB', -40))
+vad_noise_margin_db = float(os.environ.get('VOICE_VAD_NOISE_MARGIN_DB', 6))
+vad_frame_ms = int(os.environ.get('VOICE_VAD_FRAME_MS', 20))
+# Audio kept on each side of detected speech
+vad_padding_ms = int(os.environ.get('VOICE_VAD_PADDING_MS', 200))
+vad_min_silence_ms = int(os.environ.get('VOICE_VAD_MIN_SILENCE_MS', 500))
+# Less detected speech than this and the clip is left untouched
+vad_min_speech_ms = int(os.environ.get('VOICE_VAD_MIN_SPEECH_MS', 500))
@@ -0,0 +1,186 @@
+"""
+On-disk cache of pooled wav2vec2 embeddings keyed by audio content hash.
+
+The key is the SHA-256 of the normalized float32 input_values, so the same
+recording hits the cache regardless of the container it was uploaded in.
+Entries live under a namespace derived from the encoder alone: a digest of the
+wav2vec2.* tensors, the encoder config and the pooling mode. A checkpoint whose
+classification head was retrained therefore keeps the namespace (and every
+cached embedding), while a change to the encoder starts a fresh one. Hashing
+the encoder reads every weight once, so the digest is remembered per weight
+file (name, size, mtime) in <cache_dir>/namespaces.json.
+
+Layout: <cache_dir>/<namespace>/<hash[:2]>/<hash>.npy
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import torch
+
+import config as conf
+
+WEIGHT_FILES = ('model.safetensors', 'pytorch_model.bin')
+ENCODER_PREFIX = 'wav2vec2.'
+# Config entries that describe the head or the checkpoint, not the encoder
+HEAD_CONFIG_KEYS = ('id2label', 'label2id', 'num_labels', 'problem_type', 'finetuning_task', 'final_dropout',
+                    'architectures', '_name_or_path', 'transformers_version', 'torch_dtype', 'dtype')
+
+
+def audio_hash(input_values):
+    """Content hash of the model input (1, samples) float32 tensor."""
+    data = input_values.detach().to(torch.float32).cpu().contiguous().numpy()
+    return hashlib.sha256(data.tobytes()).hexdigest()
+
+
+def encoder_digest(model):
+    """SHA-256 over the encoder tensors (name, dtype, shape, bytes), the encoder config and the pooling mode."""
+    h = hashlib.sha256(conf.pooling_mode.encode())
+    encoder_config = {k: v for k, v in model.config.to_dict().items() if k not in HEAD_CONFIG_KEYS}
+    h.update(json.dumps(encoder_config, sort_keys=True, default=str).encode())
+    for name, tensor in sorted(model.state_dict().items()):
+        if not name.startswith(ENCODER_PREFIX):
+            continue
+        tensor = tensor.detach().cpu().contiguous()
+        h.update(f"{name}:{tensor.dtype}:{tuple(tensor.shape)}".encode())
+        h.update(tensor.reshape(-1).view(torch.uint8).numpy())
+    return h.hexdigest()
+
+
+def _weights_stamp(model_dir):
+    for name in WEIGHT_FILES:
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            st = os.stat(path)
+            return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+    return None
+
+
+def encoder_namespace(model, model_dir, cache_dir=None):
+    """Cache namespace for embeddings produced by `model` (loaded from `model_dir`)."""
+    stamp = _weights_stamp(model_dir)
+    memo_path = os.path.join(cache_dir, 'namespaces.json') if cache_dir and stamp else None
+    memo = {}
+    if memo_path:
+        try:
+            with open(memo_path) as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            memo = {}
+        if stamp in memo:
+            return memo[stamp]
+
+    namespace = encoder_digest(model)[:16]
+    if memo_path:
+        memo[stamp] = namespace
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(memo, f)
+            os.replace(tmp_path, memo_path)
+        except OSError:
+            # Only the memo is lost; the digest is recomputed next start
+            pass
+    return namespace
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir, namespace, refresh_s=None):
+        self.root = os.path.join(cache_dir, namespace)
+        os.makedirs(self.root, exist_ok=True)
+        # In-memory copy of the namespace for most_similar: unit-norm rows, one per key
+        self.refresh_s = conf.embedding_index_refresh_s if refresh_s is None else refresh_s
+        self._lock = threading.Lock()
+        self._keys = []
+        self._positions = {}
+        self._matrix = None
+        self._pending = []
+        self._synced_at = None
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.npy")
+
+    def get(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            # Partial or corrupted entry; recompute and overwrite
+            return None
+
+    def put(self, key, embedding):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so concurrent readers never see a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.asarray(embedding, dtype=np.float32))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            if self._synced_at is not None:
+                self._add(key, embedding)
+
+    def iter_keys(self):
+        for sub in sorted(os.listdir(self.root)):
+            sub_dir = os.path.join(self.root, sub)
+            if not os.path.isdir(sub_dir):
+                continue
+            for name in sorted(os.listdir(sub_dir)):
+                if name.endswith('.npy'):
+                    yield name[:-4]
+
+    def iter_entries(self):
+        for key in self.iter_keys():
+            embedding = self.get(key)
+            if embedding is not None:
+                yield key, embedding
+
+    def _add(self, key, embedding):
+        if key in self._positions:
+            return
+        row = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        self._positions[key] = len(self._keys)
+        self._keys.append(key)
+        self._pending.append(row / max(float(np.linalg.norm(row)), 1e-12))
+
+    def _sync(self):
+        """Load entries this process has not seen (first call, then every refresh_s for other writers)."""
+        now = time.monotonic()
+        if self._synced_at is None or now - self._synced_at >= self.refresh_s:
+            for key in self.iter_keys():
+                if key not in self._positions:
+                    embedding = self.get(key)
+                    if embedding is not None:
+                        self._add(key, embedding)
+            self._synced_at = now
+        if self._pending:
+            rows = np.stack(self._pending)
+            self._matrix = rows if self._matrix is None else np.concatenate([self._matrix, rows])
+            self._pending = []
+
+    def most_similar(self, embedding, top_k=5, exclude=None):
+        """Cosine similarity of `embedding` against every cached entry; returns [(hash, score), ...]."""
+        with self._lock:
+            self._sync()
+            matrix, keys = self._matrix, list(self._keys)
+        if matrix is None or not len(keys):
+            return []
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        scores = matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        position = self._positions.get(exclude)
+        if position is not None and position < len(scores):
+            scores[position] = -np.inf
+        order = np.argsort(-scores)[:top_k]
+        return [(keys[i], float(scores[i])) for i in order if np.isfinite(scores[i])]
@@ -0,0 +1,113 @@
+"""
+Export the fine-tuned voice classifier for fast CPU inference.
+
+Produces, inside --out:
+  model_int8.pt    TorchScript of the dynamically quantized (int8 nn.Linear) model
+  model.onnx       fp32 ONNX graph with a dynamic audio-length axis
+  model_int8.onnx  ONNX graph with int8 weights (needs onnxruntime)
+
+Every artifact includes the wav2vec2 encoder, the pooling step and the
+classification head, so it maps raw `input_values` straight to logits.
+
+Usage:
+    python export_model.py --model-dir ./asd_model --out ./asd_model_optimized --format both
+"""
+import argparse
+import json
+import os
+import time
+
+import torch
+from transformers import AutoConfig
+
+import config as conf
+from model import Wav2Vec2ForSpeechClassification as Model
+from optimized import LogitsWrapper, quantize_dynamic, TORCHSCRIPT_FILE, ONNX_FILE, ONNX_INT8_FILE
+
+
+def load_fp32_model(model_dir):
+    config = AutoConfig.from_pretrained(model_dir)
+    model = Model.from_pretrained(model_dir, config=config).to('cpu')
+    model.eval()
+    return model
+
+
+def example_input(seconds=2.0):
+    # Fixed seed so repeated exports trace the same graph
+    generator = torch.Generator().manual_seed(0)
+    return torch.randn(1, int(conf.sampling_rate * seconds), generator=generator)
+
+
+def export_torchscript(model, out_dir):
+    quantized = quantize_dynamic(LogitsWrapper(model)).eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(quantized, example_input(), strict=False)
+    traced = torch.jit.freeze(traced)
+    path = os.path.join(out_dir, TORCHSCRIPT_FILE)
+    traced.save(path)
+    return path
+
+
+def export_onnx(model, out_dir, opset=14):
+    path = os.path.join(out_dir, ONNX_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            LogitsWrapper(model),
+            example_input(),
+            path,
+            input_names=['input_values'],
+            output_names=['logits'],
+            dynamic_axes={'input_values': {0: 'batch', 1: 'samples'}, 'logits': {0: 'batch'}},
+            opset_version=opset,
+        )
+
+    paths = [path]
+    try:
+        from onnxruntime.quantization import quantize_dynamic as ort_quantize_dynamic, QuantType
+    except ImportError:
+        print("onnxruntime not installed, skipping int8 ONNX export")
+        return paths
+
+    int8_path = os.path.join(out_dir, ONNX_INT8_FILE)
+    ort_quantize_dynamic(path, int8_path, weight_type=QuantType.QInt8)
+    paths.append(int8_path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the voice classifier to int8 TorchScript and/or ONNX.")
+    parser.add_argument("--model-dir", default="./asd_model", help="Fine-tuned fp32 checkpoint folder")
+    parser.add_argument("--out", default=conf.optimized_model_dir, help="Output folder for optimized artifacts")
+    parser.add_argument("--format", choices=["torchscript", "onnx", "both"], default="both")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    print(f"Loading model from: {args.model_dir}")
+    model = load_fp32_model(args.model_dir)
+
+    exported = []
+    start = time.perf_counter()
+    if args.format in ("torchscript", "both"):
+        exported.append(export_torchscript(model, args.out))
+    if args.format in ("onnx", "both"):
+        exported.extend(export_onnx(model, args.out, opset=args.opset))
+
+    info = {
+        'source_model_dir': os.path.abspath(args.model_dir),
+        'pooling_mode': conf.pooling_mode,
+        'sampling_rate': conf.sampling_rate,
+        'num_labels': model.config.num_labels,
+        'artifacts': [os.path.basename(p) for p in exported],
+        'export_seconds': round(time.perf_counter() - start, 2),
+    }
+    with open(os.path.join(args.out, 'export_info.json'), 'w') as f:
+        json.dump(info, f, indent=2)
+
+    for path in exported:
+        print(f"Saved: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    print("Run compare_models.py to check accuracy parity and latency before serving.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Load-test /predict-voice across thread and concurrency settings.
+
+For every combination of the sweep values, a fresh api_server process is started
+with the matching VOICE_* environment variables (see config.py), warmed up, and
+hit by --clients concurrent clients. Reports p50/p95 latency and requests/second
+so node sizes can be chosen from measurements.
+
+Usage:
+    python load_test.py --intra 1 2 4 --max-concurrent 1 2 4 --clients 8 --requests 64
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_audio_frontend import make_wav_bytes
+
+SERVER_CMD = "import api_server; api_server.app.run(host='127.0.0.1', port={port}, threaded=True)"
+
+
+def multipart_body(file_bytes, field='audio_file', filename='clip.wav'):
+    boundary = uuid.uuid4().hex
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: audio/wav\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    return head + file_bytes + tail, f"multipart/form-data; boundary={boundary}"
+
+
+def post_clip(url, body, content_type):
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': content_type}, method='POST')
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=300) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return (time.perf_counter() - start) * 1000.0, status
+
+
+def wait_ready(base_url, proc, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=2) as resp:
+                if json.loads(resp.read()).get('status') == 'ok':
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("server did not become ready")
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run_config(settings, args, body, content_type):
+    env = dict(os.environ,
+               VOICE_INTRA_OP_THREADS=str(settings['intra']),
+               VOICE_INTER_OP_THREADS=str(settings['inter']),
+               VOICE_INFERENCE_MODE=str(settings['inference_mode']),
+               VOICE_MAX_CONCURRENT=str(settings['max_concurrent']))
+    base_url = f"http://127.0.0.1:{args.port}"
+    proc = subprocess.Popen([sys.executable, '-c', SERVER_CMD.format(port=args.port)], env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(base_url, proc, args.startup_timeout)
+        url = f"{base_url}/predict-voice"
+        for _ in range(args.warmup):
+            post_clip(url, body, content_type)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            results = list(pool.map(lambda _: post_clip(url, body, content_type), range(args.requests)))
+        wall = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    ok = sorted(ms for ms, status in results if status == 200)
+    row = dict(settings, ok=len(ok), errors=len(results) - len(ok), rps=round(len(ok) / wall, 2))
+    if ok:
+        row.update(p50_ms=round(statistics.median(ok), 1), p95_ms=round(percentile(ok, 0.95), 1))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep voice server threading settings under concurrent load.")
+    parser.add_argument("--intra", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--inter", type=int, nargs="+", default=[1])
+    parser.add_argument("--inference-mode", type=int, nargs="+", choices=[0, 1], default=[1])
+    parser.add_argument("--max-concurrent", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--requests", type=int, default=64, help="Timed requests per configuration")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--clip-seconds", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=5011)
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    body, content_type = multipart_body(make_wav_bytes(16000, args.clip_seconds))
+    rows = []
+    for intra, inter, mode, slots in itertools.product(args.intra, args.inter, args.inference_mode, args.max_concurrent):
+        settings = {'intra': intra, 'inter': inter, 'inference_mode': mode, 'max_concurrent': slots}
+        try:
+            rows.append(run_config(settings, args, body, content_type))
+        except RuntimeError as e:
+            rows.append(dict(settings, error=str(e)))
+        if not args.json:
+            print(", ".join(f"{k}={v}" for k, v in rows[-1].items()), flush=True)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        best = max((r for r in rows if r.get('ok')), key=lambda r: r['rps'], default=None)
+        if best:
+            print(f"Best throughput: {best}")
+
+
+if __name__ == "__main__":
+    main()
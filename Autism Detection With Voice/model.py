@@ -65,11 +65,18 @@ class Wav2Vec2ForSpeechClassification(Wav2Vec2PreTrainedModel):
             raise Exception("The pooling method hasn't been defined! Your pooling mode must be one of these ['mean', 'sum', 'max']")
         return outputs
 
+    def classify_features(self, features):
+        """Run only the classification head on pooled embeddings from forward(..., return_feature=True)."""
+        return self.classifier(features)
+
     def forward(self, input_values, attention_mask=None, output_attentions=None, output_hidden_states=None, return_dict=None, labels=None, return_feature=False):
         return_dict = return_dict if return_dict is not None else self.config.use_return_dict
         outputs = self.wav2vec2(input_values, attention_mask=attention_mask, output_attentions=output_attentions, output_hidden_states=output_hidden_states, return_dict=return_dict)
         hidden_states = outputs[0]
         hidden_states = self.merged_strategy(hidden_states, mode=self.pooling_mode)
+        if return_feature:
+            # Pooled encoder embedding (batch, hidden_size); score later with classify_features()
+            return hidden_states
         logits = self.classifier(hidden_states)
 
         loss = None
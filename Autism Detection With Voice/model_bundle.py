@@ -0,0 +1,250 @@
+"""
+Self-contained voice model bundle: config, processor and weights in one local folder.
+
+The API server used to resolve the processor from the 'facebook/wav2vec2-base-960h'
+hub id (network or a warm HF cache required) and to copy the fine-tuned weights
+into freshly allocated tensors. A bundle is built once, where the hub is
+reachable, and then loads offline:
+
+    config.json                   model config (num_labels, pooling-relevant sizes)
+    model.safetensors             fp32 weights
+    preprocessor_config.json,     Wav2Vec2Processor files (feature extractor +
+    tokenizer files               tokenizer), saved with processor.save_pretrained
+    bundle.json                   source, pooling_mode, sampling_rate, the size
+                                  and SHA-256 of every file, and the size, mtime
+                                  and SHA-256 of the source checkpoint's weights
+
+A bundle is a snapshot of its source checkpoint. stale_reason() reports when
+the checkpoint's weights no longer match that snapshot (the model was
+retrained after the bundle was built); the API server then loads the
+checkpoint instead and logs why.
+
+load_model() builds the model on the meta device and assigns tensors that are
+views into a private (copy-on-write) mmap of model.safetensors, so weights are
+paged in from the page cache instead of copied: startup does no weight I/O up
+front, and every worker process serving the same bundle shares the same
+physical pages.
+
+Usage:
+    python model_bundle.py create --model-dir ./asd_model --out ./asd_model_bundle
+    python model_bundle.py verify ./asd_model_bundle
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+import torch
+
+import config as conf
+
+MANIFEST_FILE = 'bundle.json'
+WEIGHTS_FILE = 'model.safetensors'
+# Weight files a fine-tuned checkpoint folder may hold, in from_pretrained's order of preference
+SOURCE_WEIGHT_FILES = ('model.safetensors', 'pytorch_model.bin')
+# safetensors dtype names -> torch dtypes
+DTYPES = {
+    'F64': torch.float64, 'F32': torch.float32, 'F16': torch.float16, 'BF16': torch.bfloat16,
+    'I64': torch.int64, 'I32': torch.int32, 'I16': torch.int16, 'I8': torch.int8, 'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+
+
+class BundleError(Exception):
+    pass
+
+
+def sha256_file(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def is_bundle(path):
+    return bool(path) and os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+
+def read_manifest(bundle_dir):
+    try:
+        with open(os.path.join(bundle_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise BundleError(f"No readable {MANIFEST_FILE} in {bundle_dir}: {e}") from e
+
+
+def source_weights(model_dir):
+    """(path, os.stat) of the checkpoint's weight file, or (None, None) when there is none."""
+    for name in SOURCE_WEIGHT_FILES:
+        path = os.path.join(model_dir, name)
+        try:
+            return path, os.stat(path)
+        except OSError:
+            continue
+    return None, None
+
+
+def stale_reason(bundle_dir, model_dir):
+    """Why the bundle no longer matches the checkpoint in `model_dir`, or None when it still does.
+
+    Size and mtime are compared first; the SHA-256 is only read when they differ (e.g. a copy).
+    """
+    path, st = source_weights(model_dir)
+    if path is None:
+        # Deployed without the checkpoint: the bundle is all there is
+        return None
+    recorded = read_manifest(bundle_dir).get('source_weights')
+    if recorded is None:
+        # Bundle predates source tracking: fall back to comparing times
+        if st.st_mtime_ns > os.stat(os.path.join(bundle_dir, MANIFEST_FILE)).st_mtime_ns:
+            return f"{path} is newer than the bundle"
+        return None
+    if os.path.basename(path) == recorded['file'] and st.st_size == recorded['size'] \
+            and st.st_mtime_ns == recorded['mtime_ns']:
+        return None
+    if os.path.basename(path) == recorded['file'] and sha256_file(path) == recorded['sha256']:
+        return None
+    return f"{path} changed since the bundle was built"
+
+
+def create(model_dir, out_dir, processor_source=conf.model_name):
+    """Write a bundle for the checkpoint in `model_dir`; the processor comes from `processor_source`."""
+    from transformers import AutoConfig, Wav2Vec2Processor
+    from model import Wav2Vec2ForSpeechClassification as Model
+
+    config = AutoConfig.from_pretrained(model_dir)
+    model = Model.from_pretrained(model_dir, config=config).to('cpu').eval()
+    processor = Wav2Vec2Processor.from_pretrained(processor_source)
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix='.bundle-')
+    try:
+        # save_pretrained writes config.json + model.safetensors
+        model.save_pretrained(staging, safe_serialization=True)
+        processor.save_pretrained(staging)
+        files = {}
+        for name in sorted(os.listdir(staging)):
+            path = os.path.join(staging, name)
+            files[name] = {'size': os.path.getsize(path), 'sha256': sha256_file(path)}
+        if WEIGHTS_FILE not in files:
+            raise BundleError(f"save_pretrained did not produce {WEIGHTS_FILE} (sharded checkpoints are not supported)")
+        weights_path, weights_stat = source_weights(model_dir)
+        manifest = {
+            'source_model_dir': os.path.abspath(model_dir),
+            'source_weights': weights_path and {
+                'file': os.path.basename(weights_path), 'size': weights_stat.st_size,
+                'mtime_ns': weights_stat.st_mtime_ns, 'sha256': sha256_file(weights_path),
+            },
+            'processor_source': processor_source,
+            'pooling_mode': conf.pooling_mode,
+            'sampling_rate': conf.sampling_rate,
+            'num_labels': config.num_labels,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'files': files,
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        # Swap the finished bundle in so a server never sees a partial one
+        if os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+        os.replace(staging, out_dir)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return manifest
+
+
+def verify(bundle_dir, full=True):
+    """Problems with the bundle's files ([] when intact); `full` also checks every SHA-256."""
+    problems = []
+    for name, info in read_manifest(bundle_dir)['files'].items():
+        path = os.path.join(bundle_dir, name)
+        if not os.path.exists(path):
+            problems.append(f"{name}: missing")
+        elif os.path.getsize(path) != info['size']:
+            problems.append(f"{name}: size {os.path.getsize(path)} != {info['size']}")
+        elif full and sha256_file(path) != info['sha256']:
+            problems.append(f"{name}: sha256 mismatch")
+    return problems
+
+
+def mmap_state_dict(path):
+    """state_dict whose tensors are views into a copy-on-write mmap of a .safetensors file."""
+    with open(path, 'rb') as f:
+        # ACCESS_COPY: pages come from (and stay shared with) the page cache unless written
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header_len = struct.unpack('<Q', buffer[:8])[0]
+    header = json.loads(buffer[8:8 + header_len])
+    base = 8 + header_len
+    state = {}
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        dtype = DTYPES[info['dtype']]
+        start, end = info['data_offsets']
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        tensor = torch.frombuffer(buffer, dtype=dtype, count=count, offset=base + start) if count else \
+            torch.empty(0, dtype=dtype)
+        state[name] = tensor.view(info['shape'])
+    return state
+
+
+def load_model(bundle_dir):
+    """The fine-tuned classifier with weights memory-mapped from the bundle (CPU, eval mode)."""
+    from transformers import AutoConfig
+    from model import Wav2Vec2ForSpeechClassification as Model
+
+    problems = verify(bundle_dir, full=False)
+    if problems:
+        raise BundleError(f"Bundle {bundle_dir} is damaged: {'; '.join(problems)}")
+    config = AutoConfig.from_pretrained(bundle_dir, local_files_only=True)
+    with torch.device('meta'):
+        model = Model(config)
+    model.load_state_dict(mmap_state_dict(os.path.join(bundle_dir, WEIGHTS_FILE)), strict=True, assign=True)
+    left = [n for n, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if left:
+        raise BundleError(f"Bundle weights do not cover: {', '.join(left[:5])}")
+    return model.eval()
+
+
+def load_processor(bundle_dir):
+    from transformers import Wav2Vec2Processor
+
+    return Wav2Vec2Processor.from_pretrained(bundle_dir, local_files_only=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or check an offline voice model bundle.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('create', help="Package config, processor and safetensors weights into one folder")
+    p.add_argument('--model-dir', default='./asd_model', help="Fine-tuned checkpoint folder")
+    p.add_argument('--processor', default=conf.model_name, help="Processor hub id or local folder")
+    p.add_argument('--out', default=conf.model_bundle_dir)
+    p = sub.add_parser('verify', help="Check every bundled file against bundle.json")
+    p.add_argument('bundle_dir', nargs='?', default=conf.model_bundle_dir)
+    args = parser.parse_args()
+
+    if args.command == 'create':
+        start = time.perf_counter()
+        manifest = create(args.model_dir, args.out, args.processor)
+        size = sum(f['size'] for f in manifest['files'].values())
+        print(f"Bundle written to {args.out} ({len(manifest['files'])} files, {size / 1e6:.1f} MB) "
+              f"in {time.perf_counter() - start:.1f}s")
+        return 0
+    problems = verify(args.bundle_dir)
+    for problem in problems:
+        print(problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+# File names written by export_model.py inside conf.optimized_model_dir
+TORCHSCRIPT_FILE = 'model_int8.pt'
+ONNX_FILE = 'model.onnx'
+ONNX_INT8_FILE = 'model_int8.onnx'
+
+BACKENDS = ('pytorch', 'torchscript', 'onnx')
+
+
+class LogitsWrapper(nn.Module):
+    """Exposes Wav2Vec2ForSpeechClassification as `input_values -> logits`.
+
+    Encoder, pooling (merged_strategy) and classification head are all inside
+    the traced graph, so the exported artifact is self-contained.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_values):
+        return self.model(input_values, return_dict=False)[0]
+
+
+def quantize_dynamic(model):
+    """Return an int8 dynamically-quantized copy of the model (nn.Linear layers only)."""
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+class TorchScriptClassifier:
+    def __init__(self, path):
+        self.module = torch.jit.load(path, map_location='cpu')
+        self.module.eval()
+
+    def __call__(self, input_values):
+        return self.module(input_values)
+
+
+class OnnxClassifier:
+    def __init__(self, path):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("onnxruntime must be installed to serve the ONNX model: pip install onnxruntime") from e
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, input_values):
+        if isinstance(input_values, torch.Tensor):
+            input_values = input_values.cpu().numpy()
+        logits = self.session.run(None, {self.input_name: input_values.astype(np.float32)})[0]
+        return torch.from_numpy(logits)
+
+
+def load_optimized_model(model_dir, backend):
+    """Load an exported artifact as a callable returning a logits tensor."""
+    if backend == 'torchscript':
+        return TorchScriptClassifier(os.path.join(model_dir, TORCHSCRIPT_FILE))
+    if backend == 'onnx':
+        # Prefer the quantized graph when export_model.py produced one
+        int8_path = os.path.join(model_dir, ONNX_INT8_FILE)
+        if os.path.exists(int8_path):
+            return OnnxClassifier(int8_path)
+        return OnnxClassifier(os.path.join(model_dir, ONNX_FILE))
+    raise ValueError(f"Unknown optimized backend '{backend}'. Must be one of {BACKENDS[1:]}")
@@ -0,0 +1,165 @@
+"""
+Benchmark face ROI tracking in GazeAnalyzer on 720p / 1080p session captures.
+
+Each run feeds the same frame sequence twice through one analyzer:
+    full  every frame goes to FaceMesh whole (no session id, the previous behaviour)
+    roi   frames carry a session id, so after the first frame FaceMesh sees a padded crop
+
+Frames are synthetic by default: the drawn fixture face pasted into a larger
+camera frame and drifting a few pixels per frame, like a child sitting in front
+of a webcam. --frames-dir replays a real capture (sorted image files) instead.
+
+Reported per resolution: frames/s and p50 latency for both paths, the share of
+frames served from the crop, and parity of gaze_direction (agreement rate) and
+attention_score / head angles (max and mean absolute difference).
+
+Usage:
+    python benchmarks/bench_face_roi.py
+    python benchmarks/bench_face_roi.py --frames 120 --resolutions 1280x720 1920x1080
+    python benchmarks/bench_face_roi.py --frames-dir captures/session_42 --output roi.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import fixtures
+
+sys.path.append(fixtures.BACKEND_DIR)
+
+
+def synthetic_session(width, height, count, face_fraction=0.45, seed=0):
+    """`count` frames with the fixture face pasted in and drifting slowly across the frame."""
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    side = int(height * face_fraction)
+    face = fixtures.make_face_image(side, side, seed=seed)
+    background = np.full((height, width, 3), (170, 180, 190), dtype=np.uint8)
+    background = cv2.add(background, rng.integers(0, 20, background.shape, dtype=np.uint8))
+    x, y = width * 0.3, height * 0.25
+    frames = []
+    for _ in range(count):
+        x = float(np.clip(x + rng.normal(0, 4), 0, width - side))
+        y = float(np.clip(y + rng.normal(0, 3), 0, height - side))
+        frame = background.copy()
+        frame[int(y):int(y) + side, int(x):int(x) + side] = face
+        frames.append(frame)
+    return frames
+
+
+def load_frames(frames_dir, count):
+    import cv2
+
+    names = sorted(n for n in os.listdir(frames_dir) if n.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')))
+    frames = [cv2.imread(os.path.join(frames_dir, n)) for n in names[:count]]
+    return [f for f in frames if f is not None]
+
+
+def run_path(analyzer, frames, session_id):
+    results, latencies = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        results.append(analyzer.estimate_gaze_frame(frame, session_id))
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return results, latencies
+
+
+def parity(full, roi):
+    pairs = [(a, b) for a, b in zip(full, roi) if 'error' not in a and 'error' not in b]
+    if not pairs:
+        return {'compared_frames': 0}
+
+    def diffs(key):
+        values = [abs(a[key] - b[key]) for a, b in pairs]
+        return round(max(values), 4), round(statistics.mean(values), 4)
+
+    attention_max, attention_mean = diffs('attention_score')
+    pitch_max, _ = diffs('head_pitch')
+    yaw_max, _ = diffs('head_yaw')
+    return {
+        'compared_frames': len(pairs),
+        'detected_full': sum('error' not in r for r in full),
+        'detected_roi': sum('error' not in r for r in roi),
+        'gaze_direction_agreement': round(sum(a['gaze_direction'] == b['gaze_direction'] for a, b in pairs) / len(pairs), 4),
+        'attention_score_max_abs_diff': attention_max,
+        'attention_score_mean_abs_diff': attention_mean,
+        'head_pitch_max_abs_diff': pitch_max,
+        'head_yaw_max_abs_diff': yaw_max,
+    }
+
+
+def roi_counts():
+    """roi_frames_total by result ('crop' / 'fallback') from the shared metrics registry."""
+    import instrumentation as metrics
+
+    return {c['labels'].get('result'): c['value'] for c in metrics.export_json()['counters']
+            if c['name'] == 'roi_frames_total'}
+
+
+def bench_frames(analyzer, frames, session_id):
+    # Warm up so graph initialisation is not timed
+    analyzer.estimate_gaze_frame(frames[0])
+    analyzer.roi_tracker.forget(session_id)
+
+    full, full_ms = run_path(analyzer, frames, None)
+    before = roi_counts()
+    roi, roi_ms = run_path(analyzer, frames, session_id)
+    after = roi_counts()
+    analyzer.roi_tracker.forget(session_id)
+
+    full_s, roi_s = sum(full_ms) / 1000.0, sum(roi_ms) / 1000.0
+    return {
+        'frames': len(frames),
+        'full_fps': round(len(frames) / full_s, 2),
+        'roi_fps': round(len(frames) / roi_s, 2),
+        'speedup': round(full_s / roi_s, 2),
+        'full_p50_ms': round(statistics.median(full_ms), 2),
+        'roi_p50_ms': round(statistics.median(roi_ms), 2),
+        'crop_hit_rate': round((after.get('crop', 0) - before.get('crop', 0)) / len(frames), 4),
+        'fallbacks': after.get('fallback', 0) - before.get('fallback', 0),
+        'parity': parity(full, roi),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face ROI tracking against full-frame FaceMesh.")
+    parser.add_argument("--resolutions", nargs="+", default=["1280x720", "1920x1080"])
+    parser.add_argument("--frames", type=int, default=60, help="Frames per synthetic session")
+    parser.add_argument("--frames-dir", default=None, help="Replay a real capture instead of synthetic frames")
+    parser.add_argument("--output", default=None, help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    # Crop hit rates are read from the metrics counters
+    os.environ['ASD_METRICS'] = '1'
+    # Measure FaceMesh on every frame, not near-duplicate reuse
+    os.environ['GAZE_DEDUP_DISTANCE'] = '0'
+    import gaze_worker
+
+    analyzer = gaze_worker.GazeAnalyzer()
+    report = {}
+    if args.frames_dir:
+        frames = load_frames(args.frames_dir, args.frames)
+        if not frames:
+            raise SystemExit(f"No readable frames in {args.frames_dir}")
+        h, w = frames[0].shape[:2]
+        report[f'{w}x{h} (capture)'] = bench_frames(analyzer, frames, 'bench-capture')
+    else:
+        for resolution in args.resolutions:
+            w, h = map(int, resolution.lower().split('x'))
+            print(f"Benchmarking {w}x{h}...", file=sys.stderr, flush=True)
+            report[f'{w}x{h}'] = bench_frames(analyzer, synthetic_session(w, h, args.frames), f'bench-{w}x{h}')
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Throughput of the shared-memory frame ring against a plain multiprocessing.Pool.
+
+Both pipelines decode image files in --decoders processes and run
+GazeAnalyzer.estimate_gaze_frame in --workers processes:
+
+    pool  decode pool returns the frames to the parent (pickled), which feeds them
+          to the inference pool (pickled again): two full-frame transfers per image
+    ring  frame_ring.RingPipeline: pixels go into shared-memory slots, queues
+          carry slot indices only
+
+Startup (process spawn, MediaPipe graph creation) is paid once in a warm-up
+batch and excluded. Frames are the synthetic drifting-face session from
+bench_face_roi.py written as PNG files.
+
+Usage:
+    python benchmarks/bench_frame_ring.py --frames 200 --resolution 1920 1080 --decoders 2 --workers 2
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+import fixtures
+import bench_face_roi
+
+sys.path.append(fixtures.BACKEND_DIR)
+
+_analyzer = None
+
+
+def _decode(path):
+    import cv2
+
+    return cv2.imread(path)
+
+
+def _init_analyzer():
+    global _analyzer
+    from gaze_worker import GazeAnalyzer
+
+    _analyzer = GazeAnalyzer()
+
+
+def _analyze(frame):
+    return _analyzer.estimate_gaze_frame(frame)
+
+
+def run_pool(paths, decoders, workers, warmup):
+    ctx = mp.get_context('spawn')
+    with ctx.Pool(decoders) as decode_pool, ctx.Pool(workers, initializer=_init_analyzer) as infer_pool:
+        list(infer_pool.imap(_analyze, decode_pool.imap(_decode, warmup)))
+        start = time.perf_counter()
+        results = list(infer_pool.imap(_analyze, decode_pool.imap(_decode, paths), chunksize=1))
+        return results, time.perf_counter() - start
+
+
+def run_ring(paths, decoders, workers, warmup, max_size):
+    import frame_ring
+
+    with frame_ring.RingPipeline(decoders, workers, max_size=max_size) as pipeline:
+        pipeline.map(warmup)
+        start = time.perf_counter()
+        results = pipeline.map(paths)
+        elapsed = time.perf_counter() - start
+        stats = {'slots': pipeline.slots, 'oversize_frames': pipeline.oversize_frames}
+    return results, elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared-memory frame ring against multiprocessing.Pool.")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--resolution", type=int, nargs=2, default=[1920, 1080], metavar=("W", "H"))
+    parser.add_argument("--decoders", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    import cv2
+
+    w, h = args.resolution
+    with tempfile.TemporaryDirectory(prefix='asd_ring_') as tmp:
+        paths = []
+        for i, frame in enumerate(bench_face_roi.synthetic_session(w, h, args.frames)):
+            paths.append(os.path.join(tmp, f'frame_{i:04d}.png'))
+            cv2.imwrite(paths[-1], frame)
+        warmup = paths[:max(args.workers, args.decoders) * 2]
+
+        pool_results, pool_s = run_pool(paths, args.decoders, args.workers, warmup)
+        ring_results, ring_s, ring_stats = run_ring(paths, args.decoders, args.workers, warmup, (w, h))
+
+    agree = sum(a.get('gaze_direction') == b.get('gaze_direction') for a, b in zip(pool_results, ring_results))
+    report = {
+        'resolution': f'{w}x{h}',
+        'frames': args.frames,
+        'decoders': args.decoders,
+        'workers': args.workers,
+        'frame_mb': round(w * h * 3 / 2 ** 20, 2),
+        'pool_fps': round(args.frames / pool_s, 2),
+        'ring_fps': round(args.frames / ring_s, 2),
+        'speedup': round(pool_s / ring_s, 2),
+        'ring': ring_stats,
+        'gaze_direction_agreement': round(agree / args.frames, 4),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Attention-distribution queries: scanning session documents vs. the columnar export (gaze_analytics.py).
+
+Generates mongoexport-style session dumps, then times:
+    scan          loading every session document and aggregating its
+                  snapshots in Python (what a full-collection scan costs
+                  before the network)
+    export        the initial gaze_analytics export, and an incremental
+                  export that adds a second, smaller batch of sessions
+    query         gaze_analytics query --by module, --by cohort, and a
+                  single-module, one-day query (partition pruning)
+
+The per-module frame counts and mean attention from the scan and the
+columnar query are compared.
+
+Usage:
+    python benchmarks/bench_gaze_analytics.py --sessions 2000 --snapshots 40
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from argparse import Namespace
+from collections import defaultdict
+
+import fixtures
+
+sys.path.insert(0, fixtures.BACKEND_DIR)
+import gaze_analytics  # noqa: E402
+
+
+def scan(paths):
+    """Per-module frames, mean attention and direction counts straight from the session documents."""
+    totals = defaultdict(lambda: {'frames': 0, 'score': 0.0, 'scored': 0, 'direction': defaultdict(int)})
+    for path in paths:
+        for doc in gaze_analytics.load_json_docs(path):
+            group = totals[doc.get('module') or 'live_gaze']
+            for snap in doc.get('snapshots') or []:
+                group['frames'] += 1
+                group['direction'][snap.get('gazeDirection') or 'unknown'] += 1
+                if snap.get('attentionScore') is not None:
+                    group['score'] += snap['attentionScore']
+                    group['scored'] += 1
+    return {module: {'frames': g['frames'], 'mean': g['score'] / g['scored'] if g['scored'] else None}
+            for module, g in totals.items()}
+
+
+def timed(fn, repeats=1):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def query_args(data, by='module', **kwargs):
+    return Namespace(data=data, by=by, cohort_map=kwargs.get('cohort_map'), module=kwargs.get('module'),
+                     since=kwargs.get('since'), until=kwargs.get('until'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gaze attention queries: document scan vs. columnar.")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--snapshots", type=int, default=40, help="Snapshots per session")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='asd_gaze_analytics_') as tmp:
+        first = fixtures.write_gaze_exports(tmp, args.sessions, args.snapshots, start_day=0)
+        second = fixtures.write_gaze_exports(tmp, max(1, args.sessions // 10), args.snapshots, start_day=7, seed=1)
+        data = os.path.join(tmp, 'dataset')
+        cohort_map = os.path.join(tmp, 'cohorts.csv')
+        with open(cohort_map, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['patient_id', 'cohort'])
+            writer.writerows([[f'{p:024x}', 'asd' if p % 2 else 'control'] for p in range(50)])
+
+        report = {'sessions': args.sessions, 'snapshots_per_session': args.snapshots}
+        initial, initial_s = timed(lambda: gaze_analytics.export(
+            gaze_analytics.JsonSource(first['gaze_sessions'], first['social_sessions'], first['social_frames']), data))
+        incremental, incremental_s = timed(lambda: gaze_analytics.export(
+            gaze_analytics.JsonSource(second['gaze_sessions'], second['social_sessions'], second['social_frames']),
+            data))
+        rerun, rerun_s = timed(lambda: gaze_analytics.export(
+            gaze_analytics.JsonSource(second['gaze_sessions'], second['social_sessions'], second['social_frames']),
+            data))
+        report['export'] = {
+            'initial': {'sessions': initial['sessions'], 'frames': initial['frames'], 's': round(initial_s, 3)},
+            'incremental': {'sessions': incremental['sessions'], 'frames': incremental['frames'],
+                            's': round(incremental_s, 3)},
+            'rerun': {'sessions': rerun['sessions'], 'skipped': rerun['skipped'], 's': round(rerun_s, 3)},
+        }
+        size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(data) for f in files)
+        dump = sum(os.path.getsize(p) for p in (first['gaze_sessions'], second['gaze_sessions']))
+        report['bytes'] = {'json_dump': dump, 'columnar': size}
+
+        scanned, scan_s = timed(lambda: scan([first['gaze_sessions'], second['gaze_sessions']]), args.repeats)
+        by_module, module_s = timed(lambda: gaze_analytics.query(query_args(data)), args.repeats)
+        _, cohort_s = timed(lambda: gaze_analytics.query(query_args(data, 'cohort', cohort_map=cohort_map)),
+                            args.repeats)
+        pruned, pruned_s = timed(lambda: gaze_analytics.query(
+            query_args(data, module=['live_gaze'], since='2026-01-02', until='2026-01-02')), args.repeats)
+        report['query_s'] = {'scan_by_module': round(scan_s, 4), 'columnar_by_module': round(module_s, 4),
+                             'columnar_by_cohort': round(cohort_s, 4), 'columnar_one_module_day': round(pruned_s, 4),
+                             'speedup_by_module': round(scan_s / module_s, 1)}
+        report['pruned_frames'] = pruned['frames']
+        report['max_mean_diff'] = max(abs(scanned[m]['mean'] - by_module['groups'][m]['attention']['mean'])
+                                      for m in scanned)
+        report['frames_match'] = all(scanned[m]['frames'] == by_module['groups'][m]['frames'] for m in scanned)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
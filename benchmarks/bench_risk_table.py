@@ -0,0 +1,83 @@
+"""
+Precomputed ASD risk table (risk_table.py) against the live model.
+
+Builds the table for the synthetic fixture model, then reports:
+  build_seconds / table_mb   one-off cost of tabulating all 5^9 integer inputs
+  parity                     over --check random grid points: predicted class
+                             agreement and max |probability| difference (percent
+                             points) between table and live model
+  cold_start_ms              spawn-per-call predict_asd_risk.py, live vs table
+  warm_p50_ms                in-process predict_asd_risk(), live vs table
+
+Usage:
+    python benchmarks/bench_risk_table.py --dtype uint8 --check 20000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import fixtures
+import run_benchmarks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the precomputed ASD risk table.")
+    parser.add_argument("--dtype", choices=['uint8', 'float16'], default='uint8')
+    parser.add_argument("--check", type=int, default=20000, help="Random grid points compared with the live model")
+    parser.add_argument("--cold-runs", type=int, default=5)
+    parser.add_argument("--warm-runs", type=int, default=200)
+    args = parser.parse_args()
+
+    import numpy as np
+
+    with tempfile.TemporaryDirectory(prefix='asd_risk_table_') as tmp:
+        workspace = fixtures.prepare_workspace(os.path.join(tmp, 'workspace'))
+        table_dir = os.path.join(tmp, 'table')
+        fixtures.write_asd_risk_model(workspace)
+        os.environ['ASD_MODEL_REGISTRY'] = fixtures.EMPTY_REGISTRY
+        os.environ['RISK_TABLE_DIR'] = table_dir
+        os.environ['RISK_TABLE_AUTOBUILD'] = '0'
+        sys.path.append(fixtures.BACKEND_DIR)
+        import risk_table
+
+        meta = risk_table.build(workspace, table_dir, args.dtype)
+        table = risk_table.RiskTable(table_dir, meta)
+        table_mb = sum(os.path.getsize(os.path.join(table_dir, meta[k])) for k in ('probs', 'pred')) / 2 ** 20
+
+        model, scaler = risk_table._load_model(workspace)
+        idx = np.random.default_rng(0).integers(0, risk_table.GRID_SIZE, args.check)
+        X = ((idx[:, None] // risk_table.PLACE_VALUES) % risk_table.LEVELS + 1).astype(float)
+        live_probs = model.predict_proba(scaler.transform(X))
+        live_pred = model.predict(scaler.transform(X))
+        table_probs = np.asarray(table.probs[idx], dtype=np.float64) / table.scale
+        table_pred = np.asarray(table.classes)[np.asarray(table.pred[idx])]
+
+        report = {
+            'dtype': args.dtype,
+            'build_seconds': meta['build_seconds'],
+            'table_mb': round(table_mb, 2),
+            'parity': {
+                'points': args.check,
+                'class_agreement': round(float(np.mean(table_pred == live_pred.astype(str))), 6),
+                'max_prob_diff_pct': round(float(np.abs(table_probs - live_probs).max() * 100), 4),
+            },
+        }
+
+        inputs = fixtures.asd_risk_inputs(64)
+        argv = [json.dumps(inputs[0])]
+        for mode in ('0', '1'):
+            os.environ['ASD_RISK_TABLE'] = mode
+            risk_table.ENABLED = mode == '1'
+            label = 'table' if mode == '1' else 'live'
+            report[f'cold_start_ms_{label}'] = round(
+                run_benchmarks.measure_cold(workspace, 'predict_asd_risk.py', argv, args.cold_runs), 2)
+            module = run_benchmarks.load_module(workspace, 'predict_asd_risk.py')
+            warm = run_benchmarks.measure_warm(module.predict_asd_risk, inputs, args.warm_runs, workspace)
+            report[f'warm_p50_ms_{label}'] = warm['warm_p50_ms']
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
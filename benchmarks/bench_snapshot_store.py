@@ -0,0 +1,148 @@
+"""
+Gaze snapshot storage: full-size PNG originals vs. snapshot_store.py derivatives.
+
+Writes synthetic camera-sized PNG snapshots, runs `snapshot_store.py compact`
+with --workers processes and reports:
+
+    bytes            originals vs. analysis + thumbnail derivatives
+    compact          transcode throughput, and the cost of an idempotent re-run
+    read_decode_ms   per-image read + decode, original vs. analysis derivative
+    parity           GazeAnalyzer on the originals vs. on the analysis
+                     derivatives (GAZE_READ_DERIVATIVES=0 / 1): faces detected,
+                     gaze_direction agreement, attention score and head angle
+                     differences, as in bench_face_roi.py; skipped with --no-gaze.
+                     Reading derivatives stays opt-in until this holds on real
+                     captures (--source-dir).
+
+Usage:
+    python benchmarks/bench_snapshot_store.py --images 200 --width 1280 --height 720 --workers 2
+    python benchmarks/bench_snapshot_store.py --source-dir uploads/gaze --images 100
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fixtures
+import run_benchmarks
+
+sys.path.insert(0, fixtures.BACKEND_DIR)
+import snapshot_store  # noqa: E402
+
+SCRIPT = os.path.join(fixtures.BACKEND_DIR, 'snapshot_store.py')
+
+
+def compact(directory, env, workers, *extra):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, SCRIPT, 'compact', directory, '--workers', str(workers), '--min-age', '0',
+                          *extra], env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out), time.perf_counter() - start
+
+
+def read_decode_ms(paths, repeats=3):
+    import cv2
+    import numpy as np
+
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for path in paths:
+            cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        elapsed = (time.perf_counter() - start) * 1000 / len(paths)
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3)
+
+
+def analyze(originals, env, read_derivatives):
+    code = ('import json, sys, gaze_worker; analyzer = gaze_worker.GazeAnalyzer(); '
+            'print(json.dumps([analyzer.estimate_gaze(p) for p in sys.stdin.read().splitlines()]))')
+    run_env = dict(env, GAZE_READ_DERIVATIVES='1' if read_derivatives else '0', GAZE_RESULT_CACHE='0')
+    out = subprocess.run([sys.executable, '-c', code], input='\n'.join(originals), env=run_env,
+                         capture_output=True, text=True, check=True, cwd=fixtures.BACKEND_DIR).stdout
+    return json.loads(out)
+
+
+def parity(original, derived):
+    pairs = [(a, b) for a, b in zip(original, derived) if 'error' not in a and 'error' not in b]
+    if not pairs:
+        return {'compared_frames': 0}
+
+    def diffs(key):
+        values = [abs(a[key] - b[key]) for a, b in pairs]
+        return round(max(values), 4), round(statistics.mean(values), 4)
+
+    attention_max, attention_mean = diffs('attention_score')
+    pitch_max, _ = diffs('head_pitch')
+    yaw_max, _ = diffs('head_yaw')
+    return {
+        'compared_frames': len(pairs),
+        'detected_original': sum('error' not in r for r in original),
+        'detected_derived': sum('error' not in r for r in derived),
+        'gaze_direction_agreement': round(sum(a['gaze_direction'] == b['gaze_direction'] for a, b in pairs) / len(pairs), 4),
+        'attention_score_max_abs_diff': attention_max,
+        'attention_score_mean_abs_diff': attention_mean,
+        'head_pitch_max_abs_diff': pitch_max,
+        'head_yaw_max_abs_diff': yaw_max,
+    }
+
+
+def copy_snapshots(source_dir, out_dir, count):
+    """Copy up to `count` real snapshots (sorted by name) from `source_dir` into `out_dir`."""
+    names = sorted(n for n in os.listdir(source_dir) if n.lower().endswith(snapshot_store.ORIGINAL_SUFFIXES))
+    return [shutil.copy2(os.path.join(source_dir, n), os.path.join(out_dir, n)) for n in names[:count]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gaze snapshot compaction.")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--source-dir", help="Real gaze snapshots to copy instead of drawing synthetic faces")
+    parser.add_argument("--no-gaze", action="store_true", help="Skip the GazeAnalyzer comparison")
+    args = parser.parse_args()
+
+    env = run_benchmarks.subprocess_env()
+    with tempfile.TemporaryDirectory(prefix='asd_snapshots_') as tmp:
+        if args.source_dir:
+            originals = copy_snapshots(args.source_dir, tmp, args.images)
+        else:
+            originals = fixtures.write_face_images(tmp, args.images, args.width, args.height)
+        first, first_s = compact(tmp, env, args.workers)
+        rerun, rerun_s = compact(tmp, env, args.workers)
+        derived = [snapshot_store.derivative_path(p, 'analysis') for p in originals]
+        thumbs = [snapshot_store.derivative_path(p, 'thumb') for p in originals]
+
+        original_bytes = sum(os.path.getsize(p) for p in originals)
+        analysis_bytes = sum(os.path.getsize(p) for p in derived)
+        thumb_bytes = sum(os.path.getsize(p) for p in thumbs)
+        report = {
+            'images': len(originals), 'resolution': args.source_dir or f'{args.width}x{args.height}',
+            'format': snapshot_store.FORMAT,
+            'bytes': {'originals': original_bytes, 'analysis': analysis_bytes, 'thumbs': thumb_bytes,
+                      'reduction': round(original_bytes / (analysis_bytes + thumb_bytes), 1)},
+            'compact': {'transcoded': first['transcoded'], 's': round(first_s, 2),
+                        'per_s': round(first['transcoded'] / first_s, 1),
+                        'rerun_skipped': rerun['skipped'], 'rerun_s': round(rerun_s, 2)},
+            'read_decode_ms': {'original': read_decode_ms(originals), 'analysis': read_decode_ms(derived),
+                               'thumb': read_decode_ms(thumbs)},
+        }
+        report['read_decode_ms']['speedup'] = round(report['read_decode_ms']['original'] /
+                                                    report['read_decode_ms']['analysis'], 1)
+        if not args.no_gaze:
+            sample = originals[:min(len(originals), 40)]
+            report['parity'] = parity(analyze(sample, env, False), analyze(sample, env, True))
+        deleted, _ = compact(tmp, env, args.workers, '--delete-originals')
+        report['delete_originals'] = {'deleted': deleted['deleted'],
+                                      'analysis_still_resolved': all(snapshot_store.analysis_source(p) == d
+                                                                     for p, d in zip(originals, derived))}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Aggregate throughput of concurrent predictors with and without the thread governor.
+
+Starts --procs processes at once, alternating between two CPU-bound workloads
+that mirror the production mix, and times how long the whole set takes:
+
+    gaze   GazeAnalyzer (gaze_worker.py) over --images fixture frames (OpenCV + MediaPipe)
+    blas   ROI correlation matrices and matmuls like the nilearn MRI path
+           (numpy/BLAS), --blas-iters iterations
+
+Modes:
+    ungoverned   ASD_THREAD_GOVERNOR=0: every library sizes its pools to all cores
+    governed     ASD_CONCURRENT_PROCESSES=--procs: each process gets cores // procs
+    pinned       governed plus ASD_CPU_AFFINITY=auto (disjoint core sets, by ASD_WORKER_SLOT)
+
+Reported per mode: wall seconds, items/s over all processes, and CPU seconds
+per item (user + system of the children). On a node with few cores the
+default pools are already small and the modes converge.
+
+Usage:
+    python benchmarks/bench_thread_governor.py --procs 8 --images 8 --blas-iters 40
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import fixtures
+import run_benchmarks
+
+GAZE_WORKLOAD = '''
+import sys
+import runtime_config
+runtime_config.configure()
+import gaze_worker
+analyzer = gaze_worker.GazeAnalyzer()
+for path in sys.stdin.read().split():
+    analyzer.estimate_gaze(path)
+print('{"ok": true}')
+'''
+
+BLAS_WORKLOAD = '''
+import sys
+import runtime_config
+import numpy as np
+runtime_config.configure()
+rng = np.random.default_rng(0)
+series = rng.standard_normal((400, 48 * 8))
+for _ in range(int(sys.argv[1])):
+    corr = np.corrcoef(series, rowvar=False)
+    np.linalg.eigvalsh(corr @ corr.T)
+print('{"ok": true}')
+'''
+
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_mode(mode, args, images, workspace):
+    env = run_benchmarks.subprocess_env()
+    env.pop('OMP_NUM_THREADS', None)
+    if mode == 'ungoverned':
+        env['ASD_THREAD_GOVERNOR'] = '0'
+    else:
+        env['ASD_CONCURRENT_PROCESSES'] = str(args.procs)
+        if mode == 'pinned':
+            env['ASD_CPU_AFFINITY'] = 'auto'
+    procs, items = [], 0
+    cpu_before = children_cpu()
+    start = time.perf_counter()
+    for slot in range(args.procs):
+        child_env = dict(env, ASD_WORKER_SLOT=str(slot))
+        if slot % 2 == 0:
+            cmd = [sys.executable, '-c', GAZE_WORKLOAD]
+            stdin, count = '\n'.join(images), len(images)
+        else:
+            cmd = [sys.executable, '-c', BLAS_WORKLOAD, str(args.blas_iters)]
+            stdin, count = '', args.blas_iters
+        procs.append((subprocess.Popen(cmd, cwd=workspace, env=child_env, stdin=subprocess.PIPE,
+                                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True), stdin))
+        items += count
+    for proc, stdin in procs:
+        out, _ = proc.communicate(stdin)
+        if proc.returncode != 0 or not out.strip():
+            raise RuntimeError(f"{mode}: a workload failed (exit {proc.returncode})")
+    wall = time.perf_counter() - start
+    cpu = children_cpu() - cpu_before
+    return {'wall_s': round(wall, 2), 'items_per_s': round(items / wall, 2), 'cpu_s_per_item': round(cpu / items, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent predictors with and without the thread governor.")
+    parser.add_argument("--procs", type=int, default=max(2, 2 * (os.cpu_count() or 1)))
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--blas-iters", type=int, default=40)
+    parser.add_argument("--modes", nargs='+', default=['ungoverned', 'governed', 'pinned'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='asd_threads_') as tmp:
+        workspace = fixtures.prepare_workspace(os.path.join(tmp, 'workspace'))
+        images = fixtures.write_face_images(tmp, args.images, 1280, 720)
+        report = {'cores': os.cpu_count(), 'procs': args.procs, 'modes': {}}
+        for mode in args.modes:
+            report['modes'][mode] = run_mode(mode, args, images, workspace)
+    base = report['modes'].get('ungoverned')
+    if base:
+        for result in report['modes'].values():
+            result['speedup'] = round(result['items_per_s'] / base['items_per_s'], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
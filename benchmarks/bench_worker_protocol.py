@@ -0,0 +1,123 @@
+"""
+One-shot spawn vs. a resident --serve worker speaking the framed protocol (worker_protocol.py).
+
+For each predictor:
+    spawn      `python script.py <argv>` per request, stdout JSON (the Node routes today)
+    framed     one `script.py --serve` process, requests sent one at a time (latency)
+               and then all at once (pipelined throughput), for each codec
+
+Also encodes a numeric payload (478 x 3 float32 landmarks plus scalars) with
+both codecs, to show the frame size and encode+decode cost.
+
+Usage:
+    python benchmarks/bench_worker_protocol.py --requests 50 --spawn-requests 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import fixtures
+import run_benchmarks
+
+sys.path.insert(0, fixtures.BACKEND_DIR)
+import worker_protocol  # noqa: E402
+
+
+def predictor_requests(workspace, data_dir, count):
+    """{script: [(argv, params)]} for the fixture models."""
+    fixtures.write_survey_model(workspace)
+    fixtures.write_asd_risk_model(workspace)
+    survey = [dict(zip(fixtures.SURVEY_FEATURES, x)) for x in fixtures.survey_inputs(count)]
+    risk = fixtures.asd_risk_inputs(count)
+    images = fixtures.write_face_images(data_dir, min(count, 16))
+    return {
+        'predict_survey.py': [([json.dumps(x)], x) for x in survey],
+        'predict_asd_risk.py': [([json.dumps(x)], x) for x in risk],
+        'gaze_worker.py': [([p], {'image_path': p}) for p in (images * count)[:count]],
+    }
+
+
+def spawn_latencies(workspace, script, requests, env):
+    latencies = []
+    for argv, _ in requests:
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, os.path.join(workspace, script)] + argv, cwd=workspace, env=env,
+                             capture_output=True, text=True).stdout
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        json.loads(out)
+    return latencies
+
+
+def framed(workspace, script, requests, env, codec):
+    start = time.perf_counter()
+    with worker_protocol.WorkerClient(os.path.join(workspace, script), codec=codec, cwd=workspace, env=env) as client:
+        ready_ms = (time.perf_counter() - start) * 1000.0
+        client.call(requests[0][1])  # first request loads the model
+        latencies = []
+        for _, params in requests:
+            start = time.perf_counter()
+            client.call(params)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        start = time.perf_counter()
+        futures = [client.submit(params) for _, params in requests]
+        for future in futures:
+            future.result()
+        pipelined = len(requests) / (time.perf_counter() - start)
+    return ready_ms, latencies, pipelined
+
+
+def codec_sizes(repeats=200):
+    landmarks = np.random.default_rng(0).random((478, 3), dtype=np.float32)
+    message = {'id': 1, 'result': {'gaze_direction': 'center', 'attention_score': 0.81, 'head_pitch': -3.2,
+                                   'head_yaw': 4.7, 'landmarks': landmarks}}
+    report = {}
+    for codec in ('json', 'msgpack') if worker_protocol.MSGPACK_AVAILABLE else ('json',):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            payload = worker_protocol.encode(message, codec)
+            worker_protocol.decode(payload, codec)
+        report[codec] = {'bytes': len(payload), 'encode_decode_us': round((time.perf_counter() - start) / repeats * 1e6, 1)}
+    return report
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {'p50_ms': round(statistics.median(ordered), 2), 'p95_ms': round(ordered[int(len(ordered) * 0.95) - 1], 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark spawn-per-request vs. framed resident workers.")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--spawn-requests", type=int, default=5)
+    parser.add_argument("--scripts", nargs="+", default=['predict_survey.py', 'predict_asd_risk.py', 'gaze_worker.py'])
+    args = parser.parse_args()
+
+    env = run_benchmarks.subprocess_env()
+    codecs = ['json', 'msgpack'] if worker_protocol.MSGPACK_AVAILABLE else ['json']
+    report = {'codec_payload': codec_sizes(), 'predictors': {}}
+    with tempfile.TemporaryDirectory(prefix='asd_protocol_') as tmp:
+        workspace = fixtures.prepare_workspace(os.path.join(tmp, 'workspace'))
+        data_dir = os.path.join(tmp, 'data')
+        os.makedirs(data_dir)
+        requests = predictor_requests(workspace, data_dir, args.requests)
+        for script in args.scripts:
+            spawn = summarize(spawn_latencies(workspace, script, requests[script][:args.spawn_requests], env))
+            row = {'spawn': spawn}
+            for codec in codecs:
+                ready_ms, latencies, pipelined = framed(workspace, script, requests[script], env, codec)
+                row[codec] = {'ready_ms': round(ready_ms, 1), **summarize(latencies),
+                              'pipelined_per_s': round(pipelined, 1),
+                              'speedup_p50': round(spawn['p50_ms'] / max(1e-6, statistics.median(latencies)), 1)}
+            report['predictors'][script] = row
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
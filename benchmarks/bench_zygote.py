@@ -0,0 +1,161 @@
+"""
+Zygote fork-server (zygote.py) against one interpreter per request.
+
+Reports, using the synthetic fixture models:
+  preload_s            zygote start-up (imports + model preload), paid once
+  fork_ms              p50/p95 of the fork() call in the zygote and of a full
+                       round trip for an empty script (no client interpreter)
+  per script           median end-to-end latency of `python script.py argv`
+                       against `python zygote_client.py script.py argv`, and
+                       whether both printed the same JSON
+  memory               /proc/<pid>/smaps_rollup of a child right after it ran
+                       predict_asd_risk, forked against spawned: RSS, PSS
+                       (RSS with shared pages divided among their users) and
+                       private/shared bytes, i.e. how much stays copy-on-write
+                       shared with the zygote
+
+Linux only (smaps_rollup, fork, SCM_RIGHTS).
+
+Usage:
+    python benchmarks/bench_zygote.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fixtures
+import run_benchmarks
+
+PROBE = '''
+import json, runpy, sys
+out, script = sys.argv[1], sys.argv[2]
+sys.argv = sys.argv[2:]
+try:
+    runpy.run_path(script, run_name='__main__')
+except SystemExit:
+    pass
+fields = {}
+with open('/proc/self/smaps_rollup') as f:
+    for line in f:
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == 'kB':
+            fields[parts[0].rstrip(':')] = int(parts[1])
+mb = lambda *keys: round(sum(fields.get(k, 0) for k in keys) / 1024, 1)
+with open(out, 'w') as f:
+    json.dump({'rss_mb': mb('Rss'), 'pss_mb': mb('Pss'), 'private_mb': mb('Private_Clean', 'Private_Dirty'),
+               'shared_mb': mb('Shared_Clean', 'Shared_Dirty')}, f)
+'''
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return round(samples[min(len(samples) - 1, int(len(samples) * q))], 3)
+
+
+def timed_run(cmd, cwd, env):
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - start) * 1000.0
+    lines = proc.stdout.strip().splitlines()
+    return elapsed, (json.loads(lines[-1]) if lines else None)
+
+
+def start_zygote(socket_path, workspace, env, timeout=300):
+    proc = subprocess.Popen([sys.executable, os.path.join(fixtures.BACKEND_DIR, 'zygote.py'), '--socket', socket_path,
+                             '--model-dir', workspace], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    start = time.perf_counter()
+    while not os.path.exists(socket_path):
+        if proc.poll() is not None or time.perf_counter() - start > timeout:
+            raise RuntimeError("zygote did not start")
+        time.sleep(0.05)
+    return proc, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the zygote fork-server against spawn-per-request.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--fork-runs", type=int, default=50)
+    parser.add_argument("--skip-progress", action="store_true", help="Skip predict_progress (TensorFlow)")
+    args = parser.parse_args()
+
+    sys.path.append(fixtures.BACKEND_DIR)
+    import zygote_client
+
+    with tempfile.TemporaryDirectory(prefix='asd_zygote_') as tmp:
+        workspace = fixtures.prepare_workspace(os.path.join(tmp, 'workspace'))
+        fixtures.write_asd_risk_model(workspace)
+        fixtures.write_survey_model(workspace)
+        cases = {
+            'predict_asd_risk.py': [json.dumps(fixtures.asd_risk_inputs(1)[0])],
+            'predict_survey.py': [json.dumps(dict(zip(fixtures.SURVEY_FEATURES, fixtures.survey_inputs(1)[0])))],
+            'gaze_worker.py': [fixtures.write_face_images(tmp, 1)[0]],
+        }
+        if not args.skip_progress:
+            fixtures.write_progress_model(workspace)
+            cases['predict_progress.py'] = [json.dumps(fixtures.progress_inputs(1)[0])]
+        empty = os.path.join(tmp, 'empty.py')
+        probe = os.path.join(tmp, 'probe.py')
+        with open(empty, 'w') as f:
+            f.write('')
+        with open(probe, 'w') as f:
+            f.write(PROBE)
+
+        socket_path = os.path.join(tmp, 'zygote.sock')
+        env = run_benchmarks.subprocess_env()
+        env['ASD_ZYGOTE_SOCKET'] = socket_path
+        zygote, preload_s = start_zygote(socket_path, workspace, env)
+        report = {'preload_s': round(preload_s, 2)}
+        try:
+            fork_ms, round_trip_ms = [], []
+            with open(os.devnull, 'r+') as devnull:
+                fds = [devnull.fileno()] * 3
+                for _ in range(args.fork_runs):
+                    start = time.perf_counter()
+                    reply = zygote_client.request(empty, [], fds, socket_path, cwd=tmp)
+                    round_trip_ms.append((time.perf_counter() - start) * 1000.0)
+                    fork_ms.append(reply['fork_ms'])
+            report['fork_ms'] = {'p50': percentile(fork_ms, 0.5), 'p95': percentile(fork_ms, 0.95),
+                                 'empty_round_trip_p50': percentile(round_trip_ms, 0.5)}
+
+            client = os.path.join(fixtures.BACKEND_DIR, 'zygote_client.py')
+            report['scripts'] = {}
+            for script, argv in cases.items():
+                spawn, forked, same = [], [], True
+                for _ in range(args.runs):
+                    ms, spawn_out = timed_run([sys.executable, script] + argv, workspace, env)
+                    spawn.append(ms)
+                    ms, fork_out = timed_run([sys.executable, client, script] + argv, workspace, env)
+                    forked.append(ms)
+                    same = same and spawn_out == fork_out and spawn_out is not None
+                report['scripts'][script] = {'spawn_ms': round(statistics.median(spawn), 2),
+                                             'zygote_ms': round(statistics.median(forked), 2),
+                                             'speedup': round(statistics.median(spawn) / statistics.median(forked), 2),
+                                             'same_output': same}
+
+            memory = {}
+            script, argv = 'predict_asd_risk.py', cases['predict_asd_risk.py']
+            out = os.path.join(tmp, 'memory.json')
+            subprocess.run([sys.executable, client, probe, out, script] + argv, cwd=workspace, env=env,
+                           capture_output=True)
+            with open(out) as f:
+                memory['forked'] = json.load(f)
+            subprocess.run([sys.executable, probe, out, script] + argv, cwd=workspace, env=env, capture_output=True)
+            with open(out) as f:
+                memory['spawned'] = json.load(f)
+            with open(f'/proc/{zygote.pid}/status') as f:
+                rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+            memory['zygote_rss_mb'] = round(rss_kb / 1024, 1)
+            report['memory'] = memory
+        finally:
+            zygote.terminate()
+            zygote.wait(timeout=30)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Synthetic fixtures for the inference benchmarks.
+
+Nothing here needs the real trained artifacts: face images are drawn with
+OpenCV, models are random-weight stand-ins with the same input shapes and
+output classes as the production ones, and MRI volumes are random 4D NIfTI
+images with a matching labels atlas. Every generator is seeded.
+"""
+import os
+import shutil
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Never populated: predictors resolve to the fixture artifacts next to them, not to published models
+EMPTY_REGISTRY = os.path.join(tempfile.gettempdir(), 'asd_benchmark_empty_registry')
+
+# Predictor scripts copied into the workspace so CWD- and __file__-relative
+# artifact loading behaves exactly as in production
+PREDICTOR_SCRIPTS = [
+    'gaze_worker.py',
+    'gaze_analysis.py',
+    'predict_asd_risk.py',
+    'predict_survey.py',
+    'predict_progress.py',
+]
+
+ASD_RISK_FEATURES = [
+    'communication', 'eye_contact', 'social_interaction', 'emotional_response', 'attention_span',
+    'repetitive_actions', 'sensory_sensitivity', 'speech_clarity', 'learning_adaptability',
+]
+SURVEY_FEATURES = ['PoorEyeContact', 'DelayedSpeech', 'DifficultyPeerInteraction',
+                   'RepetitiveMovements', 'Sensitivity', 'PrefersRoutine']
+PROGRESS_FEATURES = ['week', 'communication', 'social_skills', 'behavior_control', 'attention_span', 'sensory_response']
+
+# Harvard-Oxford cort-maxprob-thr25 has 48 cortical ROIs
+MRI_ROI_COUNT = 48
+
+
+def make_face_image(width=640, height=480, seed=0):
+    """Draw a frontal cartoon face (skin ellipse, eyes with irises, nose, mouth) as a BGR array."""
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width, 3), (200, 210, 220), dtype=np.uint8)
+    img = cv2.add(img, rng.integers(0, 12, img.shape, dtype=np.uint8))
+    cx, cy = width // 2, height // 2
+    fw, fh = int(min(width, height) * 0.28), int(min(width, height) * 0.38)
+    cv2.ellipse(img, (cx, cy), (fw, fh), 0, 0, 360, (150, 185, 225), -1)
+    for side in (-1, 1):
+        ex, ey = cx + side * int(fw * 0.42), cy - int(fh * 0.18)
+        cv2.ellipse(img, (ex, ey), (int(fw * 0.2), int(fh * 0.08)), 0, 0, 360, (245, 245, 245), -1)
+        cv2.circle(img, (ex, ey), int(fh * 0.065), (60, 40, 30), -1)
+        cv2.circle(img, (ex, ey), int(fh * 0.03), (10, 10, 10), -1)
+        cv2.ellipse(img, (ex, ey - int(fh * 0.14)), (int(fw * 0.22), int(fh * 0.04)), 0, 180, 360, (50, 60, 80), 3)
+    cv2.line(img, (cx, cy - int(fh * 0.05)), (cx, cy + int(fh * 0.2)), (110, 140, 180), 3)
+    cv2.ellipse(img, (cx, cy + int(fh * 0.45)), (int(fw * 0.35), int(fh * 0.08)), 0, 0, 180, (80, 80, 170), 4)
+    return img
+
+
+def write_face_images(out_dir, count, width=640, height=480, source=None):
+    """Write `count` PNG frames; `source` copies a real face photo instead of drawing one."""
+    import cv2
+
+    paths = []
+    base = cv2.imread(source) if source else None
+    if base is not None:
+        base = cv2.resize(base, (width, height))
+    for i in range(count):
+        img = base if base is not None else make_face_image(width, height, seed=i)
+        path = os.path.join(out_dir, f"face_{width}x{height}_{i:03d}.png")
+        cv2.imwrite(path, img)
+        paths.append(path)
+    return paths
+
+
+def asd_risk_inputs(count, seed=0):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    return [dict(zip(ASD_RISK_FEATURES, map(int, rng.integers(1, 6, len(ASD_RISK_FEATURES))))) for _ in range(count)]
+
+
+def survey_inputs(count, seed=0):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    return [list(map(int, rng.integers(0, 2, len(SURVEY_FEATURES)))) for _ in range(count)]
+
+
+def progress_inputs(count, seed=0):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(count):
+        row = {'week': int(rng.integers(1, 53))}
+        row.update({f: float(rng.uniform(20, 80)) for f in PROGRESS_FEATURES[1:]})
+        row['current_score'] = float(rng.uniform(20, 80))
+        rows.append(row)
+    return rows
+
+
+def write_asd_risk_model(out_dir, seed=0):
+    """Random-data LogisticRegression + StandardScaler with the production class names."""
+    import joblib
+    import numpy as np
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(seed)
+    X = rng.integers(1, 6, (600, len(ASD_RISK_FEATURES))).astype(float)
+    y = np.array(['Low', 'Medium', 'High'])[rng.integers(0, 3, len(X))]
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression(max_iter=500).fit(scaler.transform(X), y)
+    joblib.dump(model, os.path.join(out_dir, 'asd_model.pkl'))
+    joblib.dump(scaler, os.path.join(out_dir, 'scaler.pkl'))
+
+
+def write_survey_model(out_dir, seed=0):
+    import pickle
+    import numpy as np
+    from sklearn.tree import DecisionTreeClassifier
+
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 2, (400, len(SURVEY_FEATURES)))
+    y = np.where(X[:, 0] + X[:, 1] + rng.integers(0, 2, len(X)) >= 2, 'ASD', 'Non-ASD')
+    model = DecisionTreeClassifier(max_depth=3, random_state=seed).fit(X, y)
+    with open(os.path.join(out_dir, 'survey_dt.pkl'), 'wb') as f:
+        pickle.dump(model, f)
+
+
+def write_progress_model(out_dir, seed=0):
+    """Untrained network with the train_bpnn_model.py architecture plus fitted MinMax scalers."""
+    import pickle
+    import numpy as np
+    from sklearn.preprocessing import MinMaxScaler
+    import tensorflow as tf
+    from tensorflow import keras
+    from tensorflow.keras import layers
+
+    tf.random.set_seed(seed)
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.integers(1, 53, 200), rng.uniform(0, 100, (200, len(PROGRESS_FEATURES) - 1))])
+    y = rng.uniform(0, 100, (200, 1))
+    model = keras.Sequential([
+        layers.Dense(16, activation='relu', input_shape=(len(PROGRESS_FEATURES),)),
+        layers.Dropout(0.2),
+        layers.Dense(32, activation='relu'),
+        layers.Dropout(0.2),
+        layers.Dense(16, activation='relu'),
+        layers.Dense(1)
+    ])
+    model.compile(optimizer='adam', loss='mse')
+    model.save(os.path.join(out_dir, 'bpnn_progress_model.h5'))
+    with open(os.path.join(out_dir, 'bpnn_scaler_x.pkl'), 'wb') as f:
+        pickle.dump(MinMaxScaler().fit(X), f)
+    with open(os.path.join(out_dir, 'bpnn_scaler_y.pkl'), 'wb') as f:
+        pickle.dump(MinMaxScaler().fit(y), f)
+
+
+def write_mri_fixture(out_dir, shape=(40, 48, 40), timepoints=120, rois=MRI_ROI_COUNT, seed=0):
+    """Random 4D BOLD-like volume plus a labels atlas with `rois` regions on the same grid.
+
+    Returns (scan_path, atlas_path).
+    """
+    import nibabel as nib
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    affine = np.diag([4.0, 4.0, 4.0, 1.0])
+    # Partition the brain box into `rois` slabs along x/y so every label is non-empty
+    labels = np.zeros(shape, dtype=np.int16)
+    xs = np.array_split(np.arange(4, shape[0] - 4), 8)
+    ys = np.array_split(np.arange(4, shape[1] - 4), int(np.ceil(rois / 8)))
+    label = 1
+    for x_idx in xs:
+        for y_idx in ys:
+            if label > rois:
+                break
+            labels[np.ix_(x_idx, y_idx, np.arange(4, shape[2] - 4))] = label
+            label += 1
+    signal = rng.standard_normal((rois + 1, timepoints)).astype(np.float32)
+    bold = signal[labels] + 0.5 * rng.standard_normal(shape + (timepoints,)).astype(np.float32)
+
+    scan_path = os.path.join(out_dir, 'synthetic_bold.nii.gz')
+    atlas_path = os.path.join(out_dir, 'synthetic_atlas.nii.gz')
+    nib.save(nib.Nifti1Image(bold, affine), scan_path)
+    nib.save(nib.Nifti1Image(labels, affine), atlas_path)
+    return scan_path, atlas_path
+
+
+def write_mri_classifier(out_dir, rois=MRI_ROI_COUNT, seed=0):
+    """Random-data SVC + StandardScaler over the upper-triangle connectivity features of `rois` regions."""
+    import joblib
+    import numpy as np
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.svm import SVC
+
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(-1, 1, (80, rois * (rois - 1) // 2))
+    y = rng.integers(0, 2, len(X))
+    scaler = StandardScaler().fit(X)
+    joblib.dump(SVC().fit(scaler.transform(X), y), os.path.join(out_dir, 'asd_model.pkl'))
+    joblib.dump(scaler, os.path.join(out_dir, 'scaler.pkl'))
+
+
+def prepare_workspace(workspace):
+    """Copy predictor scripts into `workspace` (artifacts are written next to them)."""
+    os.makedirs(workspace, exist_ok=True)
+    for name in PREDICTOR_SCRIPTS:
+        shutil.copy2(os.path.join(BACKEND_DIR, name), os.path.join(workspace, name))
+    return workspace
+
+
+GAZE_MODULES = ['live_gaze', 'imitation_game', 'pattern_fixation']
+GAZE_DIRECTIONS = ['center', 'left', 'right', 'up', 'down', 'unknown']
+
+
+def write_gaze_exports(out_dir, sessions, snapshots=40, patients=50, start_day=0, seed=0):
+    """mongoexport-style JSON lines of finished gazesessions (+ social attention sessions/frames).
+
+    Returns {'gaze_sessions', 'social_sessions', 'social_frames'} paths. start_day offsets the
+    session ids and dates so a second call produces a later, disjoint batch.
+    """
+    import json
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    base_ms = 1767225600000 + start_day * 86400000  # 2026-01-01
+    paths = {name: os.path.join(out_dir, f'{name}_{start_day}.json')
+             for name in ('gaze_sessions', 'social_sessions', 'social_frames')}
+    with open(paths['gaze_sessions'], 'w') as f:
+        for i in range(sessions):
+            start = base_ms + int(rng.integers(0, 7 * 86400000))
+            times = start + np.sort(rng.integers(0, 600000, snapshots))
+            f.write(json.dumps({
+                '_id': {'$oid': f'{start_day:08x}{i:016x}'},
+                'patientId': {'$oid': f'{int(rng.integers(patients)):024x}'},
+                'module': GAZE_MODULES[i % len(GAZE_MODULES)],
+                'sessionType': 'authenticated', 'sessionSource': 'therapist', 'assignedRole': 'therapist',
+                'status': 'completed',
+                'startTime': {'$date': {'$numberLong': str(start)}},
+                'updatedAt': {'$date': {'$numberLong': str(int(times[-1]) + 1000)}},
+                'snapshots': [{'imagePath': f'uploads/gaze/{i}-{j}.png',
+                               'timestamp': {'$date': {'$numberLong': str(int(t))}},
+                               'gazeDirection': GAZE_DIRECTIONS[int(rng.integers(len(GAZE_DIRECTIONS)))],
+                               'attentionScore': round(float(rng.random()), 3),
+                               'headPitch': round(float(rng.normal(0, 8)), 2),
+                               'headYaw': round(float(rng.normal(0, 12)), 2), 'status': 'analyzed'}
+                              for j, t in enumerate(times)],
+            }) + '\n')
+    social = max(1, sessions // 10)
+    with open(paths['social_sessions'], 'w') as fs, open(paths['social_frames'], 'w') as ff:
+        for i in range(social):
+            session_id = f'SA-{start_day}-{i}'
+            start = base_ms + int(rng.integers(0, 7 * 86400000))
+            fs.write(json.dumps({'_id': {'$oid': f'{start_day:08x}{i:016x}'}, 'sessionId': session_id,
+                                 'studentId': {'$oid': f'{int(rng.integers(patients)):024x}'},
+                                 'testType': 'SOCIAL_ATTENTION', 'status': 'COMPLETED',
+                                 'startTime': {'$date': {'$numberLong': str(start)}},
+                                 'updatedAt': {'$date': {'$numberLong': str(start + 600000)}}}) + '\n')
+            for t in start + np.sort(rng.integers(0, 600000, snapshots)):
+                ff.write(json.dumps({'sessionId': session_id, 'timestamp': int(t),
+                                     'gazeDirection': ['left', 'right', 'center'][int(rng.integers(3))]}) + '\n')
+    return paths
@@ -0,0 +1,303 @@
+"""
+Load generator that replays Node-style prediction traffic against the Python entry points.
+
+The backend contract is "spawn interpreter, pass argv JSON or a file path, parse
+stdout JSON" (routes/gaze.js, teacher.js, parent.js, therapist.js). This tool
+sends an open-loop Poisson stream of such requests at --rate requests/second
+and reports, per mode and per script:
+    p50/p95/p99 latency (measured from the scheduled arrival, so queueing counts)
+    CPU seconds per request (user + system of the processes doing the work)
+    peak RSS of any single worker process
+
+Modes:
+    spawn     one interpreter per request, exactly like the Node routes today
+    resident  a pool of long-lived interpreters (resident_worker.py) reused across requests
+
+Request mixes are either synthetic (--mix script=weight ...) or replayed from a
+JSON-lines recording (--replay), one request per line:
+    {"script": "predict_survey.py", "argv": ["{\"PoorEyeContact\": 1, ...}"]}
+Scripts are resolved inside the synthetic fixture workspace, so recordings from
+production can be replayed without the real models.
+
+Usage:
+    python benchmarks/load_generator.py --rate 5 --duration 30 --modes spawn resident
+    python benchmarks/load_generator.py --replay traffic.jsonl --rate 20 --max-inflight 16
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fixtures
+
+DEFAULT_MIX = {
+    'predict_asd_risk.py': 4,
+    'predict_survey.py': 3,
+    'predict_progress.py': 1,
+    'gaze_worker.py': 4,
+}
+
+
+def build_workspace(workspace, scripts):
+    """Write the synthetic artifacts the selected scripts need; return per-script argv generators."""
+    fixtures.prepare_workspace(workspace)
+    data_dir = os.path.join(workspace, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    argv_pools = {}
+    if 'predict_asd_risk.py' in scripts:
+        fixtures.write_asd_risk_model(workspace)
+        argv_pools['predict_asd_risk.py'] = [[json.dumps(x)] for x in fixtures.asd_risk_inputs(64)]
+    if 'predict_survey.py' in scripts:
+        fixtures.write_survey_model(workspace)
+        argv_pools['predict_survey.py'] = [[json.dumps(dict(zip(fixtures.SURVEY_FEATURES, x)))]
+                                           for x in fixtures.survey_inputs(64)]
+    if 'predict_progress.py' in scripts:
+        fixtures.write_progress_model(workspace)
+        argv_pools['predict_progress.py'] = [[json.dumps(x)] for x in fixtures.progress_inputs(64)]
+    if 'gaze_worker.py' in scripts:
+        argv_pools['gaze_worker.py'] = [[p] for p in fixtures.write_face_images(data_dir, 16)]
+    return argv_pools
+
+
+def subprocess_env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [fixtures.BACKEND_DIR, env.get('PYTHONPATH')]))
+    env.setdefault('ASD_METRICS_STDERR', '0')
+    env['ASD_MODEL_REGISTRY'] = fixtures.EMPTY_REGISTRY
+    # Repeated fixture frames would otherwise be answered from the gaze result cache
+    env['GAZE_RESULT_CACHE'] = '0'
+    # Measure the live ASD risk model; benchmarks/bench_risk_table.py covers the table
+    env.setdefault('ASD_RISK_TABLE', '0')
+    env.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+    return env
+
+
+def read_proc_usage(pid):
+    """(cpu_seconds, peak_rss_mb) for a live Linux process from /proc."""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    ticks = os.sysconf('SC_CLK_TCK')
+    cpu = (int(fields[11]) + int(fields[12])) / ticks
+    peak_kb = 0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                peak_kb = int(line.split()[1])
+    return cpu, peak_kb / 1024.0
+
+
+class SpawnMode:
+    """One interpreter per request; CPU and peak RSS come from wait4() on the child."""
+    name = 'spawn'
+
+    def __init__(self, workspace):
+        self.workspace = workspace
+        self.env = subprocess_env()
+
+    def start(self):
+        pass
+
+    def call(self, script, argv):
+        proc = subprocess.Popen([sys.executable, os.path.join(self.workspace, script)] + list(argv),
+                                cwd=self.workspace, env=self.env,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        stdout = proc.stdout.read()
+        proc.stdout.close()
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        cpu = usage.ru_utime + usage.ru_stime
+        return stdout.decode(errors='replace'), cpu, usage.ru_maxrss / 1024.0
+
+    def stop(self):
+        pass
+
+
+class ResidentMode:
+    """A pool of resident_worker.py processes; each request borrows one idle worker."""
+    name = 'resident'
+
+    def __init__(self, workspace, workers):
+        self.workspace = workspace
+        self.size = workers
+        self.idle = queue.Queue()
+        self.procs = []
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resident_worker.py')
+        for _ in range(self.size):
+            proc = subprocess.Popen([sys.executable, script], cwd=self.workspace, env=subprocess_env(),
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                    text=True, bufsize=1)
+            json.loads(proc.stdout.readline())  # ready handshake
+            self.procs.append(proc)
+            self.idle.put(proc)
+
+    def call(self, script, argv):
+        proc = self.idle.get()
+        try:
+            with self.lock:
+                self.next_id += 1
+                request_id = self.next_id
+            cpu_before, _ = read_proc_usage(proc.pid)
+            proc.stdin.write(json.dumps({'id': request_id, 'script': os.path.join(self.workspace, script),
+                                         'argv': list(argv)}) + '\n')
+            proc.stdin.flush()
+            response = json.loads(proc.stdout.readline())
+            cpu_after, peak_rss = read_proc_usage(proc.pid)
+            return response.get('stdout', ''), cpu_after - cpu_before, peak_rss
+        finally:
+            self.idle.put(proc)
+
+    def warm_up(self, requests):
+        """Send one request of each kind to every worker so imports are paid before timing."""
+        for _ in range(self.size):
+            for script, argv in requests:
+                self.call(script, argv)
+
+    def stop(self):
+        for proc in self.procs:
+            proc.stdin.close()
+            proc.wait(timeout=30)
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 2)
+
+
+def summarize(samples, wall):
+    ok = [s for s in samples if s['ok']]
+    latencies = sorted(s['latency_ms'] for s in ok)
+    return {
+        'requests': len(samples),
+        'errors': len(samples) - len(ok),
+        'achieved_rps': round(len(ok) / wall, 2) if wall else 0.0,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'cpu_s_per_request': round(sum(s['cpu_s'] for s in ok) / len(ok), 4) if ok else None,
+        'peak_rss_mb': round(max((s['peak_rss_mb'] for s in samples), default=0.0), 1),
+    }
+
+
+def run_load(mode, requests, rate, duration, max_inflight, seed):
+    """Open-loop Poisson arrivals; latency is measured from each request's scheduled time."""
+    rng = random.Random(seed)
+    samples = []
+    lock = threading.Lock()
+
+    def issue(scheduled, script, argv):
+        try:
+            stdout, cpu, rss = mode.call(script, argv)
+            json.loads(stdout.strip().splitlines()[-1])
+            ok = True
+        except (IndexError, ValueError, OSError):
+            cpu, rss, ok = 0.0, 0.0, False
+        with lock:
+            samples.append({'script': script, 'ok': ok, 'cpu_s': cpu, 'peak_rss_mb': rss,
+                            'latency_ms': (time.perf_counter() - scheduled) * 1000.0})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_inflight) as pool:
+        scheduled = start
+        i = 0
+        while scheduled - start < duration:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            script, argv = requests[i % len(requests)]
+            pool.submit(issue, scheduled, script, argv)
+            i += 1
+            scheduled += rng.expovariate(rate)
+    wall = time.perf_counter() - start
+
+    report = {'overall': summarize(samples, wall), 'by_script': {}}
+    for script in sorted({s['script'] for s in samples}):
+        report['by_script'][script] = summarize([s for s in samples if s['script'] == script], wall)
+    return report
+
+
+def synthetic_requests(mix, argv_pools, count, seed):
+    rng = random.Random(seed)
+    scripts = list(mix)
+    weights = [mix[s] for s in scripts]
+    return [(script, rng.choice(argv_pools[script])) for script in rng.choices(scripts, weights, k=count)]
+
+
+def load_replay(path):
+    requests = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                requests.append((os.path.basename(entry['script']), entry.get('argv', [])))
+    if not requests:
+        raise SystemExit(f"No requests in {path}")
+    return requests
+
+
+def parse_mix(items):
+    mix = {}
+    for item in items:
+        script, _, weight = item.partition('=')
+        mix[script if script.endswith('.py') else f'{script}.py'] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay Node-style prediction traffic against the Python entry points.")
+    parser.add_argument("--modes", nargs="+", choices=["spawn", "resident"], default=["spawn", "resident"])
+    parser.add_argument("--rate", type=float, default=5.0, help="Target arrivals per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load per mode")
+    parser.add_argument("--max-inflight", type=int, default=16, help="Cap on concurrent requests (like a Node pool)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Resident worker processes")
+    parser.add_argument("--mix", nargs="+", default=None, metavar="SCRIPT=WEIGHT",
+                        help="Synthetic mix, e.g. predict_survey=3 gaze_worker=1")
+    parser.add_argument("--replay", default=None, help="JSON-lines recording of requests to replay")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='asd_load_') as workspace:
+        if args.replay:
+            requests = load_replay(args.replay)
+            build_workspace(workspace, {script for script, _ in requests})
+        else:
+            mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+            argv_pools = build_workspace(workspace, set(mix))
+            requests = synthetic_requests(mix, argv_pools, count=512, seed=args.seed)
+
+        report = {'rate': args.rate, 'duration_s': args.duration, 'max_inflight': args.max_inflight, 'modes': {}}
+        for name in args.modes:
+            print(f"Running {name} mode at {args.rate} req/s for {args.duration}s...", file=sys.stderr, flush=True)
+            mode = SpawnMode(workspace) if name == 'spawn' else ResidentMode(workspace, args.workers)
+            mode.start()
+            try:
+                if isinstance(mode, ResidentMode):
+                    mode.warm_up(list({script: (script, argv) for script, argv in requests}.values()))
+                report['modes'][name] = run_load(mode, requests, args.rate, args.duration, args.max_inflight, args.seed)
+            finally:
+                mode.stop()
+            if name == 'resident':
+                report['modes'][name]['workers'] = args.workers
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Resident interpreter for load testing: keeps one Python process alive and runs
+predictor scripts in it with the same argv/stdout contract Node uses.
+
+Protocol (JSON lines):
+    stdin:  {"id": 1, "script": "/abs/path/predict_survey.py", "argv": ["{...}"]}
+    stdout: {"id": 1, "exit_code": 0, "stdout": "{...}"}
+
+Each request re-runs the script as __main__ via runpy, so heavy library imports
+(numpy, cv2, mediapipe, tensorflow, sklearn) are paid once per process while
+the scripts themselves stay unmodified.
+"""
+import contextlib
+import io
+import json
+import os
+import runpy
+import sys
+
+
+def run_script(script, argv):
+    buf = io.StringIO()
+    saved_argv = sys.argv
+    sys.argv = [script] + list(argv)
+    exit_code = 0
+    try:
+        with contextlib.redirect_stdout(buf):
+            runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception as e:
+        buf.write(json.dumps({'error': f'Resident worker error: {e}'}))
+        exit_code = 1
+    finally:
+        sys.argv = saved_argv
+    return exit_code, buf.getvalue()
+
+
+def main():
+    # Keep the protocol channel separate from anything scripts print
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), 'w', buffering=1)
+    sys.stdout = sys.stderr
+    channel.write(json.dumps({'ready': True, 'pid': os.getpid()}) + '\n')
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        # Scripts resolve their artifacts relative to the CWD, like a spawn with cwd=script dir
+        os.chdir(os.path.dirname(request['script']))
+        exit_code, output = run_script(request['script'], request.get('argv', []))
+        channel.write(json.dumps({'id': request.get('id'), 'exit_code': exit_code, 'stdout': output}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+"""
+End-to-end benchmark suite for the Python inference paths.
+
+For each predictor this measures:
+  cold_start_ms      spawn-per-call latency, exactly as Node runs it (interpreter + imports + load + predict)
+  warm_p50_ms/p95_ms per-call latency with the module already imported in-process
+  batch_items_per_s  sequential throughput over --batch inputs
+
+All inputs and models are synthetic (see fixtures.py), so the suite runs on a
+clean checkout. Predictors whose dependencies are missing are reported as skipped.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench_results.json
+    python benchmarks/run_benchmarks.py --baseline bench_baseline.json --tolerance 0.15
+    python benchmarks/run_benchmarks.py --only predict_survey predict_asd_risk
+Exit code is 1 when --baseline is given and any metric regressed beyond the tolerance.
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fixtures
+
+LOWER_IS_BETTER = ('cold_start_ms', 'warm_p50_ms', 'warm_p95_ms')
+HIGHER_IS_BETTER = ('batch_items_per_s',)
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def load_module(workspace, script):
+    """Import a workspace copy of a predictor under a private module name."""
+    name = f"bench_{os.path.splitext(script)[0]}"
+    spec = importlib.util.spec_from_file_location(name, os.path.join(workspace, script))
+    module = importlib.util.module_from_spec(spec)
+    with working_directory(workspace):
+        spec.loader.exec_module(module)
+    return module
+
+
+def subprocess_env():
+    env = dict(os.environ)
+    # Shared helpers (instrumentation, ...) stay importable from the backend root
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [fixtures.BACKEND_DIR, env.get('PYTHONPATH')]))
+    env.setdefault('ASD_METRICS_STDERR', '0')
+    env['ASD_MODEL_REGISTRY'] = fixtures.EMPTY_REGISTRY
+    # Repeated fixture frames would otherwise be answered from the gaze result cache
+    env['GAZE_RESULT_CACHE'] = '0'
+    # Measure the live ASD risk model; benchmarks/bench_risk_table.py covers the table
+    env.setdefault('ASD_RISK_TABLE', '0')
+    env.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+    return env
+
+
+def measure_cold(workspace, script, argv, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, os.path.join(workspace, script)] + argv, cwd=workspace,
+                              capture_output=True, text=True, env=subprocess_env())
+        samples.append((time.perf_counter() - start) * 1000.0)
+        try:
+            json.loads(proc.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            raise RuntimeError(f"{script} produced no JSON result: {proc.stderr.strip()[-300:]}")
+    return statistics.median(samples)
+
+
+def measure_warm(fn, inputs, runs, cwd):
+    with working_directory(cwd):
+        fn(inputs[0])  # first call pays lazy initialization
+        samples = []
+        for i in range(runs):
+            start = time.perf_counter()
+            fn(inputs[i % len(inputs)])
+            samples.append((time.perf_counter() - start) * 1000.0)
+
+        start = time.perf_counter()
+        for item in inputs:
+            fn(item)
+        batch_s = time.perf_counter() - start
+    samples.sort()
+    return {
+        'warm_p50_ms': round(statistics.median(samples), 3),
+        'warm_p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'batch_items_per_s': round(len(inputs) / batch_s, 2),
+    }
+
+
+# --- Individual benchmarks. Each returns a result dict. ---
+
+def bench_gaze_worker(ctx):
+    images = fixtures.write_face_images(ctx.data_dir, ctx.args.batch, *ctx.args.resolution, source=ctx.args.face_image)
+    cold = measure_cold(ctx.workspace, 'gaze_worker.py', [images[0]], ctx.args.cold_runs)
+    module = load_module(ctx.workspace, 'gaze_worker.py')
+    analyzer = module.GazeAnalyzer()
+    result = measure_warm(analyzer.estimate_gaze, images, ctx.args.warm_runs, ctx.workspace)
+    result['face_detected'] = 'No face' not in str(analyzer.estimate_gaze(images[0]).get('error', ''))
+    return dict(cold_start_ms=round(cold, 2), **result)
+
+
+def bench_gaze_analysis(ctx):
+    import base64
+    import cv2
+
+    images = fixtures.write_face_images(ctx.data_dir, ctx.args.batch, *ctx.args.resolution, source=ctx.args.face_image)
+    payloads = []
+    for path in images:
+        ok, buf = cv2.imencode('.jpg', cv2.imread(path))
+        payloads.append("data:image/jpeg;base64," + base64.b64encode(buf.tobytes()).decode())
+    cold = measure_cold(ctx.workspace, 'gaze_analysis.py', ['--base64', payloads[0]], ctx.args.cold_runs)
+    module = load_module(ctx.workspace, 'gaze_analysis.py')
+    return dict(cold_start_ms=round(cold, 2), **measure_warm(module.analyze_gaze_from_base64, payloads, ctx.args.warm_runs, ctx.workspace))
+
+
+def bench_predict_asd_risk(ctx):
+    fixtures.write_asd_risk_model(ctx.workspace)
+    inputs = fixtures.asd_risk_inputs(ctx.args.batch)
+    cold = measure_cold(ctx.workspace, 'predict_asd_risk.py', [json.dumps(inputs[0])], ctx.args.cold_runs)
+    module = load_module(ctx.workspace, 'predict_asd_risk.py')
+    return dict(cold_start_ms=round(cold, 2), **measure_warm(module.predict_asd_risk, inputs, ctx.args.warm_runs, ctx.workspace))
+
+
+def bench_predict_survey(ctx):
+    fixtures.write_survey_model(ctx.workspace)
+    inputs = fixtures.survey_inputs(ctx.args.batch)
+    argv = [json.dumps(dict(zip(fixtures.SURVEY_FEATURES, inputs[0])))]
+    cold = measure_cold(ctx.workspace, 'predict_survey.py', argv, ctx.args.cold_runs)
+    module = load_module(ctx.workspace, 'predict_survey.py')
+    return dict(cold_start_ms=round(cold, 2), **measure_warm(module.predict_survey, inputs, ctx.args.warm_runs, ctx.workspace))
+
+
+def bench_predict_progress(ctx):
+    fixtures.write_progress_model(ctx.workspace)
+    inputs = fixtures.progress_inputs(ctx.args.batch)
+    cold = measure_cold(ctx.workspace, 'predict_progress.py', [json.dumps(inputs[0])], ctx.args.cold_runs)
+    module = load_module(ctx.workspace, 'predict_progress.py')
+    # Model loading happens inside every call, as in production
+    runs = max(3, ctx.args.warm_runs // 4)
+    return dict(cold_start_ms=round(cold, 2), **measure_warm(module.predict_progress, inputs[:runs], runs, ctx.workspace))
+
+
+def bench_mri_features(ctx):
+    """Masking + connectivity, the same calls as utils/app_mri.py process_new_scan."""
+    import numpy as np
+    from nilearn.maskers import NiftiLabelsMasker
+    from nilearn.connectome import ConnectivityMeasure
+
+    scan_path, atlas_path = fixtures.write_mri_fixture(ctx.data_dir)
+
+    def extract(path):
+        masker = NiftiLabelsMasker(labels_img=atlas_path, standardize=True)
+        time_series = masker.fit_transform(path)
+        correlation_matrix = ConnectivityMeasure(kind='correlation').fit_transform([time_series])[0]
+        return correlation_matrix[np.triu_indices(correlation_matrix.shape[0], k=1)]
+
+    start = time.perf_counter()
+    features = extract(scan_path)
+    first_ms = (time.perf_counter() - start) * 1000.0
+    runs = max(3, ctx.args.warm_runs // 4)
+    result = measure_warm(extract, [scan_path] * runs, runs, ctx.workspace)
+    return dict(cold_start_ms=round(first_ms, 2), feature_count=int(features.size), **result)
+
+
+BENCHMARKS = {
+    'gaze_worker': bench_gaze_worker,
+    'gaze_analysis': bench_gaze_analysis,
+    'predict_asd_risk': bench_predict_asd_risk,
+    'predict_survey': bench_predict_survey,
+    'predict_progress': bench_predict_progress,
+    'mri_features': bench_mri_features,
+}
+
+
+class Context:
+    def __init__(self, args, workspace):
+        self.args = args
+        self.workspace = workspace
+        self.data_dir = os.path.join(workspace, 'data')
+        os.makedirs(self.data_dir, exist_ok=True)
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against a stored baseline."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base or 'skipped' in current or 'skipped' in base:
+            continue
+        for metric in LOWER_IS_BETTER:
+            if metric in current and metric in base and current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}.{metric}: {base[metric]} -> {current[metric]} (+{current[metric] / base[metric] - 1:.0%})")
+        for metric in HIGHER_IS_BETTER:
+            if metric in current and metric in base and current[metric] < base[metric] / (1 + tolerance):
+                regressions.append(f"{name}.{metric}: {base[metric]} -> {current[metric]} ({current[metric] / base[metric] - 1:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark all Python inference paths on synthetic fixtures.")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run a subset of benchmarks")
+    parser.add_argument("--cold-runs", type=int, default=3)
+    parser.add_argument("--warm-runs", type=int, default=30)
+    parser.add_argument("--batch", type=int, default=32, help="Inputs per throughput batch")
+    parser.add_argument("--resolution", type=int, nargs=2, default=[640, 480], metavar=("W", "H"))
+    parser.add_argument("--face-image", default=None, help="Real face photo to use instead of the drawn face")
+    parser.add_argument("--output", default=None, help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="Baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before flagging")
+    args = parser.parse_args()
+    # In-process benchmarks import model_registry too
+    os.environ['ASD_MODEL_REGISTRY'] = fixtures.EMPTY_REGISTRY
+    os.environ['GAZE_RESULT_CACHE'] = '0'
+    os.environ.setdefault('ASD_RISK_TABLE', '0')
+
+    sys.path.append(fixtures.BACKEND_DIR)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='asd_bench_') as tmp:
+        ctx = Context(args, fixtures.prepare_workspace(tmp))
+        for name in args.only or BENCHMARKS:
+            print(f"Running {name}...", file=sys.stderr, flush=True)
+            try:
+                results[name] = BENCHMARKS[name](ctx)
+            except ImportError as e:
+                results[name] = {'skipped': f"missing dependency: {e.name or e}"}
+            except Exception as e:
+                results[name] = {'skipped': f"{type(e).__name__}: {e}"}
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'batch': args.batch,
+            'resolution': args.resolution,
+        },
+        'results': results,
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report['regressions'] = regressions
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
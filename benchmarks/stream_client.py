@@ -0,0 +1,121 @@
+"""
+Multi-session load client for gaze_stream_server.py (TCP transport).
+
+Opens one connection per simulated camera and streams JPEG-encoded synthetic
+frames at a fixed rate for --duration seconds. One optional "greedy" session
+sends much faster than the rest to check that it cannot starve them.
+
+Reported per session: frames sent, analyzed and dropped, and p50/p95 of the
+server-measured total latency. Overall: analyzed frames/s and Jain's fairness
+index over analyzed frames per session (1.0 = perfectly even). When every
+camera sends faster than its share of the analyzer, the greedy session should
+get about the same number of analyzed frames as the others.
+
+The synthetic frames barely change, so start the server with near-duplicate
+skipping off to measure real analysis load.
+
+Usage:
+    GAZE_DEDUP_DISTANCE=0 python gaze_stream_server.py --workers 2 &
+    python benchmarks/stream_client.py --sessions 4 --fps 10 --greedy-fps 60 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import struct
+import time
+
+import bench_face_roi
+
+HEADER = struct.Struct('>I')
+
+
+def encode_frames(width, height, count, seed):
+    import cv2
+
+    return [cv2.imencode('.jpg', f, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+            for f in bench_face_roi.synthetic_session(width, height, count, seed=seed)]
+
+
+def frame_payload(session_id, frame_id, image):
+    header = json.dumps({'session_id': session_id, 'frame_id': frame_id, 'sent_at': time.time()}).encode()
+    payload = HEADER.pack(len(header)) + header + image
+    return HEADER.pack(len(payload)) + payload
+
+
+async def run_session(host, port, session_id, frames, fps, duration):
+    reader, writer = await asyncio.open_connection(host, port)
+    stats = {'sent': 0, 'analyzed': 0, 'dropped': 0, 'errors': 0, 'latency_ms': []}
+
+    async def receive():
+        while True:
+            (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+            message = json.loads(await reader.readexactly(length))
+            if message.get('dropped'):
+                stats['dropped'] += 1
+            elif 'result' in message:
+                stats['analyzed'] += 1
+                stats['latency_ms'].append(message['latency_ms']['total'])
+            else:
+                stats['errors'] += 1
+
+    receiver = asyncio.create_task(receive())
+    start = time.perf_counter()
+    frame_id = 0
+    while time.perf_counter() - start < duration:
+        writer.write(frame_payload(session_id, frame_id, frames[frame_id % len(frames)]))
+        await writer.drain()
+        stats['sent'] += 1
+        frame_id += 1
+        await asyncio.sleep(max(0.0, start + frame_id / fps - time.perf_counter()))
+    # Let in-flight frames finish
+    await asyncio.sleep(2.0)
+    receiver.cancel()
+    writer.close()
+    return stats
+
+
+def summarize(stats):
+    latencies = sorted(stats.pop('latency_ms'))
+    if latencies:
+        stats['p50_ms'] = round(statistics.median(latencies), 2)
+        stats['p95_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+    return stats
+
+
+def jain_index(values):
+    if not any(values):
+        return None
+    return round(sum(values) ** 2 / (len(values) * sum(v * v for v in values)), 4)
+
+
+async def main_async(args):
+    frames = encode_frames(args.width, args.height, 30, seed=0)
+    sessions = {f'camera-{i}': args.fps for i in range(args.sessions)}
+    if args.greedy_fps:
+        sessions['camera-greedy'] = args.greedy_fps
+    results = await asyncio.gather(*[run_session(args.host, args.port, sid, frames, fps, args.duration)
+                                     for sid, fps in sessions.items()])
+    report = {'sessions': {sid: summarize(r) for sid, r in zip(sessions, results)}}
+    analyzed = [r['analyzed'] for r in report['sessions'].values()]
+    report['analyzed_fps'] = round(sum(analyzed) / args.duration, 2)
+    report['fairness_jain'] = jain_index(analyzed)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream synthetic camera sessions at gaze_stream_server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--fps", type=float, default=10.0, help="Frames per second per session")
+    parser.add_argument("--greedy-fps", type=float, default=0.0, help="Add one session sending this fast")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Append-only columnar datasets: a directory of immutable part files.
+
+Each write_part() call adds one file holding a batch of rows, written to a
+temporary name and renamed into place, so a reader (or a resumed batch job)
+never sees a half-written part and an interrupted writer loses at most the
+batch it was holding. Files are Parquet when pyarrow is installed; otherwise
+(or with ASD_COLUMNAR_FORMAT=npz) compressed .npz archives with the same
+columns. read_columns() reads either, and only the columns asked for.
+
+Column values passed to write_part:
+    1-D numpy array or list      one value per row (str, int, float)
+    2-D numpy array              fixed-length vector per row (e.g. a feature
+                                 vector), stored as a fixed-size list column
+Columns named in `dictionary` are dictionary-encoded (small set of repeated
+strings such as a label or a direction).
+
+Usage:
+    columnar.write_part('results/', {'scan_id': ids, 'features': X.astype(np.float32)})
+    cols = columnar.read_columns('results/', ['scan_id', 'status'])
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+FORMAT = os.environ.get('ASD_COLUMNAR_FORMAT', 'parquet' if PYARROW_AVAILABLE else 'npz')
+EXTENSIONS = ('.parquet', '.npz')
+# npz has no dictionary type: codes and categories are stored as two arrays
+_NPZ_CODES, _NPZ_CATEGORIES = '__codes__', '__categories__'
+
+
+def _as_array(values):
+    array = np.asarray(values)
+    if array.dtype == object:
+        array = array.astype(str)
+    return array
+
+
+def _arrow_column(array, dictionary):
+    if array.ndim == 2:
+        flat = pa.array(np.ascontiguousarray(array).reshape(-1))
+        return pa.FixedSizeListArray.from_arrays(flat, array.shape[1])
+    column = pa.array(array.tolist() if array.dtype.kind == 'U' else array)
+    return column.dictionary_encode() if dictionary else column
+
+
+def write_part(directory, columns, dictionary=(), fmt=None):
+    """Write one batch of rows as a new part file in `directory`. Returns its path."""
+    fmt = fmt or FORMAT
+    if fmt == 'parquet' and not PYARROW_AVAILABLE:
+        raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow (or set ASD_COLUMNAR_FORMAT=npz)")
+    arrays = {name: _as_array(values) for name, values in columns.items()}
+    lengths = {len(a) for a in arrays.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Columns have different lengths: { {n: len(a) for n, a in arrays.items()} }")
+    os.makedirs(directory, exist_ok=True)
+    # Sortable by write time; pid keeps concurrent writers apart
+    name = f'part-{time.time_ns():020d}-{os.getpid()}.{fmt}'
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.' + fmt)
+    os.close(fd)
+    try:
+        if fmt == 'parquet':
+            table = pa.table({n: _arrow_column(a, n in dictionary) for n, a in arrays.items()})
+            pq.write_table(table, tmp, compression='zstd')
+        else:
+            payload = {}
+            for n, a in arrays.items():
+                if n in dictionary and a.ndim == 1:
+                    categories, codes = np.unique(a, return_inverse=True)
+                    payload[n + _NPZ_CODES] = codes.astype(np.int32)
+                    payload[n + _NPZ_CATEGORIES] = categories
+                else:
+                    payload[n] = a
+            with open(tmp, 'wb') as f:
+                np.savez_compressed(f, **payload)
+        path = os.path.join(directory, name)
+        os.replace(tmp, path)
+        return path
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def list_parts(directory):
+    """Part files under `directory` (recursively), oldest first."""
+    parts = []
+    for root, _, files in os.walk(directory):
+        parts += [os.path.join(root, f) for f in files if f.startswith('part-') and f.endswith(EXTENSIONS)]
+    return sorted(parts, key=os.path.basename)
+
+
+def _read_parquet(path, names):
+    table = pq.read_table(path, columns=names)
+    out = {}
+    for name in table.column_names:
+        column = table.column(name).combine_chunks()
+        if pa.types.is_fixed_size_list(column.type):
+            out[name] = column.flatten().to_numpy(zero_copy_only=False).reshape(len(column), column.type.list_size)
+        elif pa.types.is_dictionary(column.type):
+            out[name] = np.asarray(column.dictionary.to_pylist(), dtype=str)[column.indices.to_numpy(zero_copy_only=False)]
+        elif pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            out[name] = np.asarray(column.to_pylist(), dtype=str)
+        else:
+            out[name] = column.to_numpy(zero_copy_only=False)
+    return out
+
+
+def _read_npz(path, names):
+    out = {}
+    with np.load(path, allow_pickle=False) as data:
+        for key in data.files:
+            if key.endswith(_NPZ_CODES):
+                name = key[:-len(_NPZ_CODES)]
+                if names is None or name in names:
+                    out[name] = data[name + _NPZ_CATEGORIES][data[key]]
+            elif not key.endswith(_NPZ_CATEGORIES) and (names is None or key in names):
+                out[key] = data[key]
+    return out
+
+
+def read_part(path, names=None):
+    return _read_parquet(path, names) if path.endswith('.parquet') else _read_npz(path, names)
+
+
+def read_columns(directory, names=None):
+    """Concatenate `names` (default: all columns) over every part in `directory`; {} when there are none."""
+    batches = [read_part(p, names) for p in list_parts(directory)] if os.path.isdir(directory) else []
+    batches = [b for b in batches if b]
+    if not batches:
+        return {}
+    keys = [k for k in batches[0] if all(k in b for b in batches)]
+    return {k: np.concatenate([b[k] for b in batches]) for k in keys}
@@ -0,0 +1,170 @@
+"""
+Per-session face region tracking for gaze frames.
+
+In live sessions the child's face sits in a small, stable part of the camera
+frame. FaceRoiTracker remembers the last face bounding box per session so the
+next frame can be run through FaceMesh on a padded crop instead of the whole
+frame; landmarks are then remapped to full-frame normalized coordinates, so
+everything downstream (head pose, gaze direction, attention score) is unchanged.
+
+A crop result is only trusted when the face sits well inside the crop and has
+not changed size abruptly; otherwise the caller re-runs the full frame and the
+ROI is refreshed from that result.
+
+Spawn-per-call workers keep nothing in memory between frames, so the tracker can
+also persist ROIs as tiny JSON files (GAZE_ROI_STATE_DIR); resident processes
+just keep the in-memory table. That table drops ROIs older than the TTL and
+holds at most GAZE_MAX_SESSIONS sessions (least recently updated first out),
+since resident workers are not always told when a session ends.
+"""
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+DEFAULT_STATE_DIR = os.environ.get('GAZE_ROI_STATE_DIR', os.path.join(tempfile.gettempdir(), 'asd_gaze_roi'))
+
+# Padding around the last face box, as a fraction of its larger side
+ROI_PADDING = float(os.environ.get('GAZE_ROI_PADDING', '0.6'))
+# ROIs older than this are ignored (child moved away, session paused, ...)
+ROI_TTL_SECONDS = float(os.environ.get('GAZE_ROI_TTL', '30'))
+MAX_SESSIONS = int(os.environ.get('GAZE_MAX_SESSIONS', '1024'))
+# Crop results whose face box comes closer than this to a crop edge (fraction of crop side) are rejected
+EDGE_MARGIN = 0.04
+# Crop results whose face box area changed more than this factor vs the remembered box are rejected
+MAX_SCALE_CHANGE = 1.8
+# Crop sides are rounded up to a multiple of this many pixels
+CROP_GRID = 64
+
+# FaceMesh face-oval contour; its extent is the face box (far cheaper than scanning all 478 landmarks)
+FACE_OVAL = [10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288, 397, 365, 379, 378, 400, 377,
+             152, 148, 176, 149, 150, 136, 172, 58, 132, 93, 234, 127, 162, 21, 54, 103, 67, 109]
+
+Landmark = namedtuple('Landmark', 'x y z')
+
+
+def landmark_bbox(landmarks, width, height):
+    """Pixel (x0, y0, x1, y1) of the face oval of normalized landmarks in a width x height image."""
+    xs = [landmarks[i].x for i in FACE_OVAL]
+    ys = [landmarks[i].y for i in FACE_OVAL]
+    return (min(xs) * width, min(ys) * height, max(xs) * width, max(ys) * height)
+
+
+def padded_square(bbox, frame_w, frame_h, padding=ROI_PADDING):
+    """Square crop around `bbox`, grown by `padding` and clamped to the frame. Integer (x0, y0, x1, y1)."""
+    x0, y0, x1, y1 = bbox
+    side = max(x1 - x0, y1 - y0) * (1.0 + 2.0 * padding)
+    # Snap to a coarse grid: FaceMesh reallocates its input buffers whenever the image size changes
+    side = min(math.ceil(side / CROP_GRID) * CROP_GRID, frame_w, frame_h)
+    cx, cy = (x0 + x1) / 2.0, (y0 + y1) / 2.0
+    left = int(round(min(max(cx - side / 2.0, 0), frame_w - side)))
+    top = int(round(min(max(cy - side / 2.0, 0), frame_h - side)))
+    side = int(round(side))
+    return left, top, left + side, top + side
+
+
+class RemappedLandmarks:
+    """Crop-normalized landmarks viewed as full-frame normalized coordinates.
+
+    Points are converted on access, since callers only read a few dozen of the 478.
+    MediaPipe's z uses the same scale as x, so it is rescaled by crop width / frame width.
+    """
+
+    def __init__(self, landmarks, crop, frame_w, frame_h):
+        x0, y0, x1, y1 = crop
+        self._landmarks = landmarks
+        self._sx, self._sy = (x1 - x0) / frame_w, (y1 - y0) / frame_h
+        self._ox, self._oy = x0 / frame_w, y0 / frame_h
+
+    def __len__(self):
+        return len(self._landmarks)
+
+    def __getitem__(self, index):
+        lm = self._landmarks[index]
+        return Landmark(lm.x * self._sx + self._ox, lm.y * self._sy + self._oy, lm.z * self._sx)
+
+
+def crop_is_confident(landmarks, crop, previous_bbox):
+    """True when the face found in `crop` (crop-normalized landmarks) is safely inside it and plausibly sized."""
+    x0, y0, x1, y1 = crop
+    cw, ch = x1 - x0, y1 - y0
+    bx0, by0, bx1, by1 = landmark_bbox(landmarks, 1.0, 1.0)
+    if min(bx0, by0, 1.0 - bx1, 1.0 - by1) < EDGE_MARGIN:
+        return False
+    area = (bx1 - bx0) * cw * (by1 - by0) * ch
+    prev_area = max(1.0, (previous_bbox[2] - previous_bbox[0]) * (previous_bbox[3] - previous_bbox[1]))
+    ratio = area / prev_area
+    return 1.0 / MAX_SCALE_CHANGE <= ratio <= MAX_SCALE_CHANGE
+
+
+class FaceRoiTracker:
+    """Last face bounding box per session, in full-frame pixels."""
+
+    def __init__(self, state_dir=None, padding=ROI_PADDING, ttl=ROI_TTL_SECONDS, max_sessions=MAX_SESSIONS):
+        self.state_dir = state_dir
+        self.padding = padding
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # session_id -> entry, least recently updated first
+        self._rois = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state_path(self, session_id):
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', str(session_id))
+        return os.path.join(self.state_dir, f'{safe}.json')
+
+    def _read(self, session_id):
+        entry = self._rois.get(session_id)
+        if entry is None and self.state_dir:
+            try:
+                with open(self._state_path(session_id)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+        return entry
+
+    def crop_for(self, session_id, frame_w, frame_h):
+        """Padded crop (x0, y0, x1, y1) to try first for this session's next frame, or None."""
+        entry = self._read(session_id)
+        if not entry or entry['frame'] != [frame_w, frame_h] or time.time() - entry['time'] > self.ttl:
+            return None
+        crop = padded_square(entry['bbox'], frame_w, frame_h, self.padding)
+        # No point cropping when the padded face already covers most of the frame
+        if (crop[2] - crop[0]) * (crop[3] - crop[1]) > 0.6 * frame_w * frame_h:
+            return None
+        return crop
+
+    def previous_bbox(self, session_id):
+        entry = self._read(session_id)
+        return entry['bbox'] if entry else None
+
+    def update(self, session_id, bbox, frame_w, frame_h):
+        entry = {'bbox': [float(v) for v in bbox], 'frame': [frame_w, frame_h], 'time': time.time()}
+        with self._lock:
+            self._rois[session_id] = entry
+            self._rois.move_to_end(session_id)
+            while self._rois:
+                oldest = next(iter(self._rois.values()))
+                if len(self._rois) <= self.max_sessions and entry['time'] - oldest['time'] <= self.ttl:
+                    break
+                self._rois.popitem(last=False)
+        if self.state_dir:
+            os.makedirs(self.state_dir, exist_ok=True)
+            path = self._state_path(session_id)
+            fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, prefix='.roi_')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+
+    def forget(self, session_id):
+        with self._lock:
+            self._rois.pop(session_id, None)
+        if self.state_dir:
+            try:
+                os.remove(self._state_path(session_id))
+            except OSError:
+                pass
@@ -0,0 +1,158 @@
+"""
+Frame-level result reuse for the gaze pipeline.
+
+Two independent layers, both consulted by GazeAnalyzer.estimate_gaze before any
+FaceMesh / solvePnP work:
+
+SessionFrames  per-session near-duplicate skipping. Each decoded frame gets a
+               64-bit difference hash (9x8 grayscale thumbnail, one bit per
+               horizontal gradient). A frame within GAZE_DEDUP_DISTANCE bits of
+               the session's last *analyzed* frame reuses that frame's result,
+               marked 'reused': True. Comparing against the last analyzed frame,
+               not the last reused one, keeps slow drift from being hidden.
+               Entries past the TTL are dropped, and at most GAZE_MAX_SESSIONS
+               are held in memory (least recently recorded first out).
+ResultCache    content-addressed results on disk, keyed by the SHA-256 of the
+               image file bytes plus ANALYZER_VERSION. Re-analysing stored
+               snapshots (recover_gaze_images.js --reanalyze,
+               repair_gaze_sessions.js) returns the stored result, marked
+               'cached': True. Nothing evicts entries, so the cache is opt-in
+               (GAZE_RESULT_CACHE=1): only the utils/gazeBatch.js re-analysis
+               worker turns it on, not live analysis or the stream servers.
+
+Layout: <cache_dir>/<version>/<hash[:2]>/<hash>.json
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Bits out of 64; 0 turns near-duplicate skipping off
+DEDUP_DISTANCE = int(os.environ.get('GAZE_DEDUP_DISTANCE', '3'))
+# A session's last analyzed frame is only reused for this long
+DEDUP_TTL_SECONDS = float(os.environ.get('GAZE_DEDUP_TTL', '10'))
+MAX_SESSIONS = int(os.environ.get('GAZE_MAX_SESSIONS', '1024'))
+RESULT_CACHE_ENABLED = os.environ.get('GAZE_RESULT_CACHE', '0') == '1'
+RESULT_CACHE_DIR = os.environ.get('GAZE_RESULT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'asd_gaze_results'))
+
+
+def dhash(image):
+    """64-bit difference hash of a BGR frame: 9x8 thumbnail, one bit per horizontal brightness step."""
+    # Subsample to ~64 px first; INTER_AREA straight from 1080p costs as much as a FaceMesh pass
+    step = max(1, min(image.shape[:2]) // 64)
+    small = cv2.resize(image[::step, ::step], (9, 8), interpolation=cv2.INTER_AREA)
+    small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_json_atomic(path, obj):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(obj, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SessionFrames:
+    """Last analyzed frame hash and result per session (in memory, optionally mirrored to state_dir)."""
+
+    def __init__(self, state_dir=None, max_distance=DEDUP_DISTANCE, ttl=DEDUP_TTL_SECONDS, max_sessions=MAX_SESSIONS):
+        self.state_dir = state_dir
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # session_id -> entry, least recently recorded first
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state_path(self, session_id):
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', str(session_id))
+        return os.path.join(self.state_dir, f'{safe}.frame.json')
+
+    def _read(self, session_id):
+        entry = self._frames.get(session_id)
+        if entry is None and self.state_dir:
+            try:
+                with open(self._state_path(session_id)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+        return entry
+
+    def lookup(self, session_id, frame_hash):
+        """Result of the session's last analyzed frame if `frame_hash` is a near duplicate of it, else None."""
+        if self.max_distance <= 0:
+            return None
+        entry = self._read(session_id)
+        if not entry or time.time() - entry['time'] > self.ttl:
+            return None
+        if hamming(entry['hash'], frame_hash) > self.max_distance:
+            return None
+        return dict(entry['result'], reused=True)
+
+    def record(self, session_id, frame_hash, result):
+        entry = {'hash': frame_hash, 'result': result, 'time': time.time()}
+        with self._lock:
+            self._frames[session_id] = entry
+            self._frames.move_to_end(session_id)
+            while self._frames:
+                oldest = next(iter(self._frames.values()))
+                if len(self._frames) <= self.max_sessions and entry['time'] - oldest['time'] <= self.ttl:
+                    break
+                self._frames.popitem(last=False)
+        if self.state_dir:
+            _write_json_atomic(self._state_path(session_id), entry)
+
+    def forget(self, session_id):
+        with self._lock:
+            self._frames.pop(session_id, None)
+        if self.state_dir:
+            try:
+                os.remove(self._state_path(session_id))
+            except OSError:
+                pass
+
+
+class ResultCache:
+    """Gaze results keyed by image content hash, namespaced by analyzer version."""
+
+    def __init__(self, version, cache_dir=RESULT_CACHE_DIR):
+        self.root = os.path.join(cache_dir, str(version))
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f'{key}.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return dict(json.load(f), cached=True)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        try:
+            _write_json_atomic(self._path(key), result)
+        except OSError:
+            # A read-only or full cache directory must never fail the analysis
+            pass
@@ -0,0 +1,205 @@
+"""
+Shared-memory frame ring for multi-process gaze analysis.
+
+Pickling a 1080p BGR frame (6 MB) through a multiprocessing queue costs a copy
+into the pipe, a copy out and two allocations, which at FaceMesh speeds is a
+large share of the per-frame budget. Here frames never travel over queues:
+
+    decoder processes   take a free slot index, decode the image and copy the
+                        BGR pixels into that slot of one SharedMemory block
+    inference processes read the slot as a NumPy view (no copy), run
+                        GazeAnalyzer.estimate_gaze_frame on it and hand the slot
+                        back
+    queues              carry only slot indices, shapes and small result dicts
+
+The number of slots bounds memory and provides backpressure: decoders block on
+the free-slot queue when inference falls behind. Frames larger than a slot are
+passed through the queue as a fallback (counted in the stats).
+
+Usage:
+    import frame_ring
+    with frame_ring.RingPipeline(decoders=2, workers=2) as pipeline:
+        results = pipeline.map(paths)
+"""
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import runtime_config
+import numpy as np
+
+DEFAULT_MAX_SIZE = (1920, 1080)
+_STOP = None
+
+
+class FrameRing:
+    """Fixed-size uint8 frame slots in one SharedMemory block."""
+
+    def __init__(self, shm, slots, max_height, max_width, channels=3, owner=False):
+        self.shm = shm
+        self.slots = slots
+        self.max_height = max_height
+        self.max_width = max_width
+        self.channels = channels
+        self.slot_bytes = max_height * max_width * channels
+        self.owner = owner
+
+    @classmethod
+    def create(cls, slots, max_width, max_height, channels=3):
+        shm = shared_memory.SharedMemory(create=True, size=slots * max_height * max_width * channels)
+        return cls(shm, slots, max_height, max_width, channels, owner=True)
+
+    @classmethod
+    def attach(cls, spec):
+        name, slots, max_height, max_width, channels = spec
+        # Pipeline processes are children of the creator and share its resource tracker, so
+        # the block is unlinked exactly once, by the creator's close() (or the tracker at exit)
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, slots, max_height, max_width, channels)
+
+    @property
+    def spec(self):
+        """Picklable description for attach() in another process."""
+        return (self.shm.name, self.slots, self.max_height, self.max_width, self.channels)
+
+    def fits(self, image):
+        h, w = image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1
+        return h <= self.max_height and w <= self.max_width and channels == self.channels
+
+    def view(self, slot, height, width):
+        """Writable NumPy view of the first height x width pixels of `slot`."""
+        offset = slot * self.slot_bytes
+        return np.ndarray((height, width, self.channels), dtype=np.uint8, buffer=self.shm.buf,
+                          offset=offset)
+
+    def write(self, slot, image):
+        h, w = image.shape[:2]
+        np.copyto(self.view(slot, h, w), image)
+        return h, w
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _decoder(ring_spec, tasks, free_slots, ready, threads):
+    import cv2
+
+    runtime_config.configure(budget=threads)
+    ring = FrameRing.attach(ring_spec)
+    try:
+        while True:
+            task = tasks.get()
+            if task is _STOP:
+                break
+            index, path = task
+            image = cv2.imread(path)
+            if image is None:
+                ready.put((index, None, None, {'error': f'Could not read image file: {path}'}))
+                continue
+            if not ring.fits(image):
+                ready.put((index, None, None, image))
+                continue
+            slot = free_slots.get()
+            h, w = ring.write(slot, image)
+            ready.put((index, slot, (h, w), None))
+    finally:
+        ring.shm.close()
+
+
+def _inference(ring_spec, ready, free_slots, results, threads):
+    from gaze_worker import GazeAnalyzer
+
+    runtime_config.configure(budget=threads)
+    ring = FrameRing.attach(ring_spec)
+    analyzer = GazeAnalyzer()
+    try:
+        while True:
+            item = ready.get()
+            if item is _STOP:
+                break
+            index, slot, shape, payload = item
+            if slot is None:
+                # Decode error (dict) or an oversize frame that came through the queue
+                oversize = not isinstance(payload, dict)
+                results.put((index, analyzer.estimate_gaze_frame(payload) if oversize else payload, oversize))
+                continue
+            try:
+                result = analyzer.estimate_gaze_frame(ring.view(slot, *shape))
+            finally:
+                free_slots.put(slot)
+            results.put((index, result, False))
+    finally:
+        ring.shm.close()
+
+
+class RingPipeline:
+    """Long-lived decoder and inference processes sharing one FrameRing.
+
+    with RingPipeline(decoders=2, workers=2) as pipeline:
+        results = pipeline.map(paths)
+    """
+
+    def __init__(self, decoders=2, workers=2, slots=None, max_size=DEFAULT_MAX_SIZE):
+        self.decoders = decoders
+        self.workers = workers
+        self.slots = slots or 2 * workers + decoders
+        self.max_size = max_size
+        self.oversize_frames = 0
+        self.ring = None
+        self.procs = []
+
+    def start(self):
+        ctx = mp.get_context('spawn')
+        self.ring = FrameRing.create(self.slots, *self.max_size)
+        self.tasks, self.free_slots, self.ready, self.results = ctx.Queue(), ctx.Queue(), ctx.Queue(), ctx.Queue()
+        for slot in range(self.slots):
+            self.free_slots.put(slot)
+        # One process-wide budget split across the pipeline's processes
+        threads = max(1, runtime_config.thread_budget() // (self.decoders + self.workers))
+        self.procs = [ctx.Process(target=_decoder, daemon=True,
+                                  args=(self.ring.spec, self.tasks, self.free_slots, self.ready, threads))
+                      for _ in range(self.decoders)]
+        self.procs += [ctx.Process(target=_inference, daemon=True,
+                                   args=(self.ring.spec, self.ready, self.free_slots, self.results, threads))
+                       for _ in range(self.workers)]
+        for proc in self.procs:
+            proc.start()
+        return self
+
+    def map(self, paths):
+        """Gaze results for `paths`, in input order."""
+        for index, path in enumerate(paths):
+            self.tasks.put((index, path))
+        ordered = [None] * len(paths)
+        for _ in range(len(paths)):
+            index, result, via_queue = self.results.get()
+            ordered[index] = result
+            self.oversize_frames += via_queue
+        return ordered
+
+    def close(self):
+        for _ in range(self.decoders):
+            self.tasks.put(_STOP)
+        for _ in range(self.workers):
+            self.ready.put(_STOP)
+        for proc in self.procs:
+            proc.join(timeout=30)
+            if proc.is_alive():
+                proc.terminate()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def analyze_images(paths, decoders=2, workers=2, slots=None, max_size=DEFAULT_MAX_SIZE):
+    """One-shot convenience: start a RingPipeline, analyze `paths` (results in input order), stop it."""
+    with RingPipeline(decoders, workers, slots, max_size) as pipeline:
+        return pipeline.map(paths)
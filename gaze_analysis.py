@@ -3,9 +3,12 @@ import json
 import math
 from typing import Dict, Tuple, Optional
 
+import runtime_config
 import cv2
 import numpy as np
 
+import instrumentation as metrics
+
 try:
     import mediapipe as mp
 except ImportError as e:
@@ -102,13 +105,16 @@ def analyze_gaze_from_base64(base64_image: str) -> Dict[str, object]:
 
     Returns JSON-serializable dict: { 'gaze_direction': 'Center|Left|Right', 'attention_score': float }
     """
-    image_bgr = _b64_to_bgr(base64_image)
-    image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
-
-    with mp_face_mesh.FaceMesh(static_image_mode=True,
-                               max_num_faces=1,
-                               refine_landmarks=True,  # critical for iris landmarks 468-477
-                               min_detection_confidence=0.5) as face_mesh:
+    with metrics.timer('decode'):
+        image_bgr = _b64_to_bgr(base64_image)
+        image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+
+    with metrics.timer('model_load'):
+        face_mesh = mp_face_mesh.FaceMesh(static_image_mode=True,
+                                          max_num_faces=1,
+                                          refine_landmarks=True,  # critical for iris landmarks 468-477
+                                          min_detection_confidence=0.5)
+    with face_mesh, metrics.timer('inference'):
         results = face_mesh.process(image_rgb)
 
     if not results.multi_face_landmarks:
@@ -172,5 +178,6 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Gaze analysis from base64 image using MediaPipe FaceMesh.")
     parser.add_argument("--base64", type=str, required=True, help="Base64 string or data URL of the image")
     args = parser.parse_args()
+    runtime_config.configure()
     result = analyze_gaze_from_base64(args.base64)
     print(json.dumps(result))
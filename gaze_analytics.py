@@ -0,0 +1,492 @@
+"""
+Columnar export of per-frame gaze results, and vectorized queries over it.
+
+Gaze results only live as GazeSession.snapshots subdocuments and
+SocialAttentionFrame rows, so every research question means a full scan of
+those collections. `export` flattens finished sessions to one row per frame
+and appends them to a columnar dataset (see columnar.py), partitioned
+hive-style by frame date and module:
+
+    <out>/date=YYYY-MM-DD/module=<module>/part-*.parquet
+
+Partitions are by module rather than by session: queries filter on date and
+module, and a directory per session would mean one tiny file per session.
+A session's frames stay together in the part its export run wrote.
+
+    source           "gaze_session" / "social_attention"
+    session_id, patient_id, module, session_type, session_source,
+    assigned_role, session_status, snapshot_status, gaze_direction
+                     dictionary-encoded strings ("" when missing)
+    date             frame date (UTC), also the partition directory
+    frame_index      int32, position of the frame in its session
+    timestamp_ms     int64, frame time (ms since epoch; social attention
+                     frames carry the client's timestamp)
+    session_updated_at  int64 ms, the session's updatedAt when exported
+    attention_score, head_pitch, head_yaw
+                     float32, NaN when the frame has none
+
+Only finished sessions are exported (GazeSession status other than "active",
+SocialAttentionSession status "COMPLETED"), each exactly once: session_ids
+already in the dataset are skipped and, with MongoDB, only sessions updated
+at or after the newest exported updatedAt are fetched. Sessions without
+frames write no rows, so they are looked at again by later runs. An export
+that stops early loses at most the partitions it had not yet written.
+
+`query` reads only the partitions and columns it needs and groups the frames
+with numpy: frame and session counts, attention score mean/quartiles/histogram
+and the share of each gaze direction, per module, per any other string column,
+or per cohort (--cohort-map CSV with patient_id,cohort columns).
+
+Sources: MongoDB at --mongo-uri / MONGO_URI (needs pymongo), or mongoexport
+files (JSON lines or --jsonArray) of the gazesessions, socialattentionsessions
+and socialattentionframes collections.
+
+Usage:
+    python gaze_analytics.py export --out gaze_analytics
+    python gaze_analytics.py export --out gaze_analytics --gaze-sessions gazesessions.json
+    python gaze_analytics.py query --data gaze_analytics --by module --since 2026-01-01
+    python gaze_analytics.py query --data gaze_analytics --by cohort --cohort-map cohorts.csv --module live_gaze
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+import time
+
+import runtime_config
+import numpy as np
+
+import columnar
+import instrumentation as metrics
+
+try:
+    import pymongo
+    PYMONGO_AVAILABLE = True
+except ImportError:
+    PYMONGO_AVAILABLE = False
+
+STRING_COLUMNS = ('source', 'session_id', 'patient_id', 'module', 'session_type', 'session_source',
+                  'assigned_role', 'session_status', 'snapshot_status', 'gaze_direction', 'date')
+DICTIONARY_COLUMNS = STRING_COLUMNS
+FLOAT_COLUMNS = ('attention_score', 'head_pitch', 'head_yaw')
+SOCIAL_ATTENTION_MODULE = 'social_attention'
+# Attention score histogram buckets: [0, 0.1), [0.1, 0.2), ..., [0.9, 1.0]
+HISTOGRAM_BINS = 10
+
+
+def _id(value):
+    """ObjectId / extended-JSON {"$oid"} / plain value -> str ("" for None)."""
+    if isinstance(value, dict):
+        value = value.get('$oid', value.get('_id', ''))
+    return '' if value is None else str(value)
+
+
+def _ms(value):
+    """datetime / extended-JSON {"$date"} / ISO string / number -> ms since epoch, or None."""
+    if isinstance(value, dict):
+        value = value.get('$date', value.get('$numberLong'))
+        if isinstance(value, dict):
+            value = value.get('$numberLong')
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return int(value.timestamp() * 1000)
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value)
+    if text.lstrip('-').isdigit():
+        return int(text)
+    parsed = datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def _float(value):
+    if isinstance(value, dict):
+        value = value.get('$numberDouble', value.get('$numberInt'))
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class FrameBatch:
+    """Column lists for a batch of frames, appended to per session."""
+
+    def __init__(self):
+        self.columns = {name: [] for name in STRING_COLUMNS + FLOAT_COLUMNS +
+                        ('frame_index', 'timestamp_ms', 'session_updated_at')}
+
+    def __len__(self):
+        return len(self.columns['session_id'])
+
+    def add_session(self, session, frames):
+        """session: dict of per-session strings + session_updated_at; frames: [(timestamp_ms, {column: value})]."""
+        columns = self.columns
+        for index, (timestamp, values) in enumerate(frames):
+            for name in STRING_COLUMNS:
+                columns[name].append(values.get(name, session.get(name, '')) or '')
+            for name in FLOAT_COLUMNS:
+                columns[name].append(values.get(name, float('nan')))
+            columns['frame_index'].append(index)
+            columns['timestamp_ms'].append(timestamp)
+            columns['session_updated_at'].append(session['session_updated_at'])
+
+    def arrays(self):
+        out = {name: np.asarray(self.columns[name], dtype=str) for name in STRING_COLUMNS}
+        out.update({name: np.asarray(self.columns[name], dtype=np.float32) for name in FLOAT_COLUMNS})
+        out['frame_index'] = np.asarray(self.columns['frame_index'], dtype=np.int32)
+        out['timestamp_ms'] = np.asarray(self.columns['timestamp_ms'], dtype=np.int64)
+        out['session_updated_at'] = np.asarray(self.columns['session_updated_at'], dtype=np.int64)
+        return out
+
+
+def _date(timestamp_ms):
+    return datetime.datetime.fromtimestamp(timestamp_ms / 1000, datetime.timezone.utc).strftime('%Y-%m-%d')
+
+
+def gaze_session_frames(doc):
+    """GazeSession document -> (session columns, [(timestamp_ms, frame columns)])."""
+    updated = _ms(doc.get('updatedAt')) or _ms(doc.get('endTime')) or _ms(doc.get('startTime')) or 0
+    start = _ms(doc.get('startTime')) or updated
+    session = {
+        'source': 'gaze_session',
+        'session_id': _id(doc.get('_id')),
+        'patient_id': _id(doc.get('patientId')),
+        'module': doc.get('module') or 'live_gaze',
+        'session_type': doc.get('sessionType') or '',
+        'session_source': doc.get('sessionSource') or '',
+        'assigned_role': doc.get('assignedRole') or '',
+        'session_status': doc.get('status') or '',
+        'session_updated_at': updated,
+    }
+    frames = []
+    for snap in doc.get('snapshots') or []:
+        timestamp = _ms(snap.get('timestamp')) or start
+        frames.append((timestamp, {
+            'date': _date(timestamp),
+            'gaze_direction': snap.get('gazeDirection') or 'unknown',
+            'snapshot_status': snap.get('status') or '',
+            'attention_score': _float(snap.get('attentionScore')),
+            'head_pitch': _float(snap.get('headPitch')),
+            'head_yaw': _float(snap.get('headYaw')),
+        }))
+    return session, frames
+
+
+def social_attention_frames(doc, frame_rows):
+    """SocialAttentionSession document + its SocialAttentionFrame rows (or its embedded frames)."""
+    updated = _ms(doc.get('updatedAt')) or _ms(doc.get('endTime')) or _ms(doc.get('startTime')) or 0
+    session = {
+        'source': 'social_attention',
+        'session_id': doc.get('sessionId') or _id(doc.get('_id')),
+        'patient_id': _id(doc.get('studentId')),
+        'module': SOCIAL_ATTENTION_MODULE,
+        'session_type': doc.get('testType') or '',
+        'assigned_role': 'teacher' if doc.get('teacherId') else '',
+        'session_status': doc.get('status') or '',
+        'session_updated_at': updated,
+    }
+    if frame_rows:
+        raw = [(_ms(f.get('timestamp')), f.get('gazeDirection')) for f in frame_rows]
+    else:
+        raw = [(_ms(f.get('timestamp')), f.get('gaze')) for f in doc.get('frames') or []]
+    raw.sort(key=lambda item: item[0] or 0)
+    fallback = _ms(doc.get('startTime')) or updated
+    frames = []
+    for timestamp, direction in raw:
+        timestamp = timestamp if timestamp is not None else fallback
+        frames.append((timestamp, {'date': _date(timestamp), 'gaze_direction': direction or 'unknown'}))
+    return session, frames
+
+
+def load_json_docs(path):
+    """mongoexport output: JSON lines, or a JSON array with --jsonArray."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class JsonSource:
+    def __init__(self, gaze_sessions=None, social_sessions=None, social_frames=None):
+        self.paths = (gaze_sessions, social_sessions, social_frames)
+
+    def gaze_sessions(self, since_ms):
+        return load_json_docs(self.paths[0]) if self.paths[0] else []
+
+    def social_sessions(self, since_ms):
+        return load_json_docs(self.paths[1]) if self.paths[1] else []
+
+    def social_frames(self, session_ids):
+        if not self.paths[2]:
+            return []
+        wanted = set(session_ids)
+        return [f for f in load_json_docs(self.paths[2]) if f.get('sessionId') in wanted]
+
+
+class MongoSource:
+    GAZE_FIELDS = ['patientId', 'module', 'sessionType', 'sessionSource', 'assignedRole', 'status',
+                   'startTime', 'endTime', 'updatedAt', 'snapshots.timestamp', 'snapshots.gazeDirection',
+                   'snapshots.status', 'snapshots.attentionScore', 'snapshots.headPitch', 'snapshots.headYaw']
+
+    def __init__(self, uri, database=None):
+        if not PYMONGO_AVAILABLE:
+            raise RuntimeError("Reading MongoDB needs pymongo: pip install pymongo (or export the collections "
+                               "with mongoexport and pass the files)")
+        self.client = pymongo.MongoClient(uri)
+        self.db = self.client[database] if database else self.client.get_default_database()
+
+    @staticmethod
+    def _since(since_ms):
+        if since_ms is None:
+            return {}
+        return {'updatedAt': {'$gte': datetime.datetime.fromtimestamp(since_ms / 1000, datetime.timezone.utc)}}
+
+    def gaze_sessions(self, since_ms):
+        query = {'status': {'$ne': 'active'}, **self._since(since_ms)}
+        return self.db.gazesessions.find(query, self.GAZE_FIELDS, batch_size=200)
+
+    def social_sessions(self, since_ms):
+        query = {'status': 'COMPLETED', **self._since(since_ms)}
+        return self.db.socialattentionsessions.find(query, batch_size=200)
+
+    def social_frames(self, session_ids):
+        return self.db.socialattentionframes.find({'sessionId': {'$in': list(session_ids)}},
+                                                  ['sessionId', 'gazeDirection', 'timestamp'])
+
+
+def exported_sessions(out):
+    """(session_ids already in the dataset, newest session_updated_at or None); reads two columns only."""
+    done = columnar.read_columns(out, ['session_id', 'session_updated_at'])
+    if not done:
+        return set(), None
+    return set(done['session_id'].tolist()), int(done['session_updated_at'].max())
+
+
+def write_partitions(out, batch):
+    """Write `batch` as one part per (date, module) partition; returns {partition: rows}."""
+    if not len(batch):
+        return {}
+    columns = batch.arrays()
+    keys = np.char.add(np.char.add(columns['date'], '/'), columns['module'])
+    partitions, inverse = np.unique(keys, return_inverse=True)
+    # Session then frame order inside each part keeps session_id runs contiguous
+    order = np.lexsort((columns['frame_index'], columns['session_id'], inverse))
+    bounds = np.searchsorted(inverse[order], np.arange(len(partitions) + 1))
+    written = {}
+    for i, key in enumerate(partitions):
+        rows = order[bounds[i]:bounds[i + 1]]
+        date, module = key.split('/', 1)
+        directory = os.path.join(out, f'date={date}', f'module={module}')
+        columnar.write_part(directory, {n: a[rows] for n, a in columns.items()}, dictionary=DICTIONARY_COLUMNS)
+        written[f'date={date}/module={module}'] = int(len(rows))
+    return written
+
+
+def export(source, out, include_active=False):
+    done, watermark = exported_sessions(out)
+    summary = {'sessions': 0, 'skipped': 0, 'empty': 0, 'frames': 0, 'partitions': {},
+               'output': os.path.abspath(out)}
+    batch = FrameBatch()
+
+    def add(session, frames):
+        if session['session_id'] in done:
+            summary['skipped'] += 1
+            return
+        done.add(session['session_id'])
+        summary['sessions'] += 1
+        if not frames:
+            summary['empty'] += 1
+        batch.add_session(session, frames)
+
+    with metrics.timer('read_sessions'):
+        for doc in source.gaze_sessions(watermark):
+            if doc.get('status') == 'active' and not include_active:
+                continue
+            add(*gaze_session_frames(doc))
+        social = [doc for doc in source.social_sessions(watermark)
+                  if include_active or doc.get('status') == 'COMPLETED']
+        social_ids = [doc.get('sessionId') for doc in social
+                      if (doc.get('sessionId') or _id(doc.get('_id'))) not in done]
+        frame_rows = {}
+        for row in source.social_frames(social_ids) if social_ids else []:
+            frame_rows.setdefault(row.get('sessionId'), []).append(row)
+        for doc in social:
+            add(*social_attention_frames(doc, frame_rows.get(doc.get('sessionId'))))
+
+    with metrics.timer('write_partitions'):
+        summary['partitions'] = write_partitions(out, batch)
+    summary['frames'] = len(batch)
+    metrics.inc('gaze_export_frames_total', len(batch))
+    return summary
+
+
+def select_partitions(data, since=None, until=None, modules=None):
+    """Leaf partition directories within [since, until] (YYYY-MM-DD, inclusive) and `modules`."""
+    selected = []
+    if not os.path.isdir(data):
+        return selected
+    for date_dir in sorted(os.listdir(data)):
+        if not date_dir.startswith('date='):
+            continue
+        date = date_dir[len('date='):]
+        if (since and date < since) or (until and date > until):
+            continue
+        for module_dir in sorted(os.listdir(os.path.join(data, date_dir))):
+            if module_dir.startswith('module=') and (not modules or module_dir[len('module='):] in modules):
+                selected.append(os.path.join(data, date_dir, module_dir))
+    return selected
+
+
+def load_frames(data, names, since=None, until=None, modules=None):
+    """Concatenated `names` columns over the selected partitions; {} when nothing matches."""
+    batches = [columnar.read_columns(p, names) for p in select_partitions(data, since, until, modules)]
+    batches = [b for b in batches if b]
+    if not batches:
+        return {}
+    return {name: np.concatenate([b[name] for b in batches]) for name in names}
+
+
+def load_cohort_map(path):
+    """CSV with patient_id,cohort columns -> {patient_id: cohort}."""
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['patient_id']: row['cohort'] for row in csv.DictReader(f)}
+
+
+def factorize(values):
+    """(uniques, codes) as np.unique(..., return_inverse=True) gives, but only the first value of each run of
+    equal values is sorted. Per-session columns come in runs (a part is ordered by session), so this is cheap."""
+    if not len(values):
+        return values[:0], np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate([[True], values[1:] != values[:-1]]))
+    uniques, run_codes = np.unique(values[starts], return_inverse=True)
+    return uniques, np.repeat(run_codes, np.diff(np.append(starts, len(values))))
+
+
+def cohort_labels(patient_ids, cohort_map, default='unassigned'):
+    # Map each distinct patient once, then broadcast back to the frames
+    unique, inverse = factorize(patient_ids)
+    labels = np.asarray([cohort_map.get(p, default) for p in unique.tolist()], dtype=str)
+    return labels[inverse] if len(unique) else np.asarray([], dtype=str)
+
+
+def attention_distribution(keys, session_ids, directions, scores):
+    """Per-group frame/session counts, attention score summary and gaze direction shares."""
+    groups, group_idx = factorize(keys)
+    n_groups = len(groups)
+    frames = np.bincount(group_idx, minlength=n_groups)
+
+    # Distinct (group, session) pairs
+    session_names, session_idx = factorize(session_ids)
+    pairs, _ = factorize(group_idx * len(session_names) + session_idx)
+    sessions = np.bincount(pairs // max(1, len(session_names)), minlength=n_groups)
+
+    dir_names, dir_idx = np.unique(directions, return_inverse=True)
+    dir_counts = np.bincount(group_idx * len(dir_names) + dir_idx,
+                             minlength=n_groups * len(dir_names)).reshape(n_groups, len(dir_names))
+
+    valid = ~np.isnan(scores)
+    scored_groups = group_idx[valid]
+    scored = scores[valid].astype(np.float64)
+    scored_counts = np.bincount(scored_groups, minlength=n_groups)
+    sums = np.bincount(scored_groups, weights=scored, minlength=n_groups)
+    bins = np.clip((scored * HISTOGRAM_BINS).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+    histogram = np.bincount(scored_groups * HISTOGRAM_BINS + bins,
+                            minlength=n_groups * HISTOGRAM_BINS).reshape(n_groups, HISTOGRAM_BINS)
+    # Quartiles: group the scores once (integer sort), then percentiles per group
+    sorted_scores = scored[np.argsort(scored_groups, kind='stable')]
+    starts = np.concatenate([[0], np.cumsum(scored_counts)[:-1]])
+
+    out = {}
+    for g, name in enumerate(groups.tolist()):
+        attention = {'frames': int(scored_counts[g])}
+        if scored_counts[g]:
+            run = sorted_scores[starts[g]:starts[g] + scored_counts[g]]
+            p25, p50, p75 = np.percentile(run, [25, 50, 75])
+            attention.update(mean=round(float(sums[g] / scored_counts[g]), 4), p25=round(float(p25), 4),
+                             p50=round(float(p50), 4), p75=round(float(p75), 4),
+                             histogram=histogram[g].tolist())
+        out[name] = {
+            'frames': int(frames[g]),
+            'sessions': int(sessions[g]),
+            'attention': attention,
+            'direction': {d: round(float(c) / frames[g], 4) for d, c in zip(dir_names.tolist(), dir_counts[g]) if c},
+        }
+    return out
+
+
+def query(args):
+    by = 'patient_id' if args.by == 'cohort' else args.by
+    names = sorted({by, 'session_id', 'gaze_direction', 'attention_score'})
+    start = time.perf_counter()
+    with metrics.timer('query_read'):
+        cols = load_frames(args.data, names, args.since, args.until, args.module)
+    read_s = time.perf_counter() - start
+    if not cols:
+        return {'by': args.by, 'frames': 0, 'groups': {}, 'read_s': round(read_s, 4)}
+
+    start = time.perf_counter()
+    with metrics.timer('query_compute'):
+        if args.by == 'cohort':
+            keys = cohort_labels(cols['patient_id'], load_cohort_map(args.cohort_map) if args.cohort_map else {})
+        else:
+            keys = cols[by]
+        groups = attention_distribution(keys, cols['session_id'], cols['gaze_direction'], cols['attention_score'])
+    return {'by': args.by, 'frames': int(len(keys)), 'groups': groups, 'read_s': round(read_s, 4),
+            'compute_s': round(time.perf_counter() - start, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export gaze frames to a columnar dataset and query it.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    exp = sub.add_parser('export', help="Append newly finished sessions to the dataset")
+    exp.add_argument("--out", default="gaze_analytics", help="Columnar dataset directory")
+    exp.add_argument("--mongo-uri", default=os.environ.get('MONGO_URI'))
+    exp.add_argument("--database", default=None, help="Database name when the URI has none")
+    exp.add_argument("--gaze-sessions", help="mongoexport of gazesessions (instead of MongoDB)")
+    exp.add_argument("--social-sessions", help="mongoexport of socialattentionsessions")
+    exp.add_argument("--social-frames", help="mongoexport of socialattentionframes")
+    exp.add_argument("--include-active", action="store_true",
+                     help="Also export sessions that are still active (they are not revisited later)")
+
+    qry = sub.add_parser('query', help="Attention distributions over the dataset")
+    qry.add_argument("--data", default="gaze_analytics")
+    qry.add_argument("--by", default="module",
+                     choices=['module', 'cohort', 'session_type', 'session_source', 'assigned_role', 'source',
+                              'date', 'patient_id', 'session_id'])
+    qry.add_argument("--cohort-map", help="CSV with patient_id,cohort columns (for --by cohort)")
+    qry.add_argument("--module", nargs="+", help="Only these modules")
+    qry.add_argument("--since", help="First frame date, YYYY-MM-DD")
+    qry.add_argument("--until", help="Last frame date, YYYY-MM-DD")
+    args = parser.parse_args()
+
+    metrics.init('gaze_analytics')
+    runtime_config.configure()
+    try:
+        if args.command == 'export':
+            if args.gaze_sessions or args.social_sessions or args.social_frames:
+                source = JsonSource(args.gaze_sessions, args.social_sessions, args.social_frames)
+            elif args.mongo_uri:
+                source = MongoSource(args.mongo_uri, args.database)
+            else:
+                raise ValueError("Set MONGO_URI / --mongo-uri or pass mongoexport files")
+            result = export(source, args.out, args.include_active)
+        else:
+            result = query(args)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(json.dumps({'error': str(e)}))
+        return 1
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""
+Streaming gaze analysis service.
+
+Replaces "one HTTP upload + one Python spawn per frame" for live_gaze and the
+social-attention /frame flow with a long-lived asyncio service around
+GazeAnalyzer. Clients push a continuous stream of encoded frames per session and
+get results back on the same connection, tagged with the frame id and the
+measured latency.
+
+Scheduling:
+    * every session has a bounded queue (--queue-size, default 1). When a new
+      frame arrives and the queue is full the oldest pending frame is dropped,
+      so with the default only the latest unprocessed frame is kept (latest
+      wins) and a slow analyzer never builds up lag. Dropped frames are reported
+      back as {"dropped": true}.
+    * a session has at most one frame in analysis at a time, and sessions with
+      pending frames are served round-robin, so one fast camera cannot starve
+      the others however many frames it sends.
+    * --workers analysis threads each own a GazeAnalyzer (MediaPipe graphs are
+      not shared between threads); per-session state (face ROI, near-duplicate
+      hash, head-pose seed) is shared so a session can move between workers.
+
+Transports:
+    TCP (always, --port): every message is a 4-byte big-endian length followed by
+        the payload. Client -> server payload: 4-byte big-endian header length,
+        JSON header {"session_id", "frame_id", "sent_at"?}, then the image bytes.
+        A payload that is a bare JSON object is a control message
+        ({"type": "close_session", "session_id"} or {"type": "metrics"}).
+        Server -> client payloads are JSON.
+    WebSocket (--ws-port, needs the optional `websockets` package): binary
+        messages carry the same payload as TCP without the outer length, text
+        messages are control messages; results are text messages.
+
+Result message:
+    {"session_id", "frame_id", "result": {...gaze_worker result...},
+     "latency_ms": {"queue", "analysis", "total"}, "sent_at"?}
+
+Usage:
+    python gaze_stream_server.py --port 8765 --ws-port 8766 --workers 2
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import runtime_config
+import cv2
+import numpy as np
+
+import instrumentation as metrics
+import face_roi
+import frame_cache
+import head_pose
+from gaze_worker import GazeAnalyzer
+
+HEADER = struct.Struct('>I')
+MAX_MESSAGE_BYTES = int(os.environ.get('GAZE_STREAM_MAX_MESSAGE', str(16 * 1024 * 1024)))
+
+
+class Frame:
+    __slots__ = ('session_id', 'frame_id', 'data', 'sent_at', 'received', 'reply')
+
+    def __init__(self, session_id, frame_id, data, sent_at, reply):
+        self.session_id = session_id
+        self.frame_id = frame_id
+        self.data = data
+        self.sent_at = sent_at
+        self.received = time.perf_counter()
+        self.reply = reply
+
+
+class Session:
+    def __init__(self, session_id, queue_size):
+        self.session_id = session_id
+        self.pending = collections.deque()
+        self.queue_size = queue_size
+        self.busy = False
+        self.dropped = 0
+        self.processed = 0
+
+
+class FrameScheduler:
+    """Per-session bounded queues, latest-wins dropping and round-robin dispatch to analysis workers."""
+
+    def __init__(self, workers=1, queue_size=1):
+        self.queue_size = queue_size
+        self.sessions = {}
+        self.ready = collections.deque()   # session ids with pending frames and nothing in analysis
+        self.wakeup = asyncio.Event()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gaze')
+        self.workers = workers
+        self._local = threading.local()
+        # Shared across analyzer threads so a session keeps its ROI / dedup / pose state on any worker
+        self.roi_tracker = face_roi.FaceRoiTracker()
+        self.session_frames = frame_cache.SessionFrames()
+        self.pose_solver = head_pose.PoseSolver()
+
+    def _analyzer(self):
+        analyzer = getattr(self._local, 'analyzer', None)
+        if analyzer is None:
+            analyzer = GazeAnalyzer(roi_tracker=self.roi_tracker, session_frames=self.session_frames)
+            analyzer.pose_solver = self.pose_solver
+            self._local.analyzer = analyzer
+        return analyzer
+
+    def _analyze(self, frame):
+        with metrics.timer('decode'):
+            image = cv2.imdecode(np.frombuffer(frame.data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            metrics.inc('frames_total', result='unreadable')
+            return {'error': 'Could not decode frame'}
+        return self._analyzer().estimate_gaze_frame(image, frame.session_id)
+
+    def submit(self, frame):
+        session = self.sessions.get(frame.session_id)
+        if session is None:
+            session = self.sessions[frame.session_id] = Session(frame.session_id, self.queue_size)
+        if len(session.pending) >= session.queue_size:
+            stale = session.pending.popleft()
+            session.dropped += 1
+            metrics.inc('stream_frames_total', result='dropped')
+            stale.reply({'session_id': stale.session_id, 'frame_id': stale.frame_id, 'dropped': True})
+        session.pending.append(frame)
+        if not session.busy and session.session_id not in self.ready:
+            self.ready.append(session.session_id)
+        self.wakeup.set()
+
+    def close_session(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is not None and session.session_id in self.ready:
+            self.ready.remove(session.session_id)
+        self.roi_tracker.forget(session_id)
+        self.session_frames.forget(session_id)
+        self.pose_solver.forget(session_id)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.workers)
+        while True:
+            await slots.acquire()
+            while not self.ready:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            session = self.sessions.get(self.ready.popleft())
+            if session is None or not session.pending:
+                slots.release()
+                continue
+            session.busy = True
+            frame = session.pending.popleft()
+            task = loop.run_in_executor(self.executor, self._timed_analyze, frame)
+            task.add_done_callback(lambda fut, s=session, f=frame: self._finished(fut, s, f, slots))
+
+    def _timed_analyze(self, frame):
+        started = time.perf_counter()
+        try:
+            result = self._analyze(frame)
+        except Exception as e:
+            result = {'error': f'Gaze analysis error: {e}'}
+        return started, result
+
+    def _finished(self, fut, session, frame, slots):
+        slots.release()
+        started, result = fut.result()
+        done = time.perf_counter()
+        session.busy = False
+        session.processed += 1
+        # Back of the line: other sessions with pending frames go first
+        if session.pending and self.sessions.get(session.session_id) is session:
+            self.ready.append(session.session_id)
+            self.wakeup.set()
+        latency = {
+            'queue': round((started - frame.received) * 1000.0, 2),
+            'analysis': round((done - started) * 1000.0, 2),
+            'total': round((done - frame.received) * 1000.0, 2),
+        }
+        metrics.inc('stream_frames_total', result='analyzed')
+        metrics.observe('stream_latency_seconds', done - frame.received)
+        message = {'session_id': frame.session_id, 'frame_id': frame.frame_id, 'result': result, 'latency_ms': latency}
+        if frame.sent_at is not None:
+            message['sent_at'] = frame.sent_at
+        frame.reply(message)
+
+
+def parse_frame_payload(payload):
+    """(header dict, image bytes) from a frame payload, or (control dict, None) for a bare JSON object."""
+    if payload[:1] == b'{':
+        return json.loads(payload), None
+    (header_len,) = HEADER.unpack_from(payload)
+    header = json.loads(payload[HEADER.size:HEADER.size + header_len])
+    return header, payload[HEADER.size + header_len:]
+
+
+class Connection:
+    """Transport-independent request handling; `send(message_dict)` is provided by the transport."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, scheduler, send):
+        self.scheduler = scheduler
+        self.send = send
+        self.name = f'conn-{next(self._ids)}'
+        self.sessions = set()
+
+    def handle(self, payload):
+        header, image = parse_frame_payload(payload)
+        if image is None:
+            return self.control(header)
+        session_id = str(header.get('session_id') or self.name)
+        self.sessions.add(session_id)
+        self.scheduler.submit(Frame(session_id, header.get('frame_id'), image, header.get('sent_at'), self.send))
+
+    def control(self, message):
+        kind = message.get('type')
+        if kind == 'close_session':
+            self.scheduler.close_session(str(message.get('session_id')))
+            self.sessions.discard(str(message.get('session_id')))
+        elif kind == 'metrics':
+            self.send({'type': 'metrics', 'metrics': metrics.export_json(), 'sessions': {
+                s.session_id: {'pending': len(s.pending), 'processed': s.processed, 'dropped': s.dropped}
+                for s in self.scheduler.sessions.values()}})
+        else:
+            self.send({'error': f'Unknown control message: {kind}'})
+
+    def closed(self):
+        for session_id in self.sessions:
+            self.scheduler.close_session(session_id)
+
+
+async def serve_tcp(scheduler, host, port):
+    async def client(reader, writer):
+        def send(message):
+            if writer.is_closing():
+                return
+            body = json.dumps(message).encode()
+            writer.write(HEADER.pack(len(body)) + body)
+
+        conn = Connection(scheduler, send)
+        try:
+            while True:
+                (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if length > MAX_MESSAGE_BYTES:
+                    send({'error': f'Message of {length} bytes exceeds {MAX_MESSAGE_BYTES}'})
+                    break
+                try:
+                    conn.handle(await reader.readexactly(length))
+                except (ValueError, struct.error) as e:
+                    send({'error': f'Malformed message: {e}'})
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            conn.closed()
+            writer.close()
+
+    return await asyncio.start_server(client, host, port)
+
+
+async def serve_websocket(scheduler, host, port):
+    try:
+        import websockets
+    except ImportError:
+        raise RuntimeError("WebSocket transport needs the websockets package: pip install websockets")
+
+    async def client(ws):
+        loop = asyncio.get_running_loop()
+
+        async def send_async(text):
+            try:
+                await ws.send(text)
+            except websockets.ConnectionClosed:
+                pass
+
+        def send(message):
+            loop.create_task(send_async(json.dumps(message)))
+
+        conn = Connection(scheduler, send)
+        try:
+            async for message in ws:
+                try:
+                    conn.handle(message if isinstance(message, bytes) else message.encode())
+                except (ValueError, struct.error) as e:
+                    send({'error': f'Malformed message: {e}'})
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            conn.closed()
+
+    return await websockets.serve(client, host, port, max_size=MAX_MESSAGE_BYTES)
+
+
+async def main_async(args):
+    metrics.init('gaze_stream_server')
+    print(f"Gaze stream server: threads {json.dumps(runtime_config.configure())}", file=sys.stderr, flush=True)
+    scheduler = FrameScheduler(workers=args.workers, queue_size=args.queue_size)
+    # Build the analyzers up front so the first frames do not pay for graph creation
+    await asyncio.gather(*[asyncio.get_running_loop().run_in_executor(scheduler.executor, scheduler._analyzer)
+                           for _ in range(args.workers)])
+    servers = [await serve_tcp(scheduler, args.host, args.port)]
+    print(f"Gaze stream server: tcp://{args.host}:{args.port}", file=sys.stderr, flush=True)
+    if args.ws_port:
+        servers.append(await serve_websocket(scheduler, args.host, args.ws_port))
+        print(f"Gaze stream server: ws://{args.host}:{args.ws_port}", file=sys.stderr, flush=True)
+    await scheduler.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming gaze analysis service.")
+    parser.add_argument("--host", default=os.environ.get('GAZE_STREAM_HOST', '127.0.0.1'))
+    parser.add_argument("--port", type=int, default=int(os.environ.get('GAZE_STREAM_PORT', '8765')))
+    parser.add_argument("--ws-port", type=int, default=int(os.environ.get('GAZE_STREAM_WS_PORT', '0')),
+                        help="Also serve WebSocket clients on this port (0 = off)")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get('GAZE_STREAM_WORKERS', '1')),
+                        help="Analysis threads, each with its own GazeAnalyzer")
+    parser.add_argument("--queue-size", type=int, default=int(os.environ.get('GAZE_STREAM_QUEUE', '1')),
+                        help="Pending frames kept per session; older ones are dropped")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main_async(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,13 @@ import json
 from pathlib import Path
 import os
 
+import runtime_config
+import instrumentation as metrics
+import face_roi
+import frame_cache
+import head_pose
+import snapshot_store
+
 try:
     import cv2
 except ImportError:
@@ -21,8 +28,12 @@ except ImportError:
     print(json.dumps({'error': 'MediaPipe not installed. Run: pip install mediapipe'}))
     sys.exit(1)
 
+# Bump whenever a change would alter results, so cached results from older code are not served
+ANALYZER_VERSION = 2
+
+
 class GazeAnalyzer:
-    def __init__(self):
+    def __init__(self, roi_tracker=None, session_frames=None, result_cache=None):
         self.mp_face_mesh = mp.solutions.face_mesh
         self.mp_drawing = mp.solutions.drawing_utils
         self.face_mesh = self.mp_face_mesh.FaceMesh(
@@ -31,37 +42,96 @@ class GazeAnalyzer:
             refine_landmarks=True,
             min_detection_confidence=0.5
         )
-        
-        self.face_3d = np.array([
-            [0.0, 0.0, 0.0],
-            [0.0, -330.0, -65.0],
-            [-225.0, 170.0, -135.0],
-            [225.0, 170.0, -135.0],
-            [-150.0, -150.0, -125.0],
-            [150.0, -150.0, -125.0]
-        ], dtype=np.float32)
-        
-        self.face_2d = np.array([
-            [0.0, 0.0],
-            [0.0, -330.0],
-            [-225.0, 170.0],
-            [225.0, 170.0],
-            [-150.0, -150.0],
-            [150.0, -150.0]
-        ], dtype=np.float32)
-
-    def estimate_gaze(self, image_path):
+
+        # Intrinsics are cached per resolution; consecutive frames of a session seed solvePnP
+        self.pose_solver = head_pose.PoseSolver()
+
+        # Per-session face boxes; frames with a session id try a padded crop first
+        self.roi_tracker = roi_tracker or face_roi.FaceRoiTracker()
+        # Near-duplicate frames within a session reuse the last analyzed result
+        self.session_frames = session_frames or frame_cache.SessionFrames()
+        # Identical image files (re-analysis of stored snapshots) are served from disk
+        if result_cache is None and frame_cache.RESULT_CACHE_ENABLED:
+            result_cache = frame_cache.ResultCache(ANALYZER_VERSION)
+        self.result_cache = result_cache
+
+    def _run_face_model(self, bgr):
+        """FaceMesh landmarks for a BGR image, or None with no face."""
+        results = self.face_mesh.process(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+        if not results.multi_face_landmarks:
+            return None
+        return results.multi_face_landmarks[0].landmark
+
+    def detect_landmarks(self, image, session_id=None):
+        """FaceMesh landmarks in full-frame normalized coordinates, or None when no face is found."""
+        h, w = image.shape[:2]
+        crop = self.roi_tracker.crop_for(session_id, w, h) if session_id is not None else None
+        if crop is not None:
+            x0, y0, x1, y1 = crop
+            with metrics.timer('inference', roi='crop'):
+                landmarks = self._run_face_model(image[y0:y1, x0:x1])
+            if landmarks is not None:
+                if face_roi.crop_is_confident(landmarks, crop, self.roi_tracker.previous_bbox(session_id)):
+                    landmarks = face_roi.RemappedLandmarks(landmarks, crop, w, h)
+                    self.roi_tracker.update(session_id, face_roi.landmark_bbox(landmarks, w, h), w, h)
+                    metrics.inc('roi_frames_total', result='crop')
+                    return landmarks
+            metrics.inc('roi_frames_total', result='fallback')
+
+        with metrics.timer('inference', roi='full'):
+            landmarks = self._run_face_model(image)
+        if landmarks is None:
+            if session_id is not None:
+                self.roi_tracker.forget(session_id)
+                self.pose_solver.forget(session_id)
+            return None
+        if session_id is not None:
+            self.roi_tracker.update(session_id, face_roi.landmark_bbox(landmarks, w, h), w, h)
+        return landmarks
+
+    def estimate_gaze(self, image_path, session_id=None):
+        with metrics.timer('decode'):
+            # A compacted-away original is read from its analysis derivative (see snapshot_store.py)
+            data = np.fromfile(snapshot_store.analysis_source(image_path), dtype=np.uint8)
+            key = frame_cache.content_hash(data) if self.result_cache else None
+            cached = self.result_cache.get(key) if key else None
+            image = None if cached else cv2.imdecode(data, cv2.IMREAD_COLOR)
+        if cached:
+            metrics.inc('frames_total', result='cached')
+            return cached
+        if image is None:
+            metrics.inc('frames_total', result='unreadable')
+            return {'error': f'Could not read image file: {image_path} (Invalid image format or corrupted file)'}
+        result = self.estimate_gaze_frame(image, session_id)
+        if key and not result.get('reused') and 'error' not in result:
+            self.result_cache.put(key, result)
+        return result
+
+    def estimate_gaze_frame(self, image, session_id=None):
+        """Gaze result for a decoded BGR frame.
+
+        With a `session_id`, near-duplicates of the session's last analyzed frame reuse its
+        result and the face region found in earlier frames is tried first.
+        """
+        if session_id is None:
+            return self._analyze_frame(image, None)
+        with metrics.timer('frame_hash'):
+            frame_hash = frame_cache.dhash(image)
+        reused = self.session_frames.lookup(session_id, frame_hash)
+        if reused is not None:
+            metrics.inc('frames_total', result='reused')
+            return reused
+        result = self._analyze_frame(image, session_id)
+        self.session_frames.record(session_id, frame_hash, result)
+        return result
+
+    def _analyze_frame(self, image, session_id):
         try:
-            image = cv2.imread(image_path)
-            if image is None:
-                return {'error': f'Could not read image file: {image_path} (Invalid image format or corrupted file)'}
-            
-            h, w, c = image.shape
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            h, w = image.shape[:2]
+            landmarks = self.detect_landmarks(image, session_id)
             
-            results = self.face_mesh.process(rgb_image)
-            
-            if not results.multi_face_landmarks:
+            if landmarks is None:
+                metrics.inc('frames_total', result='no_face')
                 return {
                     'error': 'No face detected in image',
                     'gaze_direction': 'unknown',
@@ -70,38 +140,10 @@ class GazeAnalyzer:
                     'head_yaw': 0.0
                 }
             
-            face_landmarks = results.multi_face_landmarks[0]
-            landmarks = face_landmarks.landmark
-            
-            face_2d_detected = []
-            face_3d_detected = []
-            
-            landmark_points = [33, 263, 1, 61, 291, 199]
-            
-            for idx, point in enumerate(landmark_points):
-                x = landmarks[point].x * w
-                y = landmarks[point].y * h
-                
-                face_2d_detected.append([x, y])
-                face_3d_detected.append(self.face_3d[idx])
-            
-            face_2d_detected = np.array(face_2d_detected, dtype=np.float32)
-            face_3d_detected = np.array(face_3d_detected, dtype=np.float32)
-            
-            focal_length = 1 * w
-            cam_matrix = np.array([
-                [focal_length, 0, h / 2],
-                [0, focal_length, w / 2],
-                [0, 0, 1]
-            ], dtype=np.float32)
-            
-            dist_coeffs = np.zeros((4, 1), dtype=np.float32)
-            
-            success, rotation_vec, translation_vec = cv2.solvePnP(
-                face_3d_detected, face_2d_detected, cam_matrix, dist_coeffs
-            )
-            
-            rotation_mat, _ = cv2.Rodrigues(rotation_vec)
+            with metrics.timer('head_pose'):
+                rotation_mat = self.pose_solver.solve(head_pose.image_points(landmarks, w, h), w, h, session_id)
+            if rotation_mat is None:
+                raise RuntimeError('Head pose estimation failed')
             
             angles = self.rotation_matrix_to_euler_angles(rotation_mat)
             pitch = angles[0]
@@ -111,8 +153,10 @@ class GazeAnalyzer:
             right_eye = np.array([landmarks[263].x, landmarks[263].y, landmarks[263].z])
             eye_center = (left_eye + right_eye) / 2
             
-            gaze_direction = self.classify_gaze_direction(pitch, yaw, eye_center, landmarks)
-            attention_score = self.calculate_attention_score(pitch, yaw, eye_center, landmarks)
+            with metrics.timer('postprocess'):
+                gaze_direction = self.classify_gaze_direction(pitch, yaw, eye_center, landmarks)
+                attention_score = self.calculate_attention_score(pitch, yaw, eye_center, landmarks)
+            metrics.inc('frames_total', result='ok')
             
             return {
                 'gaze_direction': gaze_direction,
@@ -122,6 +166,7 @@ class GazeAnalyzer:
             }
         
         except Exception as e:
+            metrics.inc('frames_total', result='error')
             return {
                 'error': str(e),
                 'gaze_direction': 'unknown',
@@ -131,20 +176,7 @@ class GazeAnalyzer:
             }
 
     def rotation_matrix_to_euler_angles(self, rotation_mat):
-        sy = np.sqrt(rotation_mat[0, 0] ** 2 + rotation_mat[1, 0] ** 2)
-        
-        singular = sy < 1e-6
-        
-        if not singular:
-            x = np.arctan2(rotation_mat[2, 1], rotation_mat[2, 2])
-            y = np.arctan2(-rotation_mat[2, 0], sy)
-            z = np.arctan2(rotation_mat[1, 0], rotation_mat[0, 0])
-        else:
-            x = np.arctan2(-rotation_mat[1, 2], rotation_mat[1, 1])
-            y = np.arctan2(-rotation_mat[2, 0], sy)
-            z = 0
-        
-        return np.array([np.degrees(x), np.degrees(y), np.degrees(z)])
+        return head_pose.rotation_matrices_to_euler(rotation_mat)[0]
 
     def classify_gaze_direction(self, pitch, yaw, eye_center, landmarks):
         iris_x = (landmarks[473].x + landmarks[474].x + landmarks[475].x + landmarks[476].x) / 4
@@ -211,12 +243,43 @@ class GazeAnalyzer:
         return min(1.0, max(0.0, attention_score))
 
 
+def serve():
+    """gaze_worker.py --serve: framed requests (see worker_protocol.py), params {"image_path", "session_id"?}.
+
+    One analyzer for the life of the process; session face regions and frame
+    history stay in memory instead of the on-disk state used per spawn.
+    """
+    import worker_protocol
+
+    with metrics.timer('model_load'):
+        analyzer = GazeAnalyzer()
+
+    def handle(params):
+        image_path = params['image_path']
+        if not os.path.isfile(snapshot_store.analysis_source(image_path)):
+            return {'image_path': image_path, 'error': f'File not found at path: {image_path}'}
+        return dict(analyzer.estimate_gaze(image_path, params.get('session_id')), image_path=image_path)
+
+    # MediaPipe graphs are not thread-safe: one request at a time
+    worker_protocol.serve(handle)
+
+
 def main():
+    runtime_config.configure()
+    if sys.argv[1:2] == ['--serve']:
+        serve()
+        return
     if len(sys.argv) < 2:
         print(json.dumps({'error': 'Image path required'}))
         sys.exit(1)
     
-    image_path = sys.argv[1]
+    # A compacted snapshot may only exist as its analysis derivative
+    image_path = snapshot_store.analysis_source(sys.argv[1])
+    # Optional: gaze_worker.py <image> --session <id> tracks the face region across a session's frames
+    session_id = None
+    if '--session' in sys.argv[2:]:
+        index = sys.argv.index('--session', 2)
+        session_id = sys.argv[index + 1] if index + 1 < len(sys.argv) else None
     
     if not os.path.exists(image_path):
         print(json.dumps({'error': f'File not found at path: {image_path}'}))
@@ -231,8 +294,16 @@ def main():
         sys.exit(1)
     
     try:
-        analyzer = GazeAnalyzer()
-        result = analyzer.estimate_gaze(image_path)
+        with metrics.timer('model_load'):
+            if session_id:
+                # Spawned per frame: session state lives on disk between calls
+                analyzer = GazeAnalyzer(
+                    roi_tracker=face_roi.FaceRoiTracker(state_dir=face_roi.DEFAULT_STATE_DIR),
+                    session_frames=frame_cache.SessionFrames(state_dir=face_roi.DEFAULT_STATE_DIR),
+                )
+            else:
+                analyzer = GazeAnalyzer()
+        result = analyzer.estimate_gaze(image_path, session_id)
         print(json.dumps(result))
     except Exception as e:
         print(json.dumps({'error': f'Gaze analysis error: {str(e)}'}))
@@ -0,0 +1,138 @@
+"""
+Head pose for the gaze pipeline.
+
+camera_intrinsics   pinhole camera matrix per frame resolution, built once and cached
+                    (focal length = width, principal point at the image centre).
+PoseSolver          solvePnP on the six FaceMesh anchor points. Within a session the
+                    previous frame's rvec/tvec seed the iterative solver
+                    (useExtrinsicGuess), which converges in a few iterations when the
+                    head barely moves; a failed seeded solve is retried from scratch.
+                    Seeds expire GAZE_POSE_SEED_TTL seconds after the session's last
+                    frame, and at most GAZE_MAX_SESSIONS are kept (least recently
+                    seen first out), so resident workers do not grow per session.
+rotation_matrices_to_euler
+                    vectorized rotation matrix -> (pitch, yaw, roll) degrees for a whole
+                    stack of frames, e.g. every frame of a session at once.
+"""
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# 3D anchor points (arbitrary units) for FaceMesh landmarks 33, 263, 1, 61, 291, 199
+MODEL_POINTS = np.array([
+    [0.0, 0.0, 0.0],
+    [0.0, -330.0, -65.0],
+    [-225.0, 170.0, -135.0],
+    [225.0, 170.0, -135.0],
+    [-150.0, -150.0, -125.0],
+    [150.0, -150.0, -125.0]
+], dtype=np.float64)
+LANDMARK_POINTS = [33, 263, 1, 61, 291, 199]
+
+DIST_COEFFS = np.zeros((4, 1), dtype=np.float64)
+
+# A seed from a frame older than this is more likely to mislead solvePnP than help it
+SEED_TTL_SECONDS = float(os.environ.get('GAZE_POSE_SEED_TTL', '10'))
+MAX_SESSIONS = int(os.environ.get('GAZE_MAX_SESSIONS', '1024'))
+
+
+@functools.lru_cache(maxsize=16)
+def camera_intrinsics(width, height):
+    """Camera matrix for a width x height frame: focal length = width, principal point (w/2, h/2)."""
+    focal_length = float(width)
+    cam_matrix = np.array([
+        [focal_length, 0.0, width / 2.0],
+        [0.0, focal_length, height / 2.0],
+        [0.0, 0.0, 1.0]
+    ], dtype=np.float64)
+    cam_matrix.setflags(write=False)
+    return cam_matrix
+
+
+def image_points(landmarks, width, height):
+    """Pixel coordinates of the anchor landmarks, shaped for solvePnP."""
+    return np.array([[landmarks[i].x * width, landmarks[i].y * height] for i in LANDMARK_POINTS],
+                    dtype=np.float64)
+
+
+class PoseSolver:
+    """solvePnP with per-session extrinsic seeding."""
+
+    def __init__(self, ttl=SEED_TTL_SECONDS, max_sessions=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # session_id -> (rvec, tvec, last seen), least recently seen first
+        self._previous = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _seed(self, session_id):
+        with self._lock:
+            entry = self._previous.get(session_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[2] > self.ttl:
+                del self._previous[session_id]
+                return None
+            return entry[0], entry[1]
+
+    def _remember(self, session_id, rvec, tvec):
+        now = time.monotonic()
+        with self._lock:
+            self._previous[session_id] = (rvec, tvec, now)
+            self._previous.move_to_end(session_id)
+            while self._previous:
+                oldest, entry = next(iter(self._previous.items()))
+                if len(self._previous) <= self.max_sessions and now - entry[2] <= self.ttl:
+                    break
+                del self._previous[oldest]
+
+    def solve(self, points_2d, width, height, session_id=None):
+        """Rotation matrix (3x3) for the anchor points, or None if solvePnP fails."""
+        cam_matrix = camera_intrinsics(width, height)
+        guess = self._seed(session_id) if session_id is not None else None
+        success = False
+        if guess is not None:
+            rvec, tvec = guess[0].copy(), guess[1].copy()
+            success, rvec, tvec = cv2.solvePnP(MODEL_POINTS, points_2d, cam_matrix, DIST_COEFFS,
+                                               rvec, tvec, useExtrinsicGuess=True,
+                                               flags=cv2.SOLVEPNP_ITERATIVE)
+        if not success:
+            success, rvec, tvec = cv2.solvePnP(MODEL_POINTS, points_2d, cam_matrix, DIST_COEFFS,
+                                               flags=cv2.SOLVEPNP_ITERATIVE)
+        if not success:
+            self.forget(session_id)
+            return None
+        if session_id is not None:
+            self._remember(session_id, rvec, tvec)
+        rotation_mat, _ = cv2.Rodrigues(rvec)
+        return rotation_mat
+
+    def forget(self, session_id):
+        with self._lock:
+            self._previous.pop(session_id, None)
+
+
+def rotation_matrices_to_euler(rotation_mats):
+    """(N, 3, 3) rotation matrices -> (N, 3) Euler angles in degrees (x/pitch, y/yaw, z/roll)."""
+    r = np.asarray(rotation_mats, dtype=np.float64).reshape(-1, 3, 3)
+    sy = np.sqrt(r[:, 0, 0] ** 2 + r[:, 1, 0] ** 2)
+    singular = sy < 1e-6
+    x = np.where(singular, np.arctan2(-r[:, 1, 2], r[:, 1, 1]), np.arctan2(r[:, 2, 1], r[:, 2, 2]))
+    y = np.arctan2(-r[:, 2, 0], sy)
+    z = np.where(singular, 0.0, np.arctan2(r[:, 1, 0], r[:, 0, 0]))
+    return np.degrees(np.stack([x, y, z], axis=1))
+
+
+def solve_sequence(points_seq, width, height):
+    """Euler angles (N, 3) for a session's anchor points, each frame seeded by the previous one."""
+    solver = PoseSolver()
+    mats = []
+    for points_2d in points_seq:
+        rotation_mat = solver.solve(points_2d, width, height, session_id='sequence')
+        mats.append(rotation_mat if rotation_mat is not None else np.full((3, 3), np.nan))
+    return rotation_matrices_to_euler(np.stack(mats)) if mats else np.empty((0, 3))
@@ -2,6 +2,7 @@ require('dotenv').config({ debug: true });
 const express = require('express');
 const cors = require('cors');
 const path = require('path');
+const { snapshotFallback } = require('./utils/snapshotStore');
 const fs = require('fs');
 const { spawn } = require('child_process');
 const mongoose = require('mongoose');
@@ -57,6 +58,8 @@ if (!fs.existsSync(credentialsDir)) fs.mkdirSync(credentialsDir, { recursive: tr
 
 // Serve static files - CRITICAL for stimulus videos and guest session images
 app.use('/credentials', express.static(credentialsDir));
+// Thumbnails (?size=thumb) and compacted snapshots (see snapshot_store.py)
+app.use('/uploads/gaze', snapshotFallback(gazeUploadsDir));
 app.use('/uploads', express.static(uploadsDir)); 
 app.use('/uploads/gaze', express.static(gazeUploadsDir)); 
 app.use('/videos', express.static(path.join(__dirname, 'public/videos')));
@@ -0,0 +1,214 @@
+"""
+Lightweight in-process metrics shared by all Python predictors.
+
+Per-stage timers (decode, model_load, inference, postprocess, ...), counters and
+fixed-bucket histograms, exportable as Prometheus text or JSON. Recording is a
+perf_counter() pair plus a locked dict update, so it stays on by default.
+
+Spawn-per-call scripts report once at exit: a single `METRICS: {...}` line on
+stderr (next to the existing DEBUG:/WORKER_DEBUG: lines Node already logs), and
+a JSON line appended to $ASD_METRICS_FILE when set. Long-running servers expose
+the same registry on a /metrics route.
+
+Environment:
+    ASD_METRICS=0          disable recording entirely (all calls become no-ops)
+    ASD_METRICS_STDERR=0   do not print the METRICS: line at exit
+    ASD_METRICS_FILE=path  append one JSON snapshot per process to this file
+
+Usage:
+    import instrumentation as metrics
+    metrics.init('predict_survey')
+    with metrics.timer('model_load'):
+        model = pickle.load(f)
+"""
+import atexit
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('ASD_METRICS', '1') != '0'
+
+# Seconds; covers sub-millisecond table lookups up to multi-second model loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'mean': round(self.total / self.count, 6) if self.count else 0.0,
+            'max': round(self.max, 6),
+            'buckets': {str(b): c for b, c in zip(self.buckets + ('+Inf',), self.counts)},
+        }
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.predictor = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())) if labels else ())
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'predictor': self.predictor,
+                'pid': os.getpid(),
+                'uptime_s': round(time.time() - self.started, 3),
+                'counters': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in self.counters.items()],
+                'histograms': [{'name': n, 'labels': dict(l), **h.to_dict()} for (n, l), h in self.histograms.items()],
+            }
+
+
+REGISTRY = Registry()
+
+
+def init(predictor):
+    """Name the process in exported metrics (defaults to the script file name)."""
+    REGISTRY.predictor = predictor
+
+
+def inc(name, value=1, **labels):
+    if ENABLED:
+        REGISTRY.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    if ENABLED:
+        REGISTRY.observe(name, value, **labels)
+
+
+@contextmanager
+def timer(stage, **labels):
+    """Time a block as stage_seconds{stage=...}; failures are also counted in stage_errors_total."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        REGISTRY.inc('stage_errors_total', stage=stage, **labels)
+        raise
+    finally:
+        REGISTRY.observe('stage_seconds', time.perf_counter() - start, stage=stage, **labels)
+
+
+def timed(stage, **labels):
+    """Decorator form of timer()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export_json():
+    return REGISTRY.snapshot()
+
+
+def _prom_labels(labels, predictor, extra=None):
+    items = [('predictor', predictor)] + sorted(labels.items()) + (extra or [])
+    return '{' + ','.join(f'{k}="{str(v)}"' for k, v in items) + '}'
+
+
+def export_prometheus():
+    """Prometheus text exposition format (metric names prefixed with asd_)."""
+    snap = REGISTRY.snapshot()
+    predictor = snap['predictor']
+    lines = []
+    seen = set()
+    for c in snap['counters']:
+        name = f"asd_{c['name']}"
+        if name not in seen:
+            lines.append(f"# TYPE {name} counter")
+            seen.add(name)
+        lines.append(f"{name}{_prom_labels(c['labels'], predictor)} {c['value']}")
+    for h in snap['histograms']:
+        name = f"asd_{h['name']}"
+        if name not in seen:
+            lines.append(f"# TYPE {name} histogram")
+            seen.add(name)
+        cumulative = 0
+        for le, count in h['buckets'].items():
+            cumulative += count
+            lines.append(f"{name}_bucket{_prom_labels(h['labels'], predictor, [('le', le)])} {cumulative}")
+        lines.append(f"{name}_sum{_prom_labels(h['labels'], predictor)} {h['sum']}")
+        lines.append(f"{name}_count{_prom_labels(h['labels'], predictor)} {h['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def stage_summary():
+    """Compact {stage: total_ms} view used for the per-process METRICS: line."""
+    summary = {}
+    for h in REGISTRY.snapshot()['histograms']:
+        if h['name'] == 'stage_seconds':
+            stage = h['labels'].get('stage', '?')
+            summary[stage] = round(summary.get(stage, 0.0) + h['sum'] * 1000.0, 3)
+    return summary
+
+
+def _report_at_exit():
+    if not ENABLED or (not REGISTRY.counters and not REGISTRY.histograms):
+        return
+    try:
+        if os.environ.get('ASD_METRICS_STDERR', '1') != '0':
+            print(f"METRICS: {json.dumps({'predictor': REGISTRY.predictor, 'stages_ms': stage_summary()})}",
+                  file=sys.stderr)
+        path = os.environ.get('ASD_METRICS_FILE')
+        if path:
+            with open(path, 'a') as f:
+                f.write(json.dumps(export_json()) + '\n')
+    except Exception:
+        # Metrics must never change a predictor's exit status or stdout contract
+        pass
+
+
+atexit.register(_report_at_exit)
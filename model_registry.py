@@ -0,0 +1,444 @@
+"""
+Versioned model registry shared by the predictors and training scripts.
+
+Layout (root defaults to <backend>/model_registry, override with ASD_MODEL_REGISTRY):
+
+    model_registry/
+      survey_dt/
+        manifest.json                  {"active": "20261019-101500-ab12cd", "versions": {...}}
+        versions/
+          20261019-101500-ab12cd/
+            survey_dt.pkl
+
+Version directories are immutable: publish() stages files in a temporary
+directory, records their SHA-256 checksums, sizes and mtimes and renames the
+directory into place, then rewrites manifest.json with os.replace. A reader
+therefore sees either the old or the new manifest, and every version a manifest
+points to is complete. Writers (publish, activate, prune) hold an exclusive lock
+on <name>/manifest.lock around the read-modify-write, so concurrent publishes of
+one model never drop each other's version entries. Version ids are the publish time plus a hash of the
+content, so publishing identical files twice in the same second yields the same
+version instead of a collision.
+
+Checksums are verified in full at publish and activate time (and by the
+`verify` command). Loading only compares sizes and mtimes, so spawn-per-call
+scripts do not read every model file twice.
+
+Spawn-per-call scripts use resolve() to find the active file (falling back to
+the legacy artifact next to the script, so an empty registry changes nothing).
+Resident processes use ActiveModel, which loads the active version once and,
+when the manifest changes, loads and checks the new version in a background
+thread before swapping the reference. Requests already holding the old object
+finish with it, so there is no restart and no load on the request path.
+
+CLI:
+    python model_registry.py publish survey_dt survey_dt.pkl --meta accuracy=0.91
+    python model_registry.py list [name]
+    python model_registry.py activate survey_dt <version>
+    python model_registry.py verify survey_dt [version]
+    python model_registry.py prune survey_dt --keep 3
+    python model_registry.py import-legacy
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_ROOT = os.environ.get('ASD_MODEL_REGISTRY', os.path.join(BACKEND_DIR, 'model_registry'))
+
+# Registry name -> artifacts the predictors historically loaded by bare file name
+LEGACY_ARTIFACTS = {
+    'survey_dt': ['survey_dt.pkl'],
+    'bpnn_progress': ['bpnn_progress_model.h5', 'bpnn_scaler_x.pkl', 'bpnn_scaler_y.pkl'],
+    'asd_risk': ['asd_model.pkl', 'scaler.pkl'],
+}
+
+
+class RegistryError(Exception):
+    pass
+
+
+def sha256_file(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _model_dir(name, root=None):
+    return os.path.join(root or REGISTRY_ROOT, name)
+
+
+def manifest_path(name, root=None):
+    return os.path.join(_model_dir(name, root), 'manifest.json')
+
+
+def version_dir(name, version, root=None):
+    return os.path.join(_model_dir(name, root), 'versions', version)
+
+
+def read_manifest(name, root=None):
+    try:
+        with open(manifest_path(name, root)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+@contextlib.contextmanager
+def _manifest_lock(name, root=None):
+    """Exclusive lock serializing manifest read-modify-write across processes."""
+    directory = _model_dir(name, root)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'manifest.lock'), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 s; keep waiting for the other writer
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _write_manifest(name, manifest, root=None):
+    path = manifest_path(name, root)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.manifest_', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def publish(name, files, metadata=None, activate=True, root=None):
+    """Copy `files` ({dest_name: src_path} or a list of paths) into a new immutable version.
+
+    Returns the new version id.
+    """
+    if not isinstance(files, dict):
+        files = {os.path.basename(p): p for p in files}
+    versions_root = os.path.join(_model_dir(name, root), 'versions')
+    os.makedirs(versions_root, exist_ok=True)
+
+    staging = tempfile.mkdtemp(dir=versions_root, prefix='.staging_')
+    try:
+        entries = {}
+        for dest, src in files.items():
+            target = os.path.join(staging, dest)
+            shutil.copy2(src, target)
+            st = os.stat(target)
+            entries[dest] = {'sha256': sha256_file(target), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        # The suffix hashes names and contents only, so identical files give an identical suffix
+        digest = hashlib.sha256(json.dumps({d: e['sha256'] for d, e in entries.items()}, sort_keys=True).encode())
+        version = f"{time.strftime('%Y%m%d-%H%M%S')}-{digest.hexdigest()[:12]}"
+        target_dir = os.path.join(versions_root, version)
+        os.chmod(staging, 0o755)
+        if os.path.isdir(target_dir):
+            # Same content published within the same second: that version already exists
+            shutil.rmtree(staging)
+            entries = None
+        else:
+            os.rename(staging, target_dir)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    with _manifest_lock(name, root):
+        manifest = read_manifest(name, root) or {'name': name, 'active': None, 'versions': {}}
+        if entries is not None or version not in manifest['versions']:
+            manifest['versions'][version] = {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'files': entries or _stat_entries(target_dir),
+                'metadata': metadata or {},
+            }
+        if activate or manifest['active'] is None:
+            manifest['active'] = version
+        _write_manifest(name, manifest, root)
+    return version
+
+
+def activate(name, version, root=None):
+    verify(name, version, root)
+    with _manifest_lock(name, root):
+        manifest = read_manifest(name, root)
+        if manifest is None or version not in manifest['versions']:
+            raise RegistryError(f"Unknown version '{version}' for model '{name}'")
+        manifest['active'] = version
+        _write_manifest(name, manifest, root)
+
+
+def _stat_entries(directory):
+    entries = {}
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        st = os.stat(path)
+        entries[filename] = {'sha256': sha256_file(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    return entries
+
+
+def verify(name, version=None, root=None, checksums=True):
+    """Check every file of a version against the manifest; raises RegistryError on mismatch.
+
+    checksums=False only compares size and mtime (recorded at publish), without reading the files.
+    """
+    manifest = read_manifest(name, root)
+    if manifest is None:
+        raise RegistryError(f"Model '{name}' is not registered")
+    version = version or manifest['active']
+    entry = manifest['versions'].get(version)
+    if entry is None:
+        raise RegistryError(f"Unknown version '{version}' for model '{name}'")
+    for filename, info in entry['files'].items():
+        path = os.path.join(version_dir(name, version, root), filename)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise RegistryError(f"Missing file {name}/{version}/{filename}")
+        if checksums:
+            if sha256_file(path) != info['sha256']:
+                raise RegistryError(f"Checksum mismatch for {name}/{version}/{filename}")
+        elif st.st_size != info['size'] or st.st_mtime_ns != info.get('mtime_ns', st.st_mtime_ns):
+            raise RegistryError(f"{name}/{version}/{filename} changed since it was published")
+    return version
+
+
+def prune(name, keep=3, root=None):
+    """Delete the oldest inactive versions, keeping `keep` most recent plus the active one."""
+    with _manifest_lock(name, root):
+        manifest = read_manifest(name, root)
+        if manifest is None:
+            return []
+        ordered = sorted(manifest['versions'], key=lambda v: manifest['versions'][v]['created'], reverse=True)
+        removed = [v for v in ordered[keep:] if v != manifest['active']]
+        for version in removed:
+            del manifest['versions'][version]
+        _write_manifest(name, manifest, root)
+    for version in removed:
+        shutil.rmtree(version_dir(name, version, root), ignore_errors=True)
+    return removed
+
+
+def active_version(name, root=None):
+    manifest = read_manifest(name, root)
+    return manifest['active'] if manifest else None
+
+
+def resolve(name, filename, legacy_dir=None, root=None):
+    """Absolute path of `filename` in the active version of `name`.
+
+    Falls back to `legacy_dir/filename` (the script's own folder, not the CWD)
+    when the model has not been published to the registry yet.
+    """
+    version = active_version(name, root)
+    if version:
+        path = os.path.join(version_dir(name, version, root), filename)
+        if os.path.exists(path):
+            return path
+    return os.path.join(legacy_dir or BACKEND_DIR, filename)
+
+
+def resolve_dir(name, legacy_dir=None, root=None):
+    """Folder holding every file of the active version, so multi-file models are read from one version."""
+    version = active_version(name, root)
+    if version:
+        path = version_dir(name, version, root)
+        if os.path.isdir(path):
+            return path
+    return legacy_dir or BACKEND_DIR
+
+
+class ActiveModel:
+    """Resident handle on the active version of a registered model.
+
+    `loader(version_dir)` builds the in-memory object (e.g. unpickles and returns
+    a tuple of model and scalers). get() is cheap: it stats the manifest at most
+    every `check_interval` seconds and never loads on the caller's thread once a
+    first version is loaded. Files are checked by size and mtime before loading;
+    verify_checksums=True re-reads them against their SHA-256 as well.
+    """
+
+    def __init__(self, name, loader, legacy_dir=None, check_interval=2.0, verify_checksums=False, root=None):
+        self.name = name
+        self.loader = loader
+        self.legacy_dir = legacy_dir or BACKEND_DIR
+        self.check_interval = check_interval
+        self.verify_checksums = verify_checksums
+        self.root = root
+        self.version = None
+        self._obj = None
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self._next_check = 0.0
+        self._reloading = False
+
+    def _manifest_stamp(self):
+        try:
+            st = os.stat(manifest_path(self.name, self.root))
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        stamp = self._manifest_stamp()
+        version = active_version(self.name, self.root)
+        if version is None:
+            obj = self.loader(self.legacy_dir)
+        else:
+            verify(self.name, version, self.root, checksums=self.verify_checksums)
+            obj = self.loader(version_dir(self.name, version, self.root))
+        return stamp, version, obj
+
+    def _swap(self, stamp, version, obj):
+        with self._lock:
+            self._manifest_mtime = stamp
+            self.version = version
+            self._obj = obj
+
+    def _background_reload(self):
+        try:
+            if active_version(self.name, self.root) == self.version:
+                # Manifest touched (e.g. a new inactive version published) but nothing to swap
+                with self._lock:
+                    self._manifest_mtime = self._manifest_stamp()
+                return
+            stamp, version, obj = self._load()
+            if version != self.version:
+                print(f"REGISTRY: {self.name} swapped {self.version} -> {version}", file=sys.stderr)
+            self._swap(stamp, version, obj)
+        except Exception as e:
+            # Keep serving the current version; try again on the next check
+            print(f"REGISTRY: failed to load {self.name}: {e}", file=sys.stderr)
+        finally:
+            self._reloading = False
+
+    def get(self):
+        """Return the loaded object for the active version (loads synchronously only the first time)."""
+        if self._obj is None:
+            with self._lock:
+                if self._obj is None:
+                    self._manifest_mtime, self.version, self._obj = self._load()
+            return self._obj
+
+        now = time.monotonic()
+        if now >= self._next_check and not self._reloading:
+            self._next_check = now + self.check_interval
+            if self._manifest_stamp() != self._manifest_mtime:
+                self._reloading = True
+                threading.Thread(target=self._background_reload, daemon=True).start()
+        return self._obj
+
+    def reload(self):
+        """Synchronously load the active version (for tests, CLIs and SIGHUP handlers)."""
+        self._swap(*self._load())
+        return self._obj
+
+
+def _cmd_list(args):
+    names = [args.name] if args.name else sorted(
+        n for n in os.listdir(REGISTRY_ROOT) if os.path.isdir(os.path.join(REGISTRY_ROOT, n))
+    ) if os.path.isdir(REGISTRY_ROOT) else []
+    for name in names:
+        manifest = read_manifest(name)
+        if not manifest:
+            continue
+        print(name)
+        for version, entry in sorted(manifest['versions'].items()):
+            marker = '*' if version == manifest['active'] else ' '
+            print(f"  {marker} {version}  {entry['created']}  {', '.join(entry['files'])}  {json.dumps(entry['metadata'])}")
+
+
+def _cmd_import_legacy(args):
+    for name, filenames in LEGACY_ARTIFACTS.items():
+        paths = [os.path.join(args.source, f) for f in filenames]
+        missing = [p for p in paths if not os.path.exists(p)]
+        if missing:
+            print(f"skip {name}: missing {', '.join(os.path.basename(p) for p in missing)}")
+            continue
+        print(f"{name}: published {publish(name, paths, metadata={'source': 'legacy'})}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage versioned model artifacts.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('publish', help="Publish files as a new version")
+    p.add_argument('name')
+    p.add_argument('files', nargs='+')
+    p.add_argument('--meta', nargs='*', default=[], metavar='KEY=VALUE')
+    p.add_argument('--no-activate', action='store_true')
+
+    p = sub.add_parser('list', help="List models and versions (* = active)")
+    p.add_argument('name', nargs='?')
+
+    p = sub.add_parser('activate', help="Point a model at an existing version")
+    p.add_argument('name')
+    p.add_argument('version')
+
+    p = sub.add_parser('verify', help="Check a version's checksums")
+    p.add_argument('name')
+    p.add_argument('version', nargs='?')
+
+    p = sub.add_parser('prune', help="Remove old inactive versions")
+    p.add_argument('name')
+    p.add_argument('--keep', type=int, default=3)
+
+    p = sub.add_parser('import-legacy', help="Publish the bare-filename artifacts found in --source")
+    p.add_argument('--source', default=BACKEND_DIR)
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'publish':
+            meta = dict(item.split('=', 1) for item in args.meta)
+            print(publish(args.name, args.files, metadata=meta, activate=not args.no_activate))
+        elif args.command == 'list':
+            _cmd_list(args)
+        elif args.command == 'activate':
+            activate(args.name, args.version)
+            print(f"{args.name} -> {args.version}")
+        elif args.command == 'verify':
+            print(f"{args.name}/{verify(args.name, args.version)}: OK")
+        elif args.command == 'prune':
+            print('\n'.join(prune(args.name, args.keep)) or 'nothing to prune')
+        elif args.command == 'import-legacy':
+            _cmd_import_legacy(args)
+    except RegistryError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
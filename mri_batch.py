@@ -0,0 +1,277 @@
+"""
+Offline MRI re-scoring for whole cohorts.
+
+Runs the utils/app_mri.py pipeline (atlas masking -> ROI correlation features ->
+classifier) over a directory or manifest of NIfTI scans without the HTTP
+server. Masking and connectivity, the expensive per-scan part, run in a
+process pool. Each worker builds the masker once. Predictions are made in the
+parent in batches, with the classifier loaded once.
+
+Results are appended to a columnar dataset (see columnar.py: Parquet with
+pyarrow, .npz otherwise), one part file every --flush-every scans:
+
+    scan_id, path, status ("ok"/"error"), error, prediction ("ASD"/"Control"),
+    model_version, n_timepoints, n_rois, masking_s, connectivity_s, total_s,
+    completed_at, features (float32 upper-triangle correlations)
+
+The job is resumable. On start, scans whose scan_id already has an "ok" row
+are skipped. Failed scans are retried unless --skip-failed is given. Ctrl-C
+flushes the finished scans before exiting. A hard kill loses at most one
+unflushed batch.
+
+Input:
+    directory   every *.nii / *.nii.gz below it, plus precomputed ROI time
+                series (*.npy / *.csv, timepoints x atlas ROIs, which skip
+                masking); scan_id = path relative to it
+    manifest    .txt with one path per line, or .csv with a `path` column
+                (optional `scan_id`); relative paths are relative to the manifest
+
+Prints one JSON summary on stdout (progress goes to stderr):
+    {"scans", "skipped", "processed", "ok", "errors", "wall_s", "scans_per_s",
+     "stages_ms": {stage: {"mean", "p50", "p95"}}, "output"}
+
+Usage:
+    python mri_batch.py /data/cohort --output cohort_scores --workers 4
+    python mri_batch.py cohort.csv --output cohort_scores --atlas atlas.nii.gz --model-dir models/
+"""
+import argparse
+import csv
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import runtime_config
+import numpy as np
+
+import columnar
+import instrumentation as metrics
+import model_registry
+import mri_features
+
+NIFTI_SUFFIXES = ('.nii', '.nii.gz')
+SCAN_SUFFIXES = NIFTI_SUFFIXES + mri_features.TIMESERIES_SUFFIXES
+STAGES = ('masking_s', 'connectivity_s', 'total_s')
+
+
+def discover_scans(source):
+    """[(scan_id, absolute path)] from a directory or a .txt/.csv manifest."""
+    if os.path.isdir(source):
+        scans = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(SCAN_SUFFIXES):
+                    path = os.path.join(root, name)
+                    scans.append((os.path.relpath(path, source), os.path.abspath(path)))
+        return sorted(scans)
+    base = os.path.dirname(os.path.abspath(source))
+    scans = []
+    with open(source, newline='') as f:
+        if source.endswith('.csv'):
+            for row in csv.DictReader(f):
+                path = os.path.join(base, row['path'])
+                scans.append((row.get('scan_id') or row['path'], os.path.abspath(path)))
+        else:
+            for line in f:
+                if line.strip() and not line.startswith('#'):
+                    path = os.path.join(base, line.strip())
+                    scans.append((line.strip(), os.path.abspath(path)))
+    return scans
+
+
+def completed_scans(output, include_failed):
+    """scan_ids that already have a final row in `output` (only the two columns needed are read)."""
+    done = columnar.read_columns(output, ['scan_id', 'status'])
+    if not done:
+        return set()
+    ids, status = done['scan_id'], done['status']
+    return set(ids.tolist()) if include_failed else set(ids[status == 'ok'].tolist())
+
+
+_atlas = None
+_masker = None
+_n_rois = mri_features.ATLAS_ROIS
+
+
+def _init_worker(atlas, threads):
+    global _atlas, _n_rois
+    runtime_config.configure(budget=threads)
+    # Workers ignore Ctrl-C; the parent decides what to flush
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _atlas = atlas
+    _n_rois = mri_features.atlas_roi_count(atlas)
+
+
+def _get_masker():
+    # Built on the first NIfTI, so a cohort of precomputed time series never fetches the atlas
+    global _masker
+    if _masker is None:
+        _masker = mri_features.make_masker(mri_features.load_atlas_maps(_atlas))
+    return _masker
+
+
+def _extract(scan_id, path):
+    started = time.perf_counter()
+    row = {'scan_id': scan_id, 'path': path, 'error': ''}
+    try:
+        masking_start = time.perf_counter()
+        if mri_features.is_time_series(path):
+            time_series = mri_features.load_time_series(path, _n_rois)
+        else:
+            time_series = _get_masker().fit_transform(path)
+        connectivity_start = time.perf_counter()
+        features = mri_features.connectivity_features(time_series)
+        done = time.perf_counter()
+        row.update(status='ok', features=features.astype(np.float32), n_timepoints=time_series.shape[0],
+                   n_rois=time_series.shape[1], masking_s=connectivity_start - masking_start,
+                   connectivity_s=done - connectivity_start)
+    except Exception as e:
+        row.update(status='error', error=f'{type(e).__name__}: {e}', features=None, n_timepoints=0, n_rois=0,
+                   masking_s=np.nan, connectivity_s=np.nan)
+    row['total_s'] = time.perf_counter() - started
+    return row
+
+
+class ResultWriter:
+    """Buffers finished scans, scores them in one batch and appends a part file."""
+
+    def __init__(self, output, classifier, model_version, flush_every):
+        self.output = output
+        self.model, self.scaler = classifier
+        self.model_version = model_version
+        self.flush_every = flush_every
+        self.rows = []
+        # Known up front from the fitted scaler, so every part has the same feature width
+        self.n_features = getattr(self.scaler, 'n_features_in_', None)
+        self.written = {'ok': 0, 'error': 0}
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        rows, self.rows = self.rows, []
+        ok = [r for r in rows if r['status'] == 'ok']
+        if ok:
+            width = {r['features'].size for r in ok}
+            if self.n_features is None and len(width) == 1:
+                self.n_features = width.pop()
+            for r in ok:
+                if r['features'].size != self.n_features:
+                    r.update(status='error', error=f"Expected {self.n_features} features, got {r['features'].size}")
+            ok = [r for r in ok if r['status'] == 'ok']
+        predictions = {}
+        if ok:
+            try:
+                labels = mri_features.predict_labels(np.stack([r['features'] for r in ok]), self.model, self.scaler)
+                predictions = {r['scan_id']: label for r, label in zip(ok, labels)}
+            except Exception as e:
+                for r in ok:
+                    r.update(status='error', error=f'Prediction failed: {e}')
+        width = self.n_features or 0
+        now = time.time()
+        columnar.write_part(self.output, {
+            'scan_id': [r['scan_id'] for r in rows],
+            'path': [r['path'] for r in rows],
+            'status': [r['status'] for r in rows],
+            'error': [r['error'] for r in rows],
+            'prediction': [predictions.get(r['scan_id'], '') for r in rows],
+            'model_version': [self.model_version] * len(rows),
+            'n_timepoints': np.array([r['n_timepoints'] for r in rows], dtype=np.int32),
+            'n_rois': np.array([r['n_rois'] for r in rows], dtype=np.int16),
+            **{stage: np.array([r[stage] for r in rows], dtype=np.float32) for stage in STAGES},
+            'completed_at': np.full(len(rows), now),
+            'features': np.stack([r['features'] if r['status'] == 'ok' else np.full(width, np.nan, np.float32)
+                                  for r in rows]).astype(np.float32).reshape(len(rows), width),
+        }, dictionary=('status', 'prediction', 'model_version'))
+        for r in rows:
+            self.written[r['status']] += 1
+
+
+def stage_summary(rows):
+    summary = {}
+    for stage in STAGES:
+        values = np.array([r[stage] for r in rows if r['status'] == 'ok'], dtype=np.float64) * 1000.0
+        if values.size:
+            summary[stage[:-2]] = {'mean': round(float(values.mean()), 2),
+                                   'p50': round(float(np.percentile(values, 50)), 2),
+                                   'p95': round(float(np.percentile(values, 95)), 2)}
+    return summary
+
+
+def run(args):
+    scans = discover_scans(args.input)
+    done = completed_scans(args.output, include_failed=args.skip_failed)
+    todo = [(scan_id, path) for scan_id, path in scans if scan_id not in done]
+    summary = {'scans': len(scans), 'skipped': len(scans) - len(todo), 'processed': 0, 'ok': 0, 'errors': 0,
+               'output': os.path.abspath(args.output)}
+    if not todo:
+        return summary
+
+    model_dir = model_registry.resolve_dir('mri_classifier', args.model_dir)
+    version = model_registry.active_version('mri_classifier') or 'legacy'
+    with metrics.timer('model_load'):
+        classifier = mri_features.load_classifier(model_dir)
+    writer = ResultWriter(args.output, classifier, version, args.flush_every)
+    threads = max(1, runtime_config.thread_budget() // args.workers)
+
+    finished = []
+    started = time.perf_counter()
+    interrupted = False
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.atlas, threads)) as pool:
+        futures = [pool.submit(_extract, scan_id, path) for scan_id, path in todo]
+        try:
+            for future in as_completed(futures):
+                row = future.result()
+                finished.append(row)
+                writer.add(row)
+                if len(finished) % args.progress_every == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"MRI_BATCH: {len(finished)}/{len(todo)} scans, {len(finished) / elapsed:.2f} scans/s",
+                          file=sys.stderr, flush=True)
+        except KeyboardInterrupt:
+            interrupted = True
+            for future in futures:
+                future.cancel()
+        finally:
+            writer.flush()
+    wall = time.perf_counter() - started
+
+    summary.update(processed=len(finished), ok=writer.written['ok'], errors=writer.written['error'],
+                   wall_s=round(wall, 2), scans_per_s=round(len(finished) / wall, 3) if wall else None,
+                   stages_ms=stage_summary(finished), model_version=version)
+    if interrupted:
+        summary['interrupted'] = True
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score a cohort of NIfTI scans with the MRI classifier.")
+    parser.add_argument("input", help="Directory of .nii/.nii.gz scans, or a .txt/.csv manifest")
+    parser.add_argument("--output", required=True, help="Columnar results directory (appended to, resumable)")
+    parser.add_argument("--workers", type=int, default=max(1, len(runtime_config.usable_cores())))
+    parser.add_argument("--atlas", default=None, help="Labels NIfTI to use instead of Harvard-Oxford")
+    parser.add_argument("--model-dir", default=os.getcwd(),
+                        help="Directory with asd_model.pkl/scaler.pkl when no registry version is active")
+    parser.add_argument("--flush-every", type=int, default=16, help="Scans per part file")
+    parser.add_argument("--progress-every", type=int, default=10)
+    parser.add_argument("--skip-failed", action="store_true", help="Do not retry scans that failed before")
+    args = parser.parse_args()
+    metrics.init('mri_batch')
+    runtime_config.configure()
+    try:
+        summary = run(args)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(json.dumps({'error': str(e)}))
+        return 1
+    print(json.dumps(summary))
+    return 130 if summary.get('interrupted') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+MRI feature pipeline shared by utils/app_mri.py and mri_batch.py.
+
+    4D NIfTI scan --NiftiLabelsMasker (Harvard-Oxford cortical atlas)--> ROI time
+    series (timepoints x ROIs) --correlation--> upper triangle as the feature vector
+
+Partners that already hold atlas-extracted time series can send them
+instead of the volume: a .npy or .csv matrix of timepoints x ROIs (one
+column per atlas region, in label order; a .csv may have a header row) is
+validated against the atlas ROI count and goes straight to connectivity,
+skipping the masker.
+
+The classifier is the asd_model.pkl + scaler.pkl pair (registry name
+'mri_classifier'); label 1 is reported as "ASD", anything else as "Control".
+"""
+import os
+
+import numpy as np
+
+import instrumentation as metrics
+
+ATLAS_NAME = 'cort-maxprob-thr25-2mm'
+# Labelled regions in ATLAS_NAME (background excluded)
+ATLAS_ROIS = 48
+TIMESERIES_SUFFIXES = ('.npy', '.csv')
+# Fewer timepoints than this give a meaningless correlation matrix
+MIN_TIMEPOINTS = 10
+MODEL_FILES = ('asd_model.pkl', 'asd_svm_model.pkl')
+
+
+def load_atlas_maps(atlas_path=None):
+    """Labels image for the masker: `atlas_path` if given, else Harvard-Oxford (downloaded once by nilearn)."""
+    if atlas_path:
+        return atlas_path
+    from nilearn import datasets
+
+    return datasets.fetch_atlas_harvard_oxford(ATLAS_NAME).maps
+
+
+def atlas_roi_count(atlas_path=None):
+    """Regions a time series must have for `atlas_path` (ATLAS_ROIS for the default atlas)."""
+    if not atlas_path:
+        return ATLAS_ROIS
+    import nibabel as nib
+
+    labels = np.unique(np.asarray(nib.load(atlas_path).dataobj))
+    return int(np.count_nonzero(labels))
+
+
+def is_time_series(path):
+    return path.lower().endswith(TIMESERIES_SUFFIXES)
+
+
+def load_time_series(path, n_rois=ATLAS_ROIS):
+    """Read and validate a (timepoints x ROIs) matrix from .npy/.csv. Raises ValueError with a client-facing message."""
+    try:
+        if path.lower().endswith('.npy'):
+            time_series = np.load(path, allow_pickle=False)
+        else:
+            with open(path) as f:
+                first = f.readline()
+            # A header row (ROI names) is skipped; a numeric first row is data
+            try:
+                [float(v) for v in first.replace(';', ',').split(',') if v.strip()]
+                skip = 0
+            except ValueError:
+                skip = 1
+            time_series = np.loadtxt(path, delimiter=',', skiprows=skip, ndmin=2)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Unreadable time series: {e}") from e
+    if time_series.ndim != 2 or not np.issubdtype(time_series.dtype, np.number):
+        raise ValueError(f"Time series must be a numeric 2-D matrix, got shape {time_series.shape}")
+    if time_series.shape[1] != n_rois and time_series.shape[0] == n_rois:
+        # Stored ROIs x timepoints
+        time_series = time_series.T
+    if time_series.shape[1] != n_rois:
+        raise ValueError(f"Time series has {time_series.shape[1]} columns; the atlas has {n_rois} ROIs")
+    if time_series.shape[0] < MIN_TIMEPOINTS:
+        raise ValueError(f"Time series has {time_series.shape[0]} timepoints; at least {MIN_TIMEPOINTS} are needed")
+    if not np.isfinite(time_series).all():
+        raise ValueError("Time series contains NaN or infinite values")
+    return time_series.astype(np.float64, copy=False)
+
+
+def make_masker(labels_img, memory=None):
+    from nilearn.maskers import NiftiLabelsMasker
+
+    return NiftiLabelsMasker(labels_img=labels_img, standardize=True, memory=memory)
+
+
+def load_classifier(model_dir):
+    import joblib
+
+    # asd_fmri/ ships the model as asd_svm_model.pkl
+    model_path = next((os.path.join(model_dir, f) for f in MODEL_FILES if os.path.exists(os.path.join(model_dir, f))),
+                      os.path.join(model_dir, MODEL_FILES[0]))
+    return joblib.load(model_path), joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+
+
+def connectivity_features(time_series):
+    """(timepoints x ROIs) time series -> 1-D upper-triangle correlation vector."""
+    from nilearn.connectome import ConnectivityMeasure
+
+    correlation_matrix = ConnectivityMeasure(kind='correlation').fit_transform([time_series])[0]
+    return correlation_matrix[np.triu_indices(correlation_matrix.shape[0], k=1)]
+
+
+def scan_features(scan_path, masker, n_rois=ATLAS_ROIS):
+    """(feature vector, ROI time series) for one scan or precomputed time series file."""
+    if is_time_series(scan_path):
+        with metrics.timer('decode', input='timeseries'):
+            time_series = load_time_series(scan_path, n_rois)
+    else:
+        with metrics.timer('masking'):
+            time_series = masker.fit_transform(scan_path)
+    with metrics.timer('connectivity'):
+        features = connectivity_features(time_series)
+    return features, time_series
+
+
+def predict_labels(features, model, scaler):
+    """(n_scans x n_features) -> list of "ASD"/"Control"."""
+    with metrics.timer('inference'):
+        predictions = model.predict(scaler.transform(np.atleast_2d(features)))
+    return ["ASD" if p == 1 else "Control" for p in predictions]
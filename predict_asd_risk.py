@@ -1,8 +1,14 @@
 import json
 import sys
+
+import runtime_config
 import numpy as np
 from pathlib import Path
 
+import instrumentation as metrics
+import model_registry
+import risk_table
+
 try:
     import joblib
     JOBLIB_AVAILABLE = True
@@ -103,6 +109,37 @@ def predict_asd_risk_heuristic(features_dict):
         "score": high_prob
     }
 
+def format_prediction(classes, probabilities, prediction):
+    """Response dict from per-class probabilities (0-1) and the predicted class."""
+    prob_dict = {}
+    for i, cls in enumerate(classes):
+        cls_str = str(cls).lower().strip()
+        if 'high' in cls_str:
+            prob_dict['High'] = float(probabilities[i]) * 100
+        elif 'medium' in cls_str or 'moderate' in cls_str:
+            prob_dict['Medium'] = float(probabilities[i]) * 100
+        elif 'low' in cls_str:
+            prob_dict['Low'] = float(probabilities[i]) * 100
+        else:
+            prob_dict[cls] = float(probabilities[i]) * 100
+    
+    pred_str = str(prediction).lower().strip()
+    
+    if 'high' in pred_str:
+        risk_level = 'High'
+    elif 'medium' in pred_str or 'moderate' in pred_str:
+        risk_level = 'Medium'
+    elif 'low' in pred_str:
+        risk_level = 'Low'
+    else:
+        risk_level = str(prediction)
+    
+    return {
+        "risk": risk_level,
+        "probability": prob_dict,
+        "score": max(prob_dict.values()) if prob_dict else 0
+    }
+
 def predict_asd_risk(features_dict):
     """
     Predict ASD risk level based on behavioral parameters.
@@ -116,52 +153,55 @@ def predict_asd_risk(features_dict):
     """
     try:
         backend_dir = Path(__file__).parent
-        model_path = backend_dir / 'asd_model.pkl'
-        scaler_path = backend_dir / 'scaler.pkl'
+        model_dir = Path(model_registry.resolve_dir('asd_risk', backend_dir))
+        model_path = model_dir / 'asd_model.pkl'
+        scaler_path = model_dir / 'scaler.pkl'
         
         if not model_path.exists():
+            metrics.inc('fallback_total', reason='no_model')
             return predict_asd_risk_heuristic(features_dict)
         
+        feature_values = []
+        for feature_name in risk_table.FEATURE_NAMES:
+            value = features_dict.get(feature_name, 3)
+            value = float(value) if value is not None else 3.0
+            value = max(1, min(5, value))
+            feature_values.append(value)
+        
+        # Integer ratings (what the UI sends) are answered from the precomputed table
+        if all(float(v).is_integer() for v in feature_values):
+            table = risk_table.open_table(str(model_dir))
+            if table is not None:
+                with metrics.timer('inference', backend='table'):
+                    probabilities, prediction = table.lookup(feature_values)
+                metrics.inc('risk_table_total', result='hit')
+                return format_prediction(table.classes, probabilities, prediction)
+        else:
+            metrics.inc('risk_table_total', result='fractional')
+        
         model = None
         scaler = None
         
         if JOBLIB_AVAILABLE:
             try:
-                model = joblib.load(model_path)
-                scaler = joblib.load(scaler_path) if scaler_path.exists() else None
+                with metrics.timer('model_load'):
+                    model = joblib.load(model_path)
+                    scaler = joblib.load(scaler_path) if scaler_path.exists() else None
             except Exception as e:
                 return predict_asd_risk_heuristic(features_dict)
         elif PICKLE_AVAILABLE:
             try:
-                with open(model_path, 'rb') as f:
-                    model = pickle.load(f)
-                if scaler_path.exists():
-                    with open(scaler_path, 'rb') as f:
-                        scaler = pickle.load(f)
+                with metrics.timer('model_load'):
+                    with open(model_path, 'rb') as f:
+                        model = pickle.load(f)
+                    if scaler_path.exists():
+                        with open(scaler_path, 'rb') as f:
+                            scaler = pickle.load(f)
             except Exception as e:
                 return predict_asd_risk_heuristic(features_dict)
         else:
             return predict_asd_risk_heuristic(features_dict)
         
-        feature_names = [
-            'communication',
-            'eye_contact',
-            'social_interaction',
-            'emotional_response',
-            'attention_span',
-            'repetitive_actions',
-            'sensory_sensitivity',
-            'speech_clarity',
-            'learning_adaptability'
-        ]
-        
-        feature_values = []
-        for feature_name in feature_names:
-            value = features_dict.get(feature_name, 3)
-            value = float(value) if value is not None else 3.0
-            value = max(1, min(5, value))
-            feature_values.append(value)
-        
         X = np.array([feature_values])
         
         try:
@@ -175,38 +215,9 @@ def predict_asd_risk(features_dict):
             return predict_asd_risk_heuristic(features_dict)
         
         if hasattr(model, 'predict_proba'):
-            probabilities = model.predict_proba(X_scaled)[0]
-            classes = model.classes_
-            
-            prob_dict = {}
-            for i, cls in enumerate(classes):
-                cls_str = str(cls).lower().strip()
-                if 'high' in cls_str:
-                    prob_dict['High'] = float(probabilities[i]) * 100
-                elif 'medium' in cls_str or 'moderate' in cls_str:
-                    prob_dict['Medium'] = float(probabilities[i]) * 100
-                elif 'low' in cls_str:
-                    prob_dict['Low'] = float(probabilities[i]) * 100
-                else:
-                    prob_dict[cls] = float(probabilities[i]) * 100
-            
-            prediction = model.predict(X_scaled)[0]
-            pred_str = str(prediction).lower().strip()
-            
-            if 'high' in pred_str:
-                risk_level = 'High'
-            elif 'medium' in pred_str or 'moderate' in pred_str:
-                risk_level = 'Medium'
-            elif 'low' in pred_str:
-                risk_level = 'Low'
-            else:
-                risk_level = str(prediction)
-            
-            return {
-                "risk": risk_level,
-                "probability": prob_dict,
-                "score": max(prob_dict.values()) if prob_dict else 0
-            }
+            with metrics.timer('inference'):
+                probabilities = model.predict_proba(X_scaled)[0]
+            return format_prediction(model.classes_, probabilities, model.predict(X_scaled)[0])
         else:
             prediction = model.predict(X_scaled)[0]
             return {
@@ -224,15 +235,24 @@ def predict_asd_risk(features_dict):
 
 def main():
     """Main entry point for the script."""
+    metrics.init('predict_asd_risk')
+    runtime_config.configure()
     if len(sys.argv) < 2:
         print(json.dumps({
             "error": "No input provided. Expected JSON string with features."
         }))
         return 1
+    if sys.argv[1] == '--serve':
+        # Resident mode: framed requests on stdin, params = the features dict (see worker_protocol.py)
+        import worker_protocol
+        worker_protocol.serve(predict_asd_risk)
+        return 0
     
     try:
-        input_data = json.loads(sys.argv[1])
-        result = predict_asd_risk(input_data)
+        with metrics.timer('decode'):
+            input_data = json.loads(sys.argv[1])
+        with metrics.timer('total'):
+            result = predict_asd_risk(input_data)
         print(json.dumps(result))
         return 0
     except json.JSONDecodeError as e:
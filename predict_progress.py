@@ -1,17 +1,36 @@
+import os
 import sys
 import json
 import pickle
+
+import runtime_config
 import numpy as np
-from tensorflow import keras
 
-def predict_progress(child_data):
-    model = keras.models.load_model('bpnn_progress_model.h5')
+import instrumentation as metrics
+import model_registry
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+with metrics.timer('import'):
+    from tensorflow import keras
+
+def load_model(model_dir):
+    model = keras.models.load_model(os.path.join(model_dir, 'bpnn_progress_model.h5'))
     
-    with open('bpnn_scaler_x.pkl', 'rb') as f:
+    with open(os.path.join(model_dir, 'bpnn_scaler_x.pkl'), 'rb') as f:
         scaler_x = pickle.load(f)
     
-    with open('bpnn_scaler_y.pkl', 'rb') as f:
+    with open(os.path.join(model_dir, 'bpnn_scaler_y.pkl'), 'rb') as f:
         scaler_y = pickle.load(f)
+    return model, scaler_x, scaler_y
+
+# All three files come from the same registry version (or the legacy files next to this script).
+# Loaded once per process, so a --serve worker builds the Keras model only once.
+progress_model = model_registry.ActiveModel('bpnn_progress', load_model, legacy_dir=SCRIPT_DIR)
+
+def predict_progress(child_data):
+    with metrics.timer('model_load'):
+        model, scaler_x, scaler_y = progress_model.get()
     
     input_features = np.array([
         child_data['week'],
@@ -22,9 +41,10 @@ def predict_progress(child_data):
         child_data['sensory_response']
     ]).reshape(1, -1)
     
-    input_scaled = scaler_x.transform(input_features)
-    prediction_scaled = model.predict(input_scaled, verbose=0)[0][0]
-    prediction = scaler_y.inverse_transform([[prediction_scaled]])[0][0]
+    with metrics.timer('inference'):
+        input_scaled = scaler_x.transform(input_features)
+        prediction_scaled = model.predict(input_scaled, verbose=0)[0][0]
+        prediction = scaler_y.inverse_transform([[prediction_scaled]])[0][0]
     
     current_score = child_data.get('current_score', 0)
     predicted_next_week = prediction
@@ -50,9 +70,18 @@ def predict_progress(child_data):
 
 if __name__ == '__main__':
     try:
+        metrics.init('predict_progress')
+        runtime_config.configure()
+        if sys.argv[1:2] == ['--serve']:
+            # Resident mode: framed requests on stdin, params = the child data dict
+            import worker_protocol
+            worker_protocol.serve(predict_progress)
+            sys.exit(0)
         child_data_str = sys.argv[1]
-        child_data = json.loads(child_data_str)
-        result = predict_progress(child_data)
+        with metrics.timer('decode'):
+            child_data = json.loads(child_data_str)
+        with metrics.timer('total'):
+            result = predict_progress(child_data)
         print(json.dumps(result))
     except Exception as e:
         print(json.dumps({'error': str(e)}))
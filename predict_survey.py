@@ -1,17 +1,35 @@
+import os
 import sys
 import json
 import pickle
 
+import runtime_config
+import instrumentation as metrics
+import model_registry
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FEATURE_NAMES = ['PoorEyeContact', 'DelayedSpeech', 'DifficultyPeerInteraction',
+                 'RepetitiveMovements', 'Sensitivity', 'PrefersRoutine']
+
+
+def load_model(model_dir):
+    with open(os.path.join(model_dir, 'survey_dt.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+
+# Loaded once per process; a --serve worker also picks up newly published versions
+survey_model = model_registry.ActiveModel('survey_dt', load_model, legacy_dir=SCRIPT_DIR)
+
+
 def predict_survey(answers):
-    with open('survey_dt.pkl', 'rb') as f:
-        model = pickle.load(f)
+    with metrics.timer('model_load'):
+        model = survey_model.get()
     
-    prediction = model.predict([answers])[0]
-    probabilities = model.predict_proba([answers])[0]
+    with metrics.timer('inference'):
+        prediction = model.predict([answers])[0]
+        probabilities = model.predict_proba([answers])[0]
     
-    feature_names = ['PoorEyeContact', 'DelayedSpeech', 'DifficultyPeerInteraction', 
-                     'RepetitiveMovements', 'Sensitivity', 'PrefersRoutine']
-    feature_importance = dict(zip(feature_names, model.feature_importances_))
+    feature_importance = dict(zip(FEATURE_NAMES, model.feature_importances_))
     
     sorted_features = sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)
     top_features = [feature for feature, importance in sorted_features[:3] if importance > 0]
@@ -24,13 +42,25 @@ def predict_survey(answers):
     
     return result
 
+def predict_answers(answers):
+    """Survey answers dict (missing answers count as 0) -> result dict."""
+    return predict_survey([answers.get(f, 0) for f in FEATURE_NAMES])
+
+
 if __name__ == '__main__':
     try:
+        metrics.init('predict_survey')
+        runtime_config.configure()
+        if sys.argv[1:2] == ['--serve']:
+            # Resident mode: framed requests on stdin, params = the answers dict
+            import worker_protocol
+            worker_protocol.serve(predict_answers)
+            sys.exit(0)
         answers_str = sys.argv[1]
-        answers = json.loads(answers_str)
-        answers_list = [answers.get(f, 0) for f in ['PoorEyeContact', 'DelayedSpeech', 'DifficultyPeerInteraction', 
-                                                      'RepetitiveMovements', 'Sensitivity', 'PrefersRoutine']]
-        result = predict_survey(answers_list)
+        with metrics.timer('decode'):
+            answers = json.loads(answers_str)
+        with metrics.timer('total'):
+            result = predict_answers(answers)
         print(json.dumps(result))
     except Exception as e:
         print(json.dumps({'error': str(e)}))
@@ -3,6 +3,39 @@ import sys
 import subprocess
 import json
 
+# Sets the BLAS/OpenMP thread budget in os.environ, which predict_mri.py inherits
+import runtime_config
+import instrumentation as metrics
+
+
+def predict_time_series(file_path, model_dir):
+    """Score a precomputed ROI time series (.npy/.csv) in-process: no masking, so no subprocess is needed."""
+    try:
+        import model_registry
+        import mri_features
+
+        runtime_config.configure()
+        with metrics.timer('decode', input='timeseries'):
+            time_series = mri_features.load_time_series(file_path)
+        with metrics.timer('connectivity'):
+            features = mri_features.connectivity_features(time_series)
+        with metrics.timer('model_load'):
+            model, scaler = mri_features.load_classifier(model_registry.resolve_dir('mri_classifier', model_dir))
+        prediction = mri_features.predict_labels(features, model, scaler)[0]
+        result = json.dumps({'prediction': prediction, 'input': 'timeseries',
+                             'n_timepoints': int(time_series.shape[0]), 'n_rois': int(time_series.shape[1])})
+    except ValueError as e:
+        # Malformed input (wrong shape, unreadable file); the message is meant for the user
+        print(json.dumps({'error': str(e)}))
+        return 1
+    except Exception as e:
+        # Missing or corrupt classifier, feature or model errors: still one JSON object on stdout
+        print(json.dumps({'error': f'Time series prediction error: {type(e).__name__}: {e}'}))
+        return 1
+    print(result)
+    return 0
+
+
 def main() -> int:
     """
     This script acts as a bridge to the actual prediction script.
@@ -10,22 +43,26 @@ def main() -> int:
     the prediction script with the provided file path.
     """
     if len(sys.argv) < 2:
-        print('{"error": "Missing file path argument"}')
+        print(json.dumps({"error": "Missing file path argument"}))
         return 1
 
     file_path = sys.argv[1]
     if not os.path.exists(file_path):
-        print(f'{{"error": "File not found: {file_path}"}}')
+        print(json.dumps({"error": f"File not found: {file_path}"}))
         return 1
 
     # Get the absolute path to the directory containing this script
     script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    if file_path.lower().endswith(('.npy', '.csv')):
+        metrics.init('mri_timeseries')
+        return predict_time_series(file_path, os.path.join(script_dir, 'asd_fmri'))
     
     # Construct the absolute path to the MRI prediction script
     predict_script_path = os.path.join(script_dir, 'asd_fmri', 'predict_mri.py')
 
     if not os.path.exists(predict_script_path):
-        print(f'{{"error": "Prediction script not found: {predict_script_path}"}}')
+        print(json.dumps({"error": f"Prediction script not found: {predict_script_path}"}))
         return 1
 
     # Get the Python executable path
@@ -44,12 +81,14 @@ def main() -> int:
     # Launch the prediction script as a separate process
     # This is important for dependency and environment isolation
     try:
-        process = subprocess.run(
-            [python_executable, predict_script_path, file_path],
-            capture_output=True,
-            text=True,
-            check=False  # Don't raise on non-zero exit - we'll handle it
-        )
+        with metrics.timer('subprocess', script='predict_mri'):
+            process = subprocess.run(
+                [python_executable, predict_script_path, file_path],
+                capture_output=True,
+                text=True,
+                check=False  # Don't raise on non-zero exit - we'll handle it
+            )
+        metrics.inc('subprocess_exit_total', code=process.returncode)
         
         # Log everything to stderr for debugging (Node.js will capture this)
         print(f"WORKER_DEBUG: returncode={process.returncode}, stdout_len={len(process.stdout)}, stderr_len={len(process.stderr)}", file=sys.stderr)
@@ -61,18 +100,18 @@ def main() -> int:
             print(process.stdout, end='')
         # If there's stderr and no stdout, wrap it as JSON error
         elif process.stderr:
-            print(f'{{"error": "Python script error: {process.stderr}"}}')
+            print(json.dumps({"error": f"Python script error: {process.stderr}"}))
         # If nothing was output and exit was non-zero, provide fallback error
         elif process.returncode != 0:
-            print(f'{{"error": "Python script failed with exit code {process.returncode} and produced no output"}}')
+            print(json.dumps({"error": f"Python script failed with exit code {process.returncode} and produced no output"}))
         else:
             # This shouldn't happen - successful exit but no output
-            print(f'{{"error": "Python script completed but produced no output"}}')
+            print(json.dumps({"error": "Python script completed but produced no output"}))
         
         return process.returncode
     except Exception as e:
         # Catch any other errors (e.g., file not found, permission denied)
-        print(f'{{"error": "Worker error: {str(e)}"}}')
+        print(json.dumps({"error": f"Worker error: {str(e)}"}))
         return 1
 
 if __name__ == "__main__":
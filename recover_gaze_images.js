@@ -17,11 +17,14 @@ const path = require('path');
 require('dotenv').config();
 
 const GazeSession = require('./models/GazeSession');
+const { analyzeStoredImages } = require('./utils/gazeBatch');
 
 // Configuration
 const MONGO_URI = process.env.MONGO_URI || process.env.MONGODB_URI || 'mongodb://localhost:27017/asd_db';
 const GAZE_UPLOADS_DIR = path.join(__dirname, 'uploads', 'gaze');
 const TIMESTAMP_TOLERANCE_MS = 120000; // 2 minutes tolerance for matching
+// --reanalyze: run recovered images through gaze_worker.py instead of storing placeholder scores
+const REANALYZE = process.argv.includes('--reanalyze');
 
 // Stats tracking
 const stats = {
@@ -201,16 +204,25 @@ async function relinkImages(matches) {
     for (const match of matches) {
         try {
             const { session, images } = match;
+            const analyses = REANALYZE
+                ? await analyzeStoredImages(images.map(img => img.filepath))
+                : new Map();
             
             // Build snapshot objects
-            const newSnapshots = images.map(img => ({
-                imagePath: img.urlPath,
-                timestamp: new Date(img.timestamp),
-                attentionScore: 0,
-                gazeDirection: 'recovered',
-                status: 'recovered',
-                notes: 'Recovered by image recovery script'
-            }));
+            const newSnapshots = images.map(img => {
+                const analysis = analyses.get(path.resolve(img.filepath));
+                const analyzed = analysis && !analysis.error;
+                return {
+                    imagePath: img.urlPath,
+                    timestamp: new Date(img.timestamp),
+                    attentionScore: analyzed ? analysis.attention_score : 0,
+                    gazeDirection: analyzed ? analysis.gaze_direction : 'recovered',
+                    headPitch: analyzed ? analysis.head_pitch : 0,
+                    headYaw: analyzed ? analysis.head_yaw : 0,
+                    status: 'recovered',
+                    notes: 'Recovered by image recovery script'
+                };
+            });
             
             // Update session with recovered images
             session.snapshots = session.snapshots || [];
@@ -13,9 +13,13 @@ const mongoose = require('mongoose');
 const fs = require('fs');
 const path = require('path');
 const GazeSession = require('./models/GazeSession');
+const { analyzeStoredImages } = require('./utils/gazeBatch');
 
 // MongoDB connection
 const MONGO_URI = process.env.MONGO_URI || 'mongodb://localhost:27017/asd_screening';
+// --reanalyze: fill in gaze results for snapshots that only carry placeholder values
+const REANALYZE = process.argv.includes('--reanalyze');
+const PLACEHOLDER_DIRECTIONS = ['recovered', 'unknown'];
 
 async function repairGazeSessions() {
     try {
@@ -89,6 +93,27 @@ async function repairGazeSessions() {
                 });
             }
 
+            if (REANALYZE && fullSession.snapshots && fullSession.snapshots.length > 0) {
+                const pending = fullSession.snapshots.filter(snap => snap.imagePath &&
+                    PLACEHOLDER_DIRECTIONS.includes(snap.gazeDirection || 'unknown'));
+                const filePaths = pending.map(snap => path.join(gazeUploadsDir, path.basename(snap.imagePath)))
+                    .filter(p => fs.existsSync(p));
+                const analyses = await analyzeStoredImages(filePaths);
+                pending.forEach(snap => {
+                    const analysis = analyses.get(path.resolve(gazeUploadsDir, path.basename(snap.imagePath)));
+                    if (analysis && !analysis.error) {
+                        snap.gazeDirection = analysis.gaze_direction;
+                        snap.attentionScore = analysis.attention_score;
+                        snap.headPitch = analysis.head_pitch;
+                        snap.headYaw = analysis.head_yaw;
+                        needsUpdate = true;
+                    }
+                });
+                if (analyses.size > 0) {
+                    console.log(`  ✓ Re-analyzed ${analyses.size} snapshots for session ${fullSession._id}`);
+                }
+            }
+
             // Fix missing module field for guest sessions
             if ((fullSession.isGuest || fullSession.guestInfo?.email) && !fullSession.module) {
                 fullSession.module = 'live_gaze';
@@ -0,0 +1,304 @@
+"""
+Precomputed prediction table for the learned ASD risk model.
+
+predict_asd_risk clamps the nine ratings to 1-5 and the UI only submits
+integers, so the model's whole practical input domain is the 5^9 = 1,953,125
+point integer grid. `build` runs asd_model.pkl (+ scaler.pkl) over that grid
+once and stores, per grid point:
+
+    <key>.probs.npy   class probabilities, uint8 quantized (p * 255) by default
+                      or float16 (RISK_TABLE_DTYPE=float16); ~5.9 / 11.7 MB
+    <key>.pred.npy    index into `classes` of model.predict() for that point
+    risk_table.json   model/scaler sha256, classes, dtype, file names; written
+                      last, so a table is only visible once complete
+
+`key` is the first 16 hex digits of the combined model+scaler checksum, and
+lookup() only answers when that checksum matches the artifacts being served.
+When they differ (a retrained or newly activated model) the caller falls back
+to the live model and a rebuild is started in the background, so the table
+follows the model automatically. The arrays are opened with mmap, so a lookup
+is one index computation and touches a single page.
+
+Environment:
+    ASD_RISK_TABLE=0          disable the table (always use the live model)
+    RISK_TABLE_DIR=path       where tables live (default: $TMPDIR/asd_risk_table)
+    RISK_TABLE_DTYPE=float16  store float16 probabilities instead of uint8
+    RISK_TABLE_AUTOBUILD=0    do not start background rebuilds
+
+Usage:
+    python risk_table.py build [--model-dir DIR] [--force]
+    python risk_table.py status [--model-dir DIR]
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import instrumentation as metrics
+import model_registry
+
+ENABLED = os.environ.get('ASD_RISK_TABLE', '1') != '0'
+TABLE_DIR = os.environ.get('RISK_TABLE_DIR', os.path.join(tempfile.gettempdir(), 'asd_risk_table'))
+TABLE_DTYPE = os.environ.get('RISK_TABLE_DTYPE', 'uint8')
+AUTOBUILD = os.environ.get('RISK_TABLE_AUTOBUILD', '1') != '0'
+# A build lock older than this is assumed to belong to a crashed builder
+BUILD_LOCK_TIMEOUT = float(os.environ.get('RISK_TABLE_LOCK_TIMEOUT', '1800'))
+
+FEATURE_NAMES = [
+    'communication',
+    'eye_contact',
+    'social_interaction',
+    'emotional_response',
+    'attention_span',
+    'repetitive_actions',
+    'sensory_sensitivity',
+    'speech_clarity',
+    'learning_adaptability'
+]
+LEVELS = 5
+GRID_SIZE = LEVELS ** len(FEATURE_NAMES)
+# Place value of each rating in the flat grid index (first feature most significant)
+PLACE_VALUES = LEVELS ** np.arange(len(FEATURE_NAMES) - 1, -1, -1, dtype=np.int64)
+BUILD_CHUNK = 1 << 16
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+META_NAME = 'risk_table.json'
+
+
+def model_files(model_dir):
+    return os.path.join(model_dir, 'asd_model.pkl'), os.path.join(model_dir, 'scaler.pkl')
+
+
+def model_checksum(model_dir):
+    """(model sha256, scaler sha256 or None)."""
+    model_path, scaler_path = model_files(model_dir)
+    scaler_sha = model_registry.sha256_file(scaler_path) if os.path.exists(scaler_path) else None
+    return model_registry.sha256_file(model_path), scaler_sha
+
+
+def _table_key(model_sha, scaler_sha):
+    return hashlib.sha256(f'{model_sha}:{scaler_sha}'.encode()).hexdigest()[:16]
+
+
+def _fingerprint(path):
+    """Cheap change detector (size, mtime) so unchanged artifacts are not re-hashed on every call."""
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def grid_index(values):
+    """Flat table index for nine integer ratings in 1..5."""
+    return int(np.dot(np.asarray(values, dtype=np.int64) - 1, PLACE_VALUES))
+
+
+def grid_rows(start, stop):
+    """Ratings (float, 1..5) for flat indices [start, stop)."""
+    idx = np.arange(start, stop, dtype=np.int64)
+    return ((idx[:, None] // PLACE_VALUES) % LEVELS + 1).astype(np.float64)
+
+
+def read_meta(table_dir=TABLE_DIR):
+    try:
+        with open(os.path.join(table_dir, META_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _load_model(model_dir):
+    import joblib
+
+    model_path, scaler_path = model_files(model_dir)
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path) if os.path.exists(scaler_path) else None
+    return model, scaler
+
+
+def build(model_dir=BACKEND_DIR, table_dir=TABLE_DIR, dtype=TABLE_DTYPE, force=False):
+    """Evaluate the model over the full integer grid and publish the table. Returns the metadata."""
+    model_sha, scaler_sha = model_checksum(model_dir)
+    key = _table_key(model_sha, scaler_sha)
+    meta = read_meta(table_dir)
+    if meta and meta.get('key') == key and not force:
+        return meta
+    if dtype not in ('uint8', 'float16'):
+        raise ValueError(f"Unsupported table dtype: {dtype}")
+
+    model, scaler = _load_model(model_dir)
+    if not hasattr(model, 'predict_proba'):
+        raise ValueError("Model has no predict_proba; nothing to tabulate")
+    os.makedirs(table_dir, exist_ok=True)
+    classes = [str(c) for c in model.classes_]
+    probs_name, pred_name = f'{key}.probs.npy', f'{key}.pred.npy'
+    probs_tmp = os.path.join(table_dir, probs_name + '.tmp')
+    pred_tmp = os.path.join(table_dir, pred_name + '.tmp')
+    probs = np.lib.format.open_memmap(probs_tmp, mode='w+', dtype=dtype, shape=(GRID_SIZE, len(classes)))
+    pred = np.lib.format.open_memmap(pred_tmp, mode='w+', dtype=np.uint8, shape=(GRID_SIZE,))
+    class_index = {c: i for i, c in enumerate(classes)}
+
+    started = time.perf_counter()
+    for start in range(0, GRID_SIZE, BUILD_CHUNK):
+        stop = min(start + BUILD_CHUNK, GRID_SIZE)
+        X = grid_rows(start, stop)
+        if scaler is not None:
+            X = scaler.transform(X)
+        p = model.predict_proba(X)
+        if dtype == 'uint8':
+            probs[start:stop] = np.rint(np.clip(p, 0.0, 1.0) * 255.0).astype(np.uint8)
+        else:
+            probs[start:stop] = p.astype(np.float16)
+        pred[start:stop] = [class_index[str(c)] for c in model.predict(X)]
+    probs.flush()
+    pred.flush()
+    del probs, pred
+    os.replace(probs_tmp, os.path.join(table_dir, probs_name))
+    os.replace(pred_tmp, os.path.join(table_dir, pred_name))
+
+    model_path, scaler_path = model_files(model_dir)
+    meta = {
+        'key': key,
+        'model_sha256': model_sha,
+        'scaler_sha256': scaler_sha,
+        'model_dir': os.path.abspath(model_dir),
+        'fingerprint': [_fingerprint(model_path), _fingerprint(scaler_path)],
+        'classes': classes,
+        'dtype': dtype,
+        'features': FEATURE_NAMES,
+        'probs': probs_name,
+        'pred': pred_name,
+        'build_seconds': round(time.perf_counter() - started, 2),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+    _write_json_atomic(os.path.join(table_dir, META_NAME), meta)
+    _prune(table_dir, keep=key)
+    return meta
+
+
+def _prune(table_dir, keep):
+    # Readers that still map an old table keep their pages; unlinking only drops the name
+    for name in os.listdir(table_dir):
+        if name.endswith('.npy') and not name.startswith(keep):
+            try:
+                os.remove(os.path.join(table_dir, name))
+            except OSError:
+                pass
+
+
+def start_background_build(model_dir, table_dir=TABLE_DIR):
+    """Rebuild in a detached process unless one is already running. Returns True if started."""
+    os.makedirs(table_dir, exist_ok=True)
+    lock = os.path.join(table_dir, 'build.lock')
+    try:
+        if time.time() - os.path.getmtime(lock) > BUILD_LOCK_TIMEOUT:
+            os.remove(lock)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    log = open(os.path.join(table_dir, 'build.log'), 'ab')
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), 'build', '--model-dir', model_dir,
+                      '--table-dir', table_dir, '--release-lock'],
+                     stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+    log.close()
+    return True
+
+
+class RiskTable:
+    """Memory-mapped view of a built table, valid for one model/scaler checksum."""
+
+    def __init__(self, table_dir, meta):
+        self.meta = meta
+        self.classes = meta['classes']
+        self.probs = np.load(os.path.join(table_dir, meta['probs']), mmap_mode='r')
+        self.pred = np.load(os.path.join(table_dir, meta['pred']), mmap_mode='r')
+        self.scale = 255.0 if meta['dtype'] == 'uint8' else 1.0
+
+    def lookup(self, values):
+        """(class probabilities, predicted class) for nine integer ratings in 1..5."""
+        i = grid_index(values)
+        return self.probs[i].astype(np.float64) / self.scale, self.classes[self.pred[i]]
+
+
+# Long-running processes keep the mapping open across calls
+_open_tables = {}
+
+
+def _is_current(meta, model_dir):
+    model_path, scaler_path = model_files(model_dir)
+    if meta.get('fingerprint') == [_fingerprint(model_path), _fingerprint(scaler_path)]:
+        return True
+    return _table_key(*model_checksum(model_dir)) == meta.get('key')
+
+
+def open_table(model_dir, table_dir=TABLE_DIR):
+    """RiskTable for the artifacts in `model_dir`, or None (and a background rebuild) if stale or missing."""
+    if not ENABLED:
+        return None
+    meta = read_meta(table_dir)
+    if meta is not None and _is_current(meta, model_dir):
+        cached = _open_tables.get(table_dir)
+        if cached is not None and cached.meta.get('key') == meta.get('key'):
+            return cached
+        try:
+            table = _open_tables[table_dir] = RiskTable(table_dir, meta)
+            return table
+        except (OSError, ValueError, KeyError):
+            pass
+    metrics.inc('risk_table_total', result='stale' if meta else 'missing')
+    if AUTOBUILD:
+        start_background_build(model_dir, table_dir)
+    return None
+
+
+def _cmd_build(args):
+    meta = build(args.model_dir, args.table_dir, args.dtype, force=args.force)
+    if args.release_lock:
+        # Only on success: after a failed build the lock stays until BUILD_LOCK_TIMEOUT,
+        # so a broken model does not trigger a rebuild on every request
+        os.remove(os.path.join(args.table_dir, 'build.lock'))
+    print(json.dumps(meta))
+
+
+def _cmd_status(args):
+    meta = read_meta(args.table_dir)
+    current = bool(meta) and _is_current(meta, args.model_dir)
+    print(json.dumps({'table': meta, 'current': current}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precomputed ASD risk prediction table.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('build', 'status'):
+        p = sub.add_parser(name)
+        p.add_argument('--model-dir', default=None,
+                       help="Directory with asd_model.pkl/scaler.pkl (default: active registry version)")
+        p.add_argument('--table-dir', default=TABLE_DIR)
+    build_parser = sub.choices['build']
+    build_parser.add_argument('--dtype', choices=['uint8', 'float16'], default=TABLE_DTYPE)
+    build_parser.add_argument('--force', action='store_true', help="Rebuild even if the table is current")
+    build_parser.add_argument('--release-lock', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.model_dir is None:
+        args.model_dir = model_registry.resolve_dir('asd_risk', BACKEND_DIR)
+    return {'build': _cmd_build, 'status': _cmd_status}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
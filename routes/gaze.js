@@ -4,6 +4,7 @@ const multer = require('multer');
 const path = require('path');
 const fs = require('fs');
 const { spawn } = require('child_process');
+const { snapshotExists } = require('../utils/snapshotStore');
 const { verifyToken, therapistCheck } = require('../middlewares/auth');
 const GazeSession = require('../models/GazeSession');
 const Patient = require('../models/patient');
@@ -107,7 +108,8 @@ async function handleSnapshotUpload(req, res, sessionId, analyze) {
         const gazeWorkerPath = path.resolve(__dirname, '../gaze_worker.py');
 
         const result = await new Promise((resolve) => {
-            const pythonProcess = spawn('py', ['-3.10', gazeWorkerPath, imagePath]);
+            // --session lets the worker crop to the face region found in this session's previous frame
+            const pythonProcess = spawn('py', ['-3.10', gazeWorkerPath, imagePath, '--session', sessionId.toString()]);
             let output = '';
             let errorOutput = '';
             
@@ -883,8 +885,7 @@ router.get('/session/:sessionId', verifyToken, therapistCheck, async (req, res)
             // Check if file exists
             if (snapObj.imagePath) {
                 const filename = snapObj.imagePath.split('/').pop();
-                const filePath = path.join(gazeDir, filename);
-                snapObj.fileExists = fs.existsSync(filePath);
+                snapObj.fileExists = snapshotExists(gazeDir, filename);
                 
                 if (!snapObj.fileExists) {
                     console.log(`⚠️  Missing image file: ${filename}`);
@@ -0,0 +1,181 @@
+"""
+CPU thread budget shared by every Python entry point.
+
+Left alone, each library sizes its thread pool to every core of the node:
+OpenCV (gaze), OpenBLAS/MKL/OpenMP (numpy, sklearn, nilearn), TensorFlow
+(predict_progress) and PyTorch (voice server). A few predictors running at
+once then oversubscribe the CPU many times over. This module gives each
+process one budget and applies it to every library:
+
+    importing           sets OMP/OPENBLAS/MKL/VECLIB/NUMEXPR_NUM_THREADS
+                        (unless already set), which BLAS reads once when numpy
+                        loads. Import this module before numpy.
+    configure()         cv2.setNumThreads, TF intra/inter-op threads,
+                        torch.set_num_threads/interop, threadpoolctl limits
+                        for BLAS/OpenMP already loaded, and optional core
+                        pinning. Applies to whichever of those libraries are
+                        imported, so call it after the heavy imports. PyTorch
+                        overrides are passed in (torch_threads=...), since its
+                        inter-op pool can only be sized once per process.
+
+Budget = usable cores // ASD_CONCURRENT_PROCESSES (at least 1), or
+ASD_CPU_BUDGET when set. Explicit per-library settings (OMP_NUM_THREADS=...,
+VOICE_INTRA_OP_THREADS, ...) still win.
+
+Environment:
+    ASD_THREAD_GOVERNOR=0        leave every library at its defaults
+    ASD_CPU_BUDGET=N             threads for this process
+    ASD_CONCURRENT_PROCESSES=N   predictors expected to run at once (default 1)
+    ASD_CPU_AFFINITY=off         no pinning (default)
+                     auto        pin to core set (ASD_WORKER_SLOT or pid) mod N of
+                                 N = ASD_CONCURRENT_PROCESSES disjoint sets
+                     0-3,8       pin to these cores
+
+Usage:
+    import runtime_config        # first, before numpy/cv2/torch
+    ...
+    runtime_config.configure()
+"""
+import os
+import sys
+
+ENABLED = os.environ.get('ASD_THREAD_GOVERNOR', '1') != '0'
+CONCURRENT_PROCESSES = max(1, int(os.environ.get('ASD_CONCURRENT_PROCESSES', '1')))
+AFFINITY = os.environ.get('ASD_CPU_AFFINITY', 'off')
+
+BLAS_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+                 'NUMEXPR_NUM_THREADS')
+
+
+def usable_cores():
+    """Cores this process may run on (respects an inherited affinity mask / cgroup cpuset)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def thread_budget(cores=None):
+    if os.environ.get('ASD_CPU_BUDGET'):
+        return max(1, int(os.environ['ASD_CPU_BUDGET']))
+    cores = usable_cores() if cores is None else cores
+    return max(1, len(cores) // CONCURRENT_PROCESSES)
+
+
+def parse_cores(spec):
+    """'0-3,8' -> [0, 1, 2, 3, 8]."""
+    cores = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if '-' in part:
+            lo, hi = part.split('-', 1)
+            cores.update(range(int(lo), int(hi) + 1))
+        elif part:
+            cores.add(int(part))
+    return sorted(cores)
+
+
+def core_sets(cores, count):
+    """Split `cores` into `count` disjoint contiguous sets (sets share cores only when count > len(cores))."""
+    if count >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(count)]
+    size, extra = divmod(len(cores), count)
+    sets, start = [], 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        sets.append(cores[start:end])
+        start = end
+    return sets
+
+
+def affinity_for(spec=AFFINITY, cores=None):
+    """Cores to pin this process to for an ASD_CPU_AFFINITY spec, or None for no pinning."""
+    if not spec or spec == 'off':
+        return None
+    cores = usable_cores() if cores is None else cores
+    if spec == 'auto':
+        slot = int(os.environ.get('ASD_WORKER_SLOT', os.getpid()))
+        return core_sets(cores, CONCURRENT_PROCESSES)[slot % CONCURRENT_PROCESSES]
+    return parse_cores(spec)
+
+
+_state = {}
+
+
+def _apply_env(budget):
+    # Remember whether OMP_NUM_THREADS is ours, so configure(budget=...) may lower it later
+    _state['blas_env_owned'] = 'OMP_NUM_THREADS' not in os.environ
+    for name in BLAS_ENV_VARS:
+        os.environ.setdefault(name, str(budget))
+
+
+def _apply_torch(applied, intra, interop):
+    torch = sys.modules['torch']
+    if intra:
+        torch.set_num_threads(intra)
+        applied['torch'] = intra
+    if interop:
+        try:
+            torch.set_num_interop_threads(interop)
+            applied['torch_interop'] = interop
+        except RuntimeError:
+            # Set already, or inter-op work has started; the pool can no longer be resized
+            applied['torch_interop'] = 'already initialized'
+
+
+def configure(budget=None, affinity=AFFINITY, torch_threads=0, torch_interop_threads=0):
+    """Apply the thread budget to every imported library (and pin if requested). Returns what was set.
+
+    torch_threads / torch_interop_threads > 0 override the budget for PyTorch, and apply even with
+    the governor off.
+    """
+    if not ENABLED:
+        applied = {'governor': False}
+        if 'torch' in sys.modules:
+            _apply_torch(applied, torch_threads, torch_interop_threads)
+        return applied
+    cores = usable_cores()
+    pinned = affinity_for(affinity, cores)
+    if pinned and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, pinned)
+        cores = pinned
+    if budget is None:
+        # A pinned process owns its core set; otherwise it gets its share of the usable cores
+        budget = len(pinned) if pinned and not os.environ.get('ASD_CPU_BUDGET') else thread_budget(cores)
+    applied = {'governor': True, 'budget': budget, 'cores': len(cores)}
+    if pinned:
+        applied['affinity'] = pinned
+
+    if 'cv2' in sys.modules:
+        sys.modules['cv2'].setNumThreads(budget)
+        applied['cv2'] = budget
+    if 'tensorflow' in sys.modules:
+        tf = sys.modules['tensorflow']
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(budget)
+            tf.config.threading.set_inter_op_parallelism_threads(min(2, budget))
+            applied['tensorflow'] = budget
+        except RuntimeError:
+            # The TF runtime is already initialized; its pools can no longer be resized
+            applied['tensorflow'] = 'already initialized'
+    if 'torch' in sys.modules:
+        _apply_torch(applied, torch_threads or budget, torch_interop_threads or min(2, budget))
+    if 'numpy' in sys.modules:
+        blas = budget if _state.get('blas_env_owned', True) else int(os.environ['OMP_NUM_THREADS'])
+        try:
+            from threadpoolctl import threadpool_limits
+            # Also covers BLAS that was loaded before this module set the env vars
+            _state['blas_limits'] = threadpool_limits(limits=blas)
+            applied['blas'] = blas
+        except ImportError:
+            applied['blas'] = os.environ.get('OPENBLAS_NUM_THREADS')
+    _state['applied'] = applied
+    return applied
+
+
+def describe():
+    """What configure() applied in this process (empty before the first call)."""
+    return dict(_state.get('applied', {}))
+
+
+if ENABLED:
+    _apply_env(thread_budget())
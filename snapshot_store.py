@@ -0,0 +1,291 @@
+"""
+Compact storage for gaze snapshots: analysis-resolution and thumbnail derivatives.
+
+Snapshots are kept as the full-size PNGs the routes wrote to uploads/gaze
+(plus temp-*.png files the analyze route failed to remove), and every
+re-analysis or review reads them in full. `compact` transcodes each
+original into two lossy derivatives next to it:
+
+    <dir>/derived/analysis/<name>.webp   long side <= GAZE_ANALYSIS_MAX_SIDE (640)
+    <dir>/derived/thumb/<name>.webp      long side <= GAZE_THUMB_MAX_SIDE (160)
+    <dir>/derived/manifest.jsonl         one record per transcoded original, the last one wins:
+        {"original", "size", "mtime_ns", "sha256", "width", "height", "settings",
+         "analysis", "analysis_bytes", "thumb", "thumb_bytes", "deleted"}
+
+GAZE_DERIVATIVE_FORMAT=jpg writes JPEG instead of WebP.
+A derivative's path follows from its original's path, so readers need no
+manifest lookup. GazeAnalyzer reads images through analysis_source(), which
+returns the original while it exists and the analysis derivative once
+--delete-originals has removed it. The derivative is downscaled and lossy, and
+FaceMesh landmarks on it are not identical to those on the original, so
+reading it in place of an existing original is opt-in (GAZE_READ_DERIVATIVES=1,
+when at least as new as the original) until
+benchmarks/bench_snapshot_store.py shows gaze parity on real captures.
+
+Re-running is safe. An original is skipped when its manifest record matches
+its size, mtime and the current settings and both derivatives exist. With
+--delete-originals the original is removed only after both derivatives have
+been written and decoded back; its record keeps the sha256 and size. Files
+modified in the last --min-age seconds are left alone, because the routes may
+still be using them. Originals are transcoded in a process pool, and only the
+parent appends to the manifest.
+
+Prints one JSON summary on stdout:
+    {"originals", "skipped", "transcoded", "errors", "deleted", "bytes_before", "bytes_after", "wall_s", "output"}
+
+Usage:
+    python snapshot_store.py compact uploads/gaze --workers 4
+    python snapshot_store.py compact uploads/gaze --delete-originals --min-age 86400
+    python snapshot_store.py stats uploads/gaze
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import runtime_config
+import instrumentation as metrics
+
+ORIGINAL_SUFFIXES = ('.png', '.jpg', '.jpeg')
+DERIVED_DIR = 'derived'
+MANIFEST = 'manifest.jsonl'
+ANALYSIS_MAX_SIDE = int(os.environ.get('GAZE_ANALYSIS_MAX_SIDE', '640'))
+THUMB_MAX_SIDE = int(os.environ.get('GAZE_THUMB_MAX_SIDE', '160'))
+ANALYSIS_QUALITY = int(os.environ.get('GAZE_ANALYSIS_QUALITY', '90'))
+THUMB_QUALITY = int(os.environ.get('GAZE_THUMB_QUALITY', '70'))
+FORMAT = os.environ.get('GAZE_DERIVATIVE_FORMAT', 'webp')
+DERIVATIVE_SUFFIXES = ('.webp', '.jpg')
+READ_DERIVATIVES = os.environ.get('GAZE_READ_DERIVATIVES', '0') == '1'
+
+
+def settings():
+    """Everything that changes the derivative bytes; a different value means re-transcoding."""
+    return f'{FORMAT}:{ANALYSIS_MAX_SIDE}q{ANALYSIS_QUALITY}:{THUMB_MAX_SIDE}q{THUMB_QUALITY}'
+
+
+def derivative_path(original, kind):
+    """Path of the `kind` ("analysis" / "thumb") derivative of `original`."""
+    directory, name = os.path.split(original)
+    return os.path.join(directory, DERIVED_DIR, kind, os.path.splitext(name)[0] + '.' + FORMAT)
+
+
+def analysis_source(image_path):
+    """The file to analyze for `image_path`: the path itself, or its analysis derivative when the original
+    is gone (or, with GAZE_READ_DERIVATIVES=1, when the derivative is current)."""
+    if not READ_DERIVATIVES and os.path.exists(image_path):
+        return image_path
+    directory, name = os.path.split(image_path)
+    if os.path.basename(directory) == 'analysis':
+        return image_path
+    stem = os.path.splitext(name)[0]
+    try:
+        original_mtime = os.stat(image_path).st_mtime_ns
+    except OSError:
+        original_mtime = None
+    for suffix in DERIVATIVE_SUFFIXES:
+        candidate = os.path.join(directory, DERIVED_DIR, 'analysis', stem + suffix)
+        try:
+            derived_mtime = os.stat(candidate).st_mtime_ns
+        except OSError:
+            continue
+        if original_mtime is None or derived_mtime >= original_mtime:
+            return candidate
+    return image_path
+
+
+def manifest_path(directory):
+    return os.path.join(directory, DERIVED_DIR, MANIFEST)
+
+
+def read_manifest(directory):
+    """{original name: latest record}; a torn last line (interrupted run) is ignored."""
+    records = {}
+    try:
+        with open(manifest_path(directory), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record['original']] = record
+    except OSError:
+        pass
+    return records
+
+
+def discover_originals(directory, min_age):
+    """[(name, size, mtime_ns)] of snapshot files directly in `directory` older than `min_age` seconds."""
+    cutoff = time.time_ns() - int(min_age * 1e9)
+    found = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.lower().endswith(ORIGINAL_SUFFIXES):
+                continue
+            stat = entry.stat()
+            if stat.st_mtime_ns <= cutoff:
+                found.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    return sorted(found)
+
+
+def is_current(directory, name, size, mtime_ns, record):
+    return (record is not None and not record.get('deleted') and record.get('size') == size
+            and record.get('mtime_ns') == mtime_ns and record.get('settings') == settings()
+            and all(os.path.exists(os.path.join(directory, record[kind])) for kind in ('analysis', 'thumb')))
+
+
+def _init_worker():
+    runtime_config.configure(budget=1)
+
+
+def _encode(image, max_side, quality):
+    import cv2
+
+    h, w = image.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    flag = cv2.IMWRITE_WEBP_QUALITY if FORMAT == 'webp' else cv2.IMWRITE_JPEG_QUALITY
+    ok, data = cv2.imencode('.' + FORMAT, image, [flag, quality])
+    if not ok:
+        raise ValueError(f"Could not encode a {FORMAT} derivative")
+    return data
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'wb') as f:
+        f.write(data.tobytes())
+    os.replace(tmp, path)
+
+
+def transcode(directory, name, delete_original=False):
+    """Write both derivatives of directory/name; returns its manifest record (with "error" on failure)."""
+    import cv2
+    import numpy as np
+
+    original = os.path.join(directory, name)
+    try:
+        stat = os.stat(original)
+        raw = np.fromfile(original, dtype=np.uint8)
+        image = cv2.imdecode(raw, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("not a decodable image")
+        record = {'original': name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                  'sha256': hashlib.sha256(raw.tobytes()).hexdigest(),
+                  'width': int(image.shape[1]), 'height': int(image.shape[0]), 'settings': settings()}
+        for kind, max_side, quality in (('analysis', ANALYSIS_MAX_SIDE, ANALYSIS_QUALITY),
+                                        ('thumb', THUMB_MAX_SIDE, THUMB_QUALITY)):
+            data = _encode(image, max_side, quality)
+            path = derivative_path(original, kind)
+            _write_atomic(path, data)
+            record[kind] = os.path.relpath(path, directory)
+            record[kind + '_bytes'] = int(data.size)
+        record['deleted'] = False
+        if delete_original:
+            # Only drop the original once both derivatives read back
+            for kind in ('analysis', 'thumb'):
+                if cv2.imread(os.path.join(directory, record[kind])) is None:
+                    raise ValueError(f"{kind} derivative does not decode")
+            if os.stat(original).st_mtime_ns == stat.st_mtime_ns:
+                os.remove(original)
+                record['deleted'] = True
+        return record
+    except (OSError, ValueError, cv2.error) as e:
+        return {'original': name, 'error': str(e)}
+
+
+def compact(directory, workers=1, delete_originals=False, min_age=600, progress_every=500):
+    manifest = read_manifest(directory)
+    originals = discover_originals(directory, min_age)
+    current = {name for name, size, mtime in originals if is_current(directory, name, size, mtime, manifest.get(name))}
+    todo = [name for name, _, _ in originals if name not in current]
+    # Transcoded by an earlier run that kept the original: only the deletion is left
+    to_delete = sorted(current) if delete_originals else []
+    summary = {'originals': len(originals), 'skipped': len(current), 'transcoded': 0, 'errors': 0, 'deleted': 0,
+               'bytes_before': 0, 'bytes_after': 0, 'output': os.path.abspath(os.path.join(directory, DERIVED_DIR))}
+    started = time.perf_counter()
+    if not todo and not to_delete:
+        summary['wall_s'] = 0.0
+        return summary
+    os.makedirs(os.path.join(directory, DERIVED_DIR), exist_ok=True)
+    with open(manifest_path(directory), 'a', encoding='utf-8') as out:
+        for name in to_delete:
+            os.remove(os.path.join(directory, name))
+            out.write(json.dumps(dict(manifest[name], deleted=True)) + '\n')
+            summary['deleted'] += 1
+        with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(transcode, directory, name, delete_originals) for name in todo]
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                if 'error' in record:
+                    summary['errors'] += 1
+                    metrics.inc('snapshots_total', result='error')
+                    print(f"SNAPSHOT_STORE: {record['original']}: {record['error']}", file=sys.stderr)
+                    continue
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+                summary['transcoded'] += 1
+                summary['deleted'] += int(record['deleted'])
+                summary['bytes_before'] += record['size']
+                summary['bytes_after'] += record['analysis_bytes'] + record['thumb_bytes']
+                metrics.inc('snapshots_total', result='transcoded')
+                if done % progress_every == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"SNAPSHOT_STORE: {done}/{len(todo)} snapshots, {done / elapsed:.1f}/s",
+                          file=sys.stderr, flush=True)
+    summary['wall_s'] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def stats(directory):
+    """Disk usage of originals vs. derivatives, from the manifest and the directory."""
+    manifest = read_manifest(directory)
+    originals = discover_originals(directory, 0)
+    records = [r for r in manifest.values() if 'analysis' in r]
+    return {
+        'originals_on_disk': len(originals),
+        'originals_bytes': sum(size for _, size, _ in originals),
+        'transcoded': len(records),
+        'deleted_originals': sum(1 for r in records if r.get('deleted')),
+        'transcoded_original_bytes': sum(r['size'] for r in records),
+        'analysis_bytes': sum(r['analysis_bytes'] for r in records),
+        'thumb_bytes': sum(r['thumb_bytes'] for r in records),
+        'pending': sum(1 for name, size, mtime in originals
+                       if not is_current(directory, name, size, mtime, manifest.get(name))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcode gaze snapshots to analysis/thumbnail derivatives.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    cmp = sub.add_parser('compact', help="Create missing or outdated derivatives")
+    cmp.add_argument("directory", nargs="?", default=os.path.join('uploads', 'gaze'))
+    cmp.add_argument("--workers", type=int, default=max(1, len(runtime_config.usable_cores())))
+    cmp.add_argument("--delete-originals", action="store_true",
+                     help="Remove each original once its derivatives are written and verified")
+    cmp.add_argument("--min-age", type=float, default=600, help="Skip files modified in the last N seconds")
+    cmp.add_argument("--progress-every", type=int, default=500)
+    st = sub.add_parser('stats', help="Disk usage of originals and derivatives")
+    st.add_argument("directory", nargs="?", default=os.path.join('uploads', 'gaze'))
+    args = parser.parse_args()
+
+    metrics.init('snapshot_store')
+    runtime_config.configure()
+    try:
+        if args.command == 'compact':
+            result = compact(args.directory, args.workers, args.delete_originals, args.min_age, args.progress_every)
+        else:
+            result = stats(args.directory)
+    except (OSError, ValueError) as e:
+        print(json.dumps({'error': str(e)}))
+        return 1
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
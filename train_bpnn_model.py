@@ -1,82 +1,283 @@
-import pandas as pd
-import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score
+"""
+Train the BPNN progress model used by predict_progress.py.
+
+The CSV is streamed twice: once in chunks to fit the MinMax scalers
+(partial_fit), then through a tf.data pipeline (CsvDataset -> scale -> cache ->
+shuffle -> batch -> prefetch) for training. Every trial stops early on
+validation loss. Unless --no-sweep is given, a grid of layer widths, batch sizes
+and learning rates is trained in parallel across a process pool; the trial with
+the lowest validation loss is exported.
+
+Outputs: bpnn_progress_model.h5, bpnn_scaler_x.pkl, bpnn_scaler_y.pkl, bpnn_model_info.json.
+All four are staged in one directory and published to the model registry
+(model_registry.py) as one 'bpnn_progress' version, which becomes active in a
+single manifest swap. predict_progress.py loads the active version, so it never
+pairs a new model with old scalers. Copies are also written next to the CSV
+(or to --out-dir) for inspection; --no-publish writes only those copies.
+
+Usage:
+    python train_bpnn_model.py
+    python train_bpnn_model.py --widths 16,32,16 32,64,32 --batch-sizes 8 32 --learning-rates 0.001 0.003 --workers 4
+    python train_bpnn_model.py --no-sweep
+    python train_bpnn_model.py --no-publish   # loose files only; predictors keep their current version
+"""
+import argparse
+import itertools
 import json
+import os
 import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+import model_registry
+
+INPUT_FEATURES = ['week', 'communication', 'social_skills', 'behavior_control', 'attention_span', 'sensory_response']
+OUTPUT = 'avg_progress_score'
+
+# Rows are split deterministically by position: index % 5 == 0 -> test, == 1 -> validation
+SPLIT_MOD = 5
+
+
+def fit_scalers(csv_path, chunksize):
+    """Fit the X/y MinMax scalers from CSV chunks without loading the whole file."""
+    scaler_x = MinMaxScaler()
+    scaler_y = MinMaxScaler()
+    rows = 0
+    for chunk in pd.read_csv(csv_path, usecols=INPUT_FEATURES + [OUTPUT], chunksize=chunksize, dtype=np.float32):
+        scaler_x.partial_fit(chunk[INPUT_FEATURES].values)
+        scaler_y.partial_fit(chunk[[OUTPUT]].values)
+        rows += len(chunk)
+    return scaler_x, scaler_y, rows
+
+
+def make_datasets(csv_path, x_params, y_params, batch_size, seed):
+    """Build (train, val, test) tf.data pipelines that scale on the fly."""
+    import tensorflow as tf
+
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    select_cols = [header.index(c) for c in INPUT_FEATURES + [OUTPUT]]
+    x_scale, x_min = (tf.constant(p, dtype=tf.float32) for p in x_params)
+    y_scale, y_min = (tf.constant(p, dtype=tf.float32) for p in y_params)
+
+    rows = tf.data.experimental.CsvDataset(
+        csv_path, record_defaults=[tf.float32] * len(select_cols), header=True, select_cols=select_cols
+    )
+
+    def to_example(index, cols):
+        x = tf.stack(cols[:-1]) * x_scale + x_min
+        y = tf.reshape(cols[-1] * y_scale[0] + y_min[0], [1])
+        return index, x, y
+
+    indexed = rows.enumerate().map(to_example, num_parallel_calls=tf.data.AUTOTUNE)
+
+    def split(bucket_filter):
+        return (indexed
+                .filter(lambda i, x, y: bucket_filter(i % SPLIT_MOD))
+                .map(lambda i, x, y: (x, y))
+                .cache())
+
+    train = (split(lambda b: b >= 2)
+             .shuffle(4096, seed=seed, reshuffle_each_iteration=True)
+             .batch(batch_size)
+             .prefetch(tf.data.AUTOTUNE))
+    val = split(lambda b: tf.equal(b, 1)).batch(256).prefetch(tf.data.AUTOTUNE)
+    test = split(lambda b: tf.equal(b, 0)).batch(256).prefetch(tf.data.AUTOTUNE)
+    return train, val, test
+
+
+def build_model(widths, learning_rate, dropout=0.2):
+    from tensorflow import keras
+    from tensorflow.keras import layers
+
+    model = keras.Sequential([layers.Input(shape=(len(INPUT_FEATURES),))])
+    for i, width in enumerate(widths):
+        model.add(layers.Dense(width, activation='relu'))
+        # Same shape as the original network: dropout after every hidden layer but the last
+        if dropout and i < len(widths) - 1:
+            model.add(layers.Dropout(dropout))
+    model.add(layers.Dense(1))
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=learning_rate), loss='mse', metrics=['mae'])
+    return model
+
+
+def run_trial(trial):
+    """Train one configuration; runs inside a pool worker. Returns metrics and the saved model path."""
+    import tensorflow as tf
+    from tensorflow import keras
+    from sklearn.metrics import mean_squared_error, r2_score
+
+    # Split the CPU between concurrent trials instead of every trial using all cores
+    tf.config.threading.set_intra_op_parallelism_threads(trial['threads'])
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    tf.keras.utils.set_random_seed(trial['seed'])
+
+    start = time.perf_counter()
+    train, val, test = make_datasets(trial['csv_path'], trial['x_params'], trial['y_params'],
+                                     trial['batch_size'], trial['seed'])
+    model = build_model(trial['widths'], trial['learning_rate'])
+    early_stop = keras.callbacks.EarlyStopping(monitor='val_loss', patience=trial['patience'],
+                                               restore_best_weights=True)
+    history = model.fit(train, validation_data=val, epochs=trial['max_epochs'], callbacks=[early_stop], verbose=0)
+
+    y_scale, y_min = trial['y_params'][0][0], trial['y_params'][1][0]
+    y_true = np.concatenate([y.numpy() for _, y in test]).ravel()
+    y_pred = model.predict(test, verbose=0).ravel()
+    y_true_actual = (y_true - y_min) / y_scale
+    y_pred_actual = (y_pred - y_min) / y_scale
+
+    model_path = os.path.join(trial['trial_dir'], 'model.h5')
+    model.save(model_path)
+    return {
+        'trial': trial['trial'],
+        'widths': list(trial['widths']),
+        'batch_size': trial['batch_size'],
+        'learning_rate': trial['learning_rate'],
+        'epochs_trained': len(history.history['loss']),
+        'best_val_loss': float(min(history.history['val_loss'])),
+        'mse': float(mean_squared_error(y_true_actual, y_pred_actual)),
+        'r2_score': float(r2_score(y_true_actual, y_pred_actual)),
+        'wall_time_s': round(time.perf_counter() - start, 3),
+        'model_path': model_path,
+    }
 
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import layers
 
-df = pd.read_csv('progress_training_data.csv')
+def atomic_write(path, write_fn, mode='wb'):
+    """Write via a temp file in the same directory, then os.replace into place."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, mode) as f:
+            write_fn(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)  # mkstemp creates 0600 files
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
-X = df[['week', 'communication', 'social_skills', 'behavior_control', 'attention_span', 'sensory_response']].values
-y = df['avg_progress_score'].values
 
-scaler_x = MinMaxScaler()
-scaler_y = MinMaxScaler()
+def export_best(best, scaler_x, scaler_y, model_info, out_dir, staging_dir, publish=True, metadata=None):
+    """Stage the model, scalers and info together and publish them as one registry version.
 
-X_scaled = scaler_x.fit_transform(X)
-y_scaled = scaler_y.fit_transform(y.reshape(-1, 1)).flatten()
+    Returns the published version (None with publish=False). The loose copies in `out_dir` are
+    written afterwards, one file at a time; predictors read the registry version.
+    """
+    staging = os.path.join(staging_dir, 'export')
+    os.makedirs(staging)
+    shutil.copyfile(best['model_path'], os.path.join(staging, 'bpnn_progress_model.h5'))
+    with open(os.path.join(staging, 'bpnn_scaler_x.pkl'), 'wb') as f:
+        pickle.dump(scaler_x, f)
+    with open(os.path.join(staging, 'bpnn_scaler_y.pkl'), 'wb') as f:
+        pickle.dump(scaler_y, f)
+    with open(os.path.join(staging, 'bpnn_model_info.json'), 'w') as f:
+        json.dump(model_info, f, indent=2)
+    names = sorted(os.listdir(staging))
 
-X_train, X_test, y_train, y_test = train_test_split(X_scaled, y_scaled, test_size=0.2, random_state=42)
+    version = None
+    if publish:
+        version = model_registry.publish('bpnn_progress', {n: os.path.join(staging, n) for n in names},
+                                         metadata=metadata)
+    for name in names:
+        with open(os.path.join(staging, name), 'rb') as src:
+            atomic_write(os.path.join(out_dir, name), lambda f: shutil.copyfileobj(src, f))
+    return version
 
-model = keras.Sequential([
-    layers.Dense(16, activation='relu', input_shape=(6,)),
-    layers.Dropout(0.2),
-    layers.Dense(32, activation='relu'),
-    layers.Dropout(0.2),
-    layers.Dense(16, activation='relu'),
-    layers.Dense(1)
-])
 
-model.compile(
-    optimizer='adam',
-    loss='mse',
-    metrics=['mae']
-)
+def main():
+    parser = argparse.ArgumentParser(description="Train the BPNN progress model with early stopping and an optional parallel sweep.")
+    parser.add_argument("--csv", default="progress_training_data.csv")
+    parser.add_argument("--out-dir", default=None, help="Where to write the model files (default: the CSV's folder)")
+    parser.add_argument("--no-sweep", action="store_true", help="Train only the original 16-32-16 / batch 8 / lr 0.001 network")
+    parser.add_argument("--widths", nargs="+", default=["16,32,16", "32,64,32", "32,32", "64,32,16"],
+                        help="Hidden layer widths per candidate, comma separated")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--learning-rates", type=float, nargs="+", default=[0.001, 0.003])
+    parser.add_argument("--max-epochs", type=int, default=300)
+    parser.add_argument("--patience", type=int, default=15)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--chunksize", type=int, default=50000, help="Rows per chunk when fitting scalers")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-publish", action="store_true",
+                        help="Do not publish to the model registry; only write the loose files")
+    args = parser.parse_args()
 
-history = model.fit(
-    X_train, y_train,
-    epochs=100,
-    batch_size=8,
-    validation_split=0.2,
-    verbose=0
-)
+    csv_path = os.path.abspath(args.csv)
+    out_dir = os.path.abspath(args.out_dir or os.path.dirname(csv_path))
 
-y_pred = model.predict(X_test, verbose=0)
-y_pred_actual = scaler_y.inverse_transform(y_pred).flatten()
-y_test_actual = scaler_y.inverse_transform(y_test.reshape(-1, 1)).flatten()
+    scaler_x, scaler_y, rows = fit_scalers(csv_path, args.chunksize)
+    x_params = (scaler_x.scale_.tolist(), scaler_x.min_.tolist())
+    y_params = (scaler_y.scale_.tolist(), scaler_y.min_.tolist())
+    print(f"Rows: {rows}")
 
-mse = mean_squared_error(y_test_actual, y_pred_actual)
-r2 = r2_score(y_test_actual, y_pred_actual)
+    if args.no_sweep:
+        grid = [((16, 32, 16), 8, 0.001)]
+    else:
+        widths = [tuple(int(w) for w in spec.split(',')) for spec in args.widths]
+        grid = list(itertools.product(widths, args.batch_sizes, args.learning_rates))
+    workers = max(1, min(args.workers, len(grid)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
 
-print(f"Mean Squared Error: {mse:.4f}")
-print(f"R² Score: {r2:.4f}")
+    sweep_start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix='bpnn_sweep_', dir=out_dir) as sweep_dir:
+        trials = []
+        for i, (w, bs, lr) in enumerate(grid):
+            trial_dir = os.path.join(sweep_dir, f"trial_{i:03d}")
+            os.makedirs(trial_dir)
+            trials.append({
+                'trial': i, 'widths': w, 'batch_size': bs, 'learning_rate': lr,
+                'csv_path': csv_path, 'x_params': x_params, 'y_params': y_params,
+                'max_epochs': args.max_epochs, 'patience': args.patience,
+                'seed': args.seed, 'threads': threads, 'trial_dir': trial_dir,
+            })
 
-model.save('bpnn_progress_model.h5')
+        print(f"Training {len(trials)} configuration(s) on {workers} worker(s)...")
+        # TensorFlow is not fork-safe; start every worker from a clean interpreter
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(run_trial, trials))
+        sweep_wall = time.perf_counter() - sweep_start
 
-model_info = {
-    'type': 'BPNN',
-    'input_features': ['week', 'communication', 'social_skills', 'behavior_control', 'attention_span', 'sensory_response'],
-    'output': 'avg_progress_score',
-    'mse': float(mse),
-    'r2_score': float(r2),
-    'epochs_trained': 100
-}
+        for r in sorted(results, key=lambda r: r['best_val_loss']):
+            print(f"  trial {r['trial']:3d} widths={r['widths']} batch={r['batch_size']} lr={r['learning_rate']}: "
+                  f"val_loss={r['best_val_loss']:.5f} mse={r['mse']:.4f} r2={r['r2_score']:.4f} "
+                  f"epochs={r['epochs_trained']} wall={r['wall_time_s']:.1f}s")
 
-with open('bpnn_model_info.json', 'w') as f:
-    json.dump(model_info, f, indent=2)
+        best = min(results, key=lambda r: r['best_val_loss'])
+        model_info = {
+            'type': 'BPNN',
+            'input_features': INPUT_FEATURES,
+            'output': OUTPUT,
+            'mse': best['mse'],
+            'r2_score': best['r2_score'],
+            'epochs_trained': best['epochs_trained'],
+            'architecture': best['widths'],
+            'batch_size': best['batch_size'],
+            'learning_rate': best['learning_rate'],
+            'selection_metric': 'best_val_loss',
+            'training_rows': rows,
+            'sweep_wall_time_s': round(sweep_wall, 3),
+            'trials': [{k: v for k, v in r.items() if k != 'model_path'} for r in sorted(results, key=lambda r: r['trial'])],
+        }
+        version = export_best(best, scaler_x, scaler_y, model_info, out_dir, sweep_dir, publish=not args.no_publish,
+                              metadata={'mse': best['mse'], 'r2_score': best['r2_score'], 'training_rows': rows})
 
-with open('bpnn_scaler_x.pkl', 'wb') as f:
-    pickle.dump(scaler_x, f)
+    print(f"Mean Squared Error: {best['mse']:.4f}")
+    print(f"R² Score: {best['r2_score']:.4f}")
+    print("Model trained and saved successfully!")
+    print(f"Model saved as: {os.path.join(out_dir, 'bpnn_progress_model.h5')}")
+    print(f"Scalers saved as: bpnn_scaler_x.pkl, bpnn_scaler_y.pkl")
+    print(f"Model info saved as: bpnn_model_info.json")
+    if version:
+        print(f"Published bpnn_progress version {version}")
 
-with open('bpnn_scaler_y.pkl', 'wb') as f:
-    pickle.dump(scaler_y, f)
 
-print("Model trained and saved successfully!")
-print(f"Model saved as: bpnn_progress_model.h5")
-print(f"Scalers saved as: bpnn_scaler_x.pkl, bpnn_scaler_y.pkl")
-print(f"Model info saved as: bpnn_model_info.json")
+if __name__ == '__main__':
+    main()
@@ -1,39 +1,133 @@
-import pandas as pd
+"""
+Train the parent-survey decision tree used by predict_survey.py.
+
+Default mode fits the original DecisionTreeClassifier(max_depth=3) on an 80/20 split.
+--search streams parent_survey.csv in chunks with int8 answer columns and runs a
+parallel cross-validated grid search over max_depth and min_samples_leaf/split,
+reporting fit time next to accuracy. Both modes write survey_dt.pkl and
+survey_dt_importance.json.
+
+Usage:
+    python train_survey_dt.py
+    python train_survey_dt.py --search --n-jobs -1 --cv 5
+    python train_survey_dt.py --publish   # also publish to the model registry (model_registry.py)
+"""
+import argparse
 import pickle
 import json
+import time
+
+import numpy as np
+import pandas as pd
 from sklearn.tree import DecisionTreeClassifier, export_text
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 
-df = pd.read_csv("parent_survey.csv")
-X = df.drop("Label", axis=1)
-y = df["Label"]
+LABEL = "Label"
+
+
+def read_survey(csv_path, chunksize=None):
+    """Load the survey; with chunksize, stream it and keep the small-integer answers as int8.
+
+    The label keeps its CSV dtype so the pickled model predicts the same label type as before.
+    """
+    if not chunksize:
+        return pd.read_csv(csv_path)
+
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    dtypes = {c: np.int8 for c in columns if c != LABEL}
+    return pd.concat(pd.read_csv(csv_path, chunksize=chunksize, dtype=dtypes), ignore_index=True)
+
+
+def search_tree(X_train, y_train, depths, min_samples_leaf, min_samples_split, cv, n_jobs):
+    grid = {
+        "max_depth": depths,
+        "min_samples_leaf": min_samples_leaf,
+        "min_samples_split": min_samples_split,
+    }
+    search = GridSearchCV(
+        DecisionTreeClassifier(random_state=42),
+        grid,
+        cv=StratifiedKFold(n_splits=cv, shuffle=True, random_state=42),
+        scoring="accuracy",
+        n_jobs=n_jobs,
+        refit=True,
+    )
+    start = time.perf_counter()
+    search.fit(X_train, y_train)
+    wall = time.perf_counter() - start
+
+    results = pd.DataFrame(search.cv_results_)
+    print(f"\nGrid search: {len(results)} candidates x {cv} folds in {wall:.2f}s (n_jobs={n_jobs})")
+    top = results.sort_values("rank_test_score").head(5)
+    for _, row in top.iterrows():
+        print(f"  depth={row['param_max_depth']} leaf={row['param_min_samples_leaf']} "
+              f"split={row['param_min_samples_split']}: cv_acc={row['mean_test_score']:.4f} "
+              f"(+/-{row['std_test_score']:.4f}) fit={row['mean_fit_time'] * 1000:.1f}ms")
+    print("Best params:", search.best_params_)
+    return search.best_estimator_, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the parent-survey decision tree.")
+    parser.add_argument("--csv", default="parent_survey.csv")
+    parser.add_argument("--search", action="store_true", help="Cross-validated search instead of the fixed depth-3 tree")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Rows per chunk in --search mode")
+    parser.add_argument("--depths", type=int, nargs="+", default=[2, 3, 4, 5, 6, 8])
+    parser.add_argument("--min-samples-leaf", type=int, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--min-samples-split", type=int, nargs="+", default=[2, 5, 10])
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--publish", action="store_true", help="Publish survey_dt.pkl as the active 'survey_dt' version")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = read_survey(args.csv, args.chunksize if args.search else None)
+    load_time = time.perf_counter() - start
+    X = df.drop(LABEL, axis=1)
+    y = df[LABEL]
+    print(f"Loaded {len(df)} rows in {load_time:.2f}s ({df.memory_usage(deep=True).sum() / 1024:.1f} KiB in memory)")
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    if args.search:
+        model, _ = search_tree(X_train, y_train, args.depths, args.min_samples_leaf,
+                               args.min_samples_split, args.cv, args.n_jobs)
+    else:
+        model = DecisionTreeClassifier(max_depth=3, random_state=42)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        print(f"Fit time: {(time.perf_counter() - start) * 1000:.1f}ms")
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    y_pred = model.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
 
+    print("Model Accuracy:", accuracy)
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred))
+    print("\nDecision Tree Rules:")
+    print(export_text(model, feature_names=list(X.columns)))
 
-model = DecisionTreeClassifier(max_depth=3, random_state=42)
-model.fit(X_train, y_train)
+    with open("survey_dt.pkl", "wb") as f:
+        pickle.dump(model, f)
 
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
+    feature_importance = {name: importance for name, importance in zip(X.columns, model.feature_importances_)}
+    feature_importance = dict(sorted(feature_importance.items(), key=lambda x: x[1], reverse=True))
 
-print("Model Accuracy:", accuracy)
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred))
-print("\nDecision Tree Rules:")
-print(export_text(model, feature_names=list(X.columns)))
+    with open("survey_dt_importance.json", "w") as f:
+        json.dump(feature_importance, f, indent=2)
 
-with open("survey_dt.pkl", "wb") as f:
-    pickle.dump(model, f)
+    print("\nFeature Importances:")
+    print(json.dumps(feature_importance, indent=2))
+    print("\nModel saved as survey_dt.pkl")
+    print("Feature importances saved as survey_dt_importance.json")
 
-feature_importance = {name: importance for name, importance in zip(X.columns, model.feature_importances_)}
-feature_importance = dict(sorted(feature_importance.items(), key=lambda x: x[1], reverse=True))
+    if args.publish:
+        import model_registry
+        version = model_registry.publish('survey_dt', ['survey_dt.pkl'],
+                                         metadata={'accuracy': float(accuracy), 'params': model.get_params()})
+        print(f"Published survey_dt version {version}")
 
-with open("survey_dt_importance.json", "w") as f:
-    json.dump(feature_importance, f, indent=2)
 
-print("\nFeature Importances:")
-print(json.dumps(feature_importance, indent=2))
-print("\nModel saved as survey_dt.pkl")
-print("Feature importances saved as survey_dt_importance.json")
+if __name__ == "__main__":
+    main()
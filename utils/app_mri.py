@@ -1,37 +1,49 @@
+import os
+import sys
+
+# Shared instrumentation lives at the backend root; the thread budget must be set before numpy loads
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import runtime_config
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS # 1. Import CORS
-import os
-import joblib
-import numpy as np
 import werkzeug.utils
 
-from nilearn import datasets
-from nilearn.maskers import NiftiLabelsMasker
-from nilearn.connectome import ConnectivityMeasure
+import instrumentation as metrics
+import model_registry
+import mri_features
 
 app = Flask(__name__)
 CORS(app) # 2. Initialize CORS for your app
+runtime_config.configure()
 
 # --- Load the saved model, scaler, and atlas ---
-model = joblib.load('asd_model.pkl')
-scaler = joblib.load('scaler.pkl')
-atlas = datasets.fetch_atlas_harvard_oxford('cort-maxprob-thr25-2mm')
+metrics.init('app_mri')
+
+# Published versions are swapped in without a restart; unpublished, the files in the CWD are used as before
+classifier = model_registry.ActiveModel('mri_classifier', mri_features.load_classifier, legacy_dir=os.getcwd())
+with metrics.timer('model_load'):
+    classifier.get()
+    atlas_maps = mri_features.load_atlas_maps()
 
 # --- Create the tools for feature extraction ---
-masker = NiftiLabelsMasker(labels_img=atlas.maps, standardize=True, memory='nilearn_cache')
-correlation_measure = ConnectivityMeasure(kind='correlation')
+masker = mri_features.make_masker(atlas_maps, memory='nilearn_cache')
 
 def process_new_scan(scan_path):
     try:
-        time_series = masker.fit_transform(scan_path)
-        correlation_matrix = correlation_measure.fit_transform([time_series])[0]
-        upper_triangle_indices = np.triu_indices(correlation_matrix.shape[0], k=1)
-        feature_vector = correlation_matrix[upper_triangle_indices]
+        feature_vector, _ = mri_features.scan_features(scan_path, masker)
         return feature_vector.reshape(1, -1)
+    except ValueError as e:
+        # An invalid precomputed time series is the client's error; report why
+        if mri_features.is_time_series(scan_path):
+            raise
+        print(f"Error during MRI processing: {e}")
+        return None
     except Exception as e:
         print(f"Error during MRI processing: {e}")
         return None
 
+# `mri_scan` is a 4D NIfTI, or a precomputed Harvard-Oxford ROI time series (.npy/.csv, timepoints x 48)
 @app.route('/predict_mri', methods=['POST'])
 def predict():
     if 'mri_scan' not in request.files:
@@ -45,21 +57,34 @@ def predict():
     upload_folder = 'temp_uploads'
     os.makedirs(upload_folder, exist_ok=True)
     filepath = os.path.join(upload_folder, filename)
-    file.save(filepath)
+    with metrics.timer('decode'):
+        file.save(filepath)
 
-    features = process_new_scan(filepath)
+    try:
+        features = process_new_scan(filepath)
+    except ValueError as e:
+        os.remove(filepath)
+        metrics.inc('requests_total', status='invalid')
+        return jsonify({'error': str(e)}), 400
 
     if features is not None:
-        scaled_features = scaler.transform(features)
-        prediction = model.predict(scaled_features)
-        # Make sure the labels match what your React code expects (ASD/Control)
-        result = "ASD" if prediction[0] == 1 else "Control" 
+        model, scaler = classifier.get()
+        # Labels match what the React code expects (ASD/Control)
+        result = mri_features.predict_labels(features, model, scaler)[0]
+        metrics.inc('requests_total', status='ok')
         
         os.remove(filepath)
         return jsonify({'prediction': result})
     else:
         os.remove(filepath)
+        metrics.inc('requests_total', status='error')
         return jsonify({'error': 'Failed to process MRI scan'}), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.export_json())
+    return metrics.export_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
 if __name__ == '__main__':
     app.run(debug=True, port=5002)
\ No newline at end of file
@@ -0,0 +1,37 @@
+const path = require('path');
+const { PythonWorker } = require('./pythonWorker');
+
+const gazeWorkerPath = path.resolve(__dirname, '../gaze_worker.py');
+
+/**
+ * Re-analyze stored gaze snapshots in a single resident gaze_worker.py process.
+ * Paths are sent as framed requests (gaze_worker.py --serve) and results arrive one by one;
+ * files analyzed before are answered from the worker's content-hash result cache, which is
+ * enabled (GAZE_RESULT_CACHE=1) only for this re-analysis worker.
+ * Resolves to a Map of absolute image path -> result ({ error } on failure).
+ */
+async function analyzeStoredImages(imagePaths, timeoutMs = 10 * 60 * 1000, workerOptions = {}) {
+    const results = new Map();
+    if (imagePaths.length === 0) return results;
+
+    const env = { ...(workerOptions.env || process.env), GAZE_RESULT_CACHE: '1' };
+    const worker = new PythonWorker(gazeWorkerPath, { ...workerOptions, env });
+    try {
+        await worker.start();
+        await Promise.all(imagePaths.map(async (imagePath) => {
+            const absolutePath = path.resolve(imagePath);
+            try {
+                results.set(absolutePath, await worker.request({ image_path: absolutePath }, timeoutMs));
+            } catch (err) {
+                results.set(absolutePath, { image_path: absolutePath, error: err.message });
+            }
+        }));
+    } catch (err) {
+        console.error('Could not start gaze worker:', err.message);
+    } finally {
+        worker.close();
+    }
+    return results;
+}
+
+module.exports = { analyzeStoredImages };
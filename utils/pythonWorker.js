@@ -0,0 +1,138 @@
+const { spawn } = require('child_process');
+
+/**
+ * Client for a resident Python predictor started with --serve (see worker_protocol.py).
+ *
+ * Frames are a 4-byte big-endian length followed by a msgpack or JSON payload.
+ * The worker's first frame is a JSON hello naming its codec. Every request gets
+ * an id, and replies are matched by id, so they may arrive in any order. msgpack
+ * is used when @msgpack/msgpack (a package.json dependency) can be loaded. Otherwise
+ * the worker is started with ASD_WORKER_CODEC=json.
+ */
+let msgpack = null;
+try {
+    msgpack = require('@msgpack/msgpack');
+} catch (e) {
+    // JSON frames only
+}
+
+const HEADER_BYTES = 4;
+
+class PythonWorker {
+    constructor(scriptPath, { python = 'py', pythonArgs = ['-3.10'], args = [], env = process.env } = {}) {
+        this.scriptPath = scriptPath;
+        this.python = python;
+        this.pythonArgs = pythonArgs;
+        this.args = args;
+        this.env = env;
+        this.process = null;
+        this.codec = null;
+        this.ready = null;
+        this.pending = new Map();
+        this.nextId = 0;
+        this.buffer = Buffer.alloc(0);
+    }
+
+    /** Start the worker (once); resolves with its hello message. */
+    start() {
+        if (this.ready) return this.ready;
+        this.codec = null;
+        this.buffer = Buffer.alloc(0);
+        this.ready = new Promise((resolve, reject) => {
+            const env = { ...this.env, ASD_WORKER_CODEC: msgpack ? 'msgpack' : 'json' };
+            this.process = spawn(this.python, [...this.pythonArgs, this.scriptPath, '--serve', ...this.args], { env });
+            this.onHello = resolve;
+            this.onStartError = reject;
+            this.process.stdout.on('data', (chunk) => this.onData(chunk));
+            this.process.stderr.on('data', (data) => console.error(`[${this.scriptPath}]`, data.toString().trimEnd()));
+            this.process.on('error', (err) => {
+                reject(err);
+                this.failAll(err);
+            });
+            this.process.on('close', (code) => {
+                const err = new Error(`Python worker exited with code ${code}`);
+                reject(err);
+                this.failAll(err);
+                this.ready = null;
+            });
+        });
+        return this.ready;
+    }
+
+    onData(chunk) {
+        this.buffer = Buffer.concat([this.buffer, chunk]);
+        while (this.buffer.length >= HEADER_BYTES) {
+            const length = this.buffer.readUInt32BE(0);
+            if (this.buffer.length < HEADER_BYTES + length) break;
+            const payload = this.buffer.subarray(HEADER_BYTES, HEADER_BYTES + length);
+            this.buffer = this.buffer.subarray(HEADER_BYTES + length);
+            if (this.codec === null) {
+                // The hello frame is always JSON
+                let hello;
+                try {
+                    hello = JSON.parse(payload.toString());
+                } catch (err) {
+                    // Not a --serve worker, or something wrote to its stdout first
+                    this.onStartError(new Error(`Python worker sent an unreadable hello: ${err.message}`));
+                    this.process.kill();
+                    return;
+                }
+                this.codec = hello.codec;
+                this.onHello(hello);
+                continue;
+            }
+            this.onMessage(this.decode(payload));
+        }
+    }
+
+    onMessage(message) {
+        const entry = this.pending.get(message.id);
+        if (!entry) return;
+        this.pending.delete(message.id);
+        clearTimeout(entry.timer);
+        if (message.error !== undefined) entry.reject(new Error(message.error));
+        else entry.resolve(message.result);
+    }
+
+    encode(message) {
+        return this.codec === 'msgpack' ? Buffer.from(msgpack.encode(message)) : Buffer.from(JSON.stringify(message));
+    }
+
+    decode(payload) {
+        return this.codec === 'msgpack' ? msgpack.decode(payload) : JSON.parse(payload.toString());
+    }
+
+    /** Send one request; resolves with the handler's result or rejects with its error. */
+    async request(params, timeoutMs = 60000) {
+        await this.start();
+        const id = ++this.nextId;
+        const payload = this.encode({ id, params });
+        const header = Buffer.alloc(HEADER_BYTES);
+        header.writeUInt32BE(payload.length, 0);
+        return new Promise((resolve, reject) => {
+            const timer = setTimeout(() => {
+                this.pending.delete(id);
+                reject(new Error(`Python worker request ${id} timed out`));
+            }, timeoutMs);
+            this.pending.set(id, { resolve, reject, timer });
+            this.process.stdin.write(Buffer.concat([header, payload]));
+        });
+    }
+
+    failAll(err) {
+        for (const { reject, timer } of this.pending.values()) {
+            clearTimeout(timer);
+            reject(err);
+        }
+        this.pending.clear();
+    }
+
+    /** Ask the worker to finish (zero-length frame) and close its stdin. */
+    close() {
+        if (this.process && this.process.exitCode === null) {
+            this.process.stdin.end(Buffer.alloc(HEADER_BYTES));
+        }
+    }
+}
+
+module.exports = { PythonWorker };
@@ -0,0 +1,52 @@
+const fs = require('fs');
+const path = require('path');
+
+/**
+ * Derivatives written by snapshot_store.py next to the gaze snapshots:
+ * <gazeDir>/derived/{analysis,thumb}/<name>.webp (or .jpg).
+ */
+const DERIVED_DIR = 'derived';
+const DERIVATIVE_EXTENSIONS = ['.webp', '.jpg'];
+
+/** Absolute path of a snapshot's `kind` ('analysis' | 'thumb') derivative, or null when there is none. */
+function derivativeFor(gazeDir, filename, kind) {
+    const stem = path.parse(path.basename(filename)).name;
+    for (const ext of DERIVATIVE_EXTENSIONS) {
+        const candidate = path.join(gazeDir, DERIVED_DIR, kind, stem + ext);
+        if (fs.existsSync(candidate)) return candidate;
+    }
+    return null;
+}
+
+/** True when the snapshot can still be shown: the original or its analysis derivative exists. */
+function snapshotExists(gazeDir, filename) {
+    return fs.existsSync(path.join(gazeDir, path.basename(filename))) || derivativeFor(gazeDir, filename, 'analysis') !== null;
+}
+
+/**
+ * Middleware for /uploads/gaze: `?size=thumb` serves the thumbnail, and a snapshot whose original
+ * was removed by compaction is served from its analysis derivative. Everything else falls through
+ * to express.static.
+ */
+function snapshotFallback(gazeDir) {
+    return (req, res, next) => {
+        if (req.method !== 'GET' && req.method !== 'HEAD') return next();
+        let filename;
+        try {
+            filename = path.basename(decodeURIComponent(req.path));
+        } catch (err) {
+            // Malformed percent-encoding; let express.static answer it
+            return next();
+        }
+        if (!filename || filename.startsWith('.')) return next();
+        if (req.query.size === 'thumb') {
+            const thumb = derivativeFor(gazeDir, filename, 'thumb');
+            if (thumb) return res.sendFile(thumb);
+        }
+        if (fs.existsSync(path.join(gazeDir, filename))) return next();
+        const analysis = derivativeFor(gazeDir, filename, 'analysis');
+        return analysis ? res.sendFile(analysis) : next();
+    };
+}
+
+module.exports = { derivativeFor, snapshotExists, snapshotFallback };
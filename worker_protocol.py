@@ -0,0 +1,271 @@
+"""
+Framed request/response protocol for resident Python predictors.
+
+The one-shot contract pays for an interpreter start and a model load on every
+request: spawn the script, pass JSON in argv, read one JSON blob from stdout.
+Node also has to buffer all of stdout and JSON.parse it at exit. A predictor
+started with --serve stays up instead and answers any number of requests over
+its stdin/stdout:
+
+    frame     4-byte big-endian payload length + payload; a zero-length frame
+              (or EOF) ends the session
+    payload   msgpack map, or JSON text when ASD_WORKER_CODEC=json or msgpack
+              is not installed (even when ASD_WORKER_CODEC=msgpack asks for it)
+
+    worker -> client   hello  {"ready": true, "pid", "codec", "protocol"}  (always JSON)
+    client -> worker   {"id", "params"}
+    worker -> client   {"id", "result"}  or  {"id", "error"}
+
+Every reply carries its request's id. With workers > 1 the requests run on a
+thread pool and complete out of order, so clients match replies by id.
+numpy arrays in results travel as msgpack ext type 1 (dtype, shape, raw
+bytes), so per-frame numeric output is not expanded to text; under JSON they
+become lists. The frames go to a private copy of fd 1, and fd 1 itself is
+pointed at stderr, so prints, native library logging and child processes
+cannot corrupt the frame stream.
+
+The one-shot argv/stdout JSON contract of every script is unchanged; --serve
+is opt-in. Clients: WorkerClient below (Python), utils/pythonWorker.js (Node).
+
+Usage (in a predictor):
+    if sys.argv[1:2] == ['--serve']:
+        worker_protocol.serve(lambda params: predict(params))
+"""
+import json
+import os
+import struct
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import instrumentation as metrics
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+PROTOCOL_VERSION = 1
+
+
+def resolve_codec(name):
+    """The codec actually used for a requested one: msgpack only when it is installed."""
+    return 'msgpack' if name == 'msgpack' and MSGPACK_AVAILABLE else 'json'
+
+
+CODEC = resolve_codec(os.environ.get('ASD_WORKER_CODEC', 'msgpack'))
+MAX_FRAME = 64 << 20
+_HEADER = struct.Struct('>I')
+_NDARRAY_EXT = 1
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def _json_default(obj):
+    # numpy arrays and scalars, without importing numpy here
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _msgpack_default(obj):
+    if type(obj).__name__ == 'ndarray':
+        header = msgpack.packb([obj.dtype.str, list(obj.shape)])
+        return msgpack.ExtType(_NDARRAY_EXT, header + obj.tobytes())
+    if hasattr(obj, 'item'):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} cannot be packed")
+
+
+def _msgpack_ext_hook(code, data):
+    if code == _NDARRAY_EXT:
+        import numpy as np
+
+        unpacker = msgpack.Unpacker()
+        unpacker.feed(data)
+        dtype, shape = unpacker.unpack()
+        return np.frombuffer(data, dtype=dtype, offset=unpacker.tell()).reshape(shape)
+    return msgpack.ExtType(code, data)
+
+
+def encode(message, codec=None):
+    if (codec or CODEC) == 'msgpack':
+        return msgpack.packb(message, default=_msgpack_default, use_bin_type=True)
+    return json.dumps(message, default=_json_default).encode()
+
+
+def decode(payload, codec=None):
+    if (codec or CODEC) == 'msgpack':
+        return msgpack.unpackb(payload, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+    return json.loads(payload)
+
+
+def _read_exact(stream, size):
+    chunks = []
+    while size:
+        chunk = stream.read(size)
+        if not chunk:
+            if chunks:
+                raise ProtocolError("Stream closed in the middle of a frame")
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def read_frame(stream):
+    """Next payload, or None at EOF / on the zero-length end-of-session frame."""
+    header = _read_exact(stream, _HEADER.size)
+    if header is None:
+        return None
+    (length,) = _HEADER.unpack(header)
+    if length == 0:
+        return None
+    if length > MAX_FRAME:
+        raise ProtocolError(f"Frame of {length} bytes exceeds the {MAX_FRAME}-byte limit")
+    payload = _read_exact(stream, length)
+    if payload is None:
+        raise ProtocolError("Stream closed in the middle of a frame")
+    return payload
+
+
+def write_frame(stream, payload):
+    stream.write(_HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def serve(handler, workers=1, codec=None, stdin=None, stdout=None):
+    """Answer framed requests with handler(params) until EOF; returns the number of requests handled."""
+    codec = resolve_codec(codec) if codec else CODEC
+    stdin = stdin or sys.stdin.buffer
+    if stdout is None:
+        # Keep the frame channel separate from anything the handler prints. fd 1 itself goes to
+        # stderr too, so native logging (TF, MediaPipe, OpenCV) and child processes cannot write
+        # into the frame stream
+        sys.stdout.flush()
+        stdout = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+        sys.stdout = sys.stderr
+    write_lock = threading.Lock()
+
+    def reply(message):
+        data = encode(message, codec)
+        with write_lock:
+            write_frame(stdout, data)
+
+    def handle(request):
+        request_id = request.get('id')
+        try:
+            with metrics.timer('request'):
+                result = handler(request.get('params'))
+            # Encoded here so an unserializable result becomes an error reply, not a lost request
+            data = encode({'id': request_id, 'result': result}, codec)
+            metrics.inc('worker_requests_total', status='ok')
+        except Exception as e:
+            data = encode({'id': request_id, 'error': f'{type(e).__name__}: {e}'}, codec)
+            metrics.inc('worker_requests_total', status='error')
+        with write_lock:
+            write_frame(stdout, data)
+
+    write_frame(stdout, encode({'ready': True, 'pid': os.getpid(), 'codec': codec,
+                                'protocol': PROTOCOL_VERSION}, 'json'))
+    pool = ThreadPoolExecutor(workers) if workers > 1 else None
+    handled = 0
+    try:
+        while True:
+            payload = read_frame(stdin)
+            if payload is None:
+                break
+            try:
+                request = decode(payload, codec)
+            except Exception as e:
+                reply({'id': None, 'error': f'Undecodable request: {e}'})
+                continue
+            if not isinstance(request, dict):
+                reply({'id': None, 'error': f'Request must be a map, got {type(request).__name__}'})
+                continue
+            handled += 1
+            if pool:
+                pool.submit(handle, request)
+            else:
+                handle(request)
+    finally:
+        if pool:
+            pool.shutdown(wait=True)
+    return handled
+
+
+class WorkerClient:
+    """Runs `script --serve` and sends it requests; replies are matched to their futures by id."""
+
+    def __init__(self, script, args=(), python=sys.executable, codec=None, cwd=None, env=None):
+        env = dict(env or os.environ)
+        if codec:
+            env['ASD_WORKER_CODEC'] = codec
+        self.proc = subprocess.Popen([python, script, '--serve', *args], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, cwd=cwd, env=env)
+        hello = read_frame(self.proc.stdout)
+        if hello is None:
+            raise ProtocolError(f"{script} exited before it was ready (exit {self.proc.wait()})")
+        self.hello = json.loads(hello)
+        self.codec = self.hello['codec']
+        self._pending = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_replies, daemon=True)
+        self._reader.start()
+
+    def _read_replies(self):
+        error = None
+        try:
+            while True:
+                payload = read_frame(self.proc.stdout)
+                if payload is None:
+                    break
+                message = decode(payload, self.codec)
+                with self._lock:
+                    future = self._pending.pop(message.get('id'), None)
+                if future is None:
+                    continue
+                if 'error' in message:
+                    future.set_exception(ProtocolError(message['error']))
+                else:
+                    future.set_result(message.get('result'))
+        except (OSError, ProtocolError, ValueError) as e:
+            error = e
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(ProtocolError(f"Worker exited: {error or 'end of stream'}"))
+
+    def submit(self, params):
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            future = Future()
+            self._pending[request_id] = future
+            write_frame(self.proc.stdin, encode({'id': request_id, 'params': params}, self.codec))
+        return future
+
+    def call(self, params, timeout=None):
+        return self.submit(params).result(timeout)
+
+    def close(self, timeout=10):
+        if self.proc.poll() is None:
+            try:
+                write_frame(self.proc.stdin, b'')
+                self.proc.stdin.close()
+            except OSError:
+                pass
+        self.proc.wait(timeout)
+        self._reader.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,392 @@
+"""
+Fork-server ("zygote") for isolated per-request predictions.
+
+A resident daemon is not always acceptable: python_worker.py deliberately runs
+predict_mri.py in its own process for isolation, and a crashed or leaking
+request must not take later ones with it. The zygote keeps that isolation
+and drops the start-up cost. One parent process imports the heavy libraries
+(numpy, cv2, sklearn, mediapipe, tensorflow, the predictor modules) and
+unpickles the sklearn artifacts once. Then it fork()s a fresh child per request.
+The child starts with everything already in memory (shared copy-on-write with
+the parent), runs the unmodified script as __main__ and exits.
+
+Clients use zygote_client.py, which keeps the script contract:
+
+    python zygote_client.py predict_survey.py '{"PoorEyeContact": 1, ...}'
+
+behaves like `python predict_survey.py ...`: same argv, same stdout JSON, same
+stderr and exit code. The client passes its own stdin/stdout/stderr file
+descriptors over the Unix socket (SCM_RIGHTS), so the child writes straight
+to the caller's pipes.
+
+Wire protocol (Unix stream socket):
+    client -> server  4-byte big-endian length + fds [stdin, stdout, stderr],
+                      then a JSON body {"script", "argv", "cwd"}
+    server -> client  one JSON line when the child has exited:
+                      {"started": true, "pid", "exit_code", "fork_ms", "run_ms"}
+                      or {"started": false, "error"} if no child could be forked
+
+Preloaded models: the .pkl artifacts of the registry models are loaded in the
+parent and handed to the child by the joblib.load / pickle.load wrappers below.
+The wrappers only apply to those exact files, and only while their size and
+mtime are unchanged. Before every fork the parent re-resolves the active
+registry versions and reloads anything that changed. Keras/TensorFlow models
+and MediaPipe graphs are imported but never built in the parent: both start
+thread pools, which do not survive fork().
+
+Notes:
+    * POSIX only (fork + SCM_RIGHTS); on other platforms zygote_client.py runs
+      the script directly.
+    * Module-level constants read from the environment at import time are the
+      zygote's, not the client's. Start the zygote with the environment the
+      predictors should see.
+
+Environment:
+    ASD_ZYGOTE_SOCKET=path   socket path (default: $TMPDIR/asd_zygote.sock)
+    ZYGOTE_PRELOAD=a,b,c     modules to import in the parent (default: PRELOAD_MODULES)
+
+Usage:
+    python zygote.py [--socket PATH] [--model-dir DIR]
+"""
+import argparse
+import atexit
+import importlib
+import json
+import os
+import pickle
+import runpy
+import selectors
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import time
+import traceback
+
+import runtime_config
+import instrumentation as metrics
+import model_registry
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SOCKET_PATH = os.environ.get('ASD_ZYGOTE_SOCKET', os.path.join(tempfile.gettempdir(), 'asd_zygote.sock'))
+HEADER = struct.Struct('>I')
+MAX_REQUEST_BYTES = 4 * 1024 * 1024
+# Reading the request must not stall the accept loop for long
+REQUEST_TIMEOUT = 5.0
+
+PRELOAD_MODULES = [
+    'numpy', 'cv2', 'joblib',
+    'sklearn.linear_model', 'sklearn.tree', 'sklearn.ensemble', 'sklearn.preprocessing',
+    'mediapipe', 'tensorflow',
+    'risk_table', 'face_roi', 'frame_cache', 'head_pose', 'gaze_worker', 'gaze_analysis',
+]
+if os.environ.get('ZYGOTE_PRELOAD'):
+    PRELOAD_MODULES = [m.strip() for m in os.environ['ZYGOTE_PRELOAD'].split(',') if m.strip()]
+
+
+def preload_modules(names):
+    """Import `names`, skipping (and reporting) any that are not installed."""
+    loaded, skipped = [], {}
+    for name in names:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception as e:
+            skipped[name] = str(e)
+    return loaded, skipped
+
+
+def _fingerprint(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+class ModelCache:
+    """Parent-side unpickled sklearn artifacts, served to children through joblib.load / pickle.load."""
+
+    def __init__(self, model_dir):
+        self.model_dir = model_dir
+        self.models = {}   # abspath -> (fingerprint, object)
+        self._joblib_load = None
+        self._pickle_load = pickle.load
+
+    def artifact_paths(self):
+        paths = []
+        for name, files in model_registry.LEGACY_ARTIFACTS.items():
+            directory = model_registry.resolve_dir(name, self.model_dir)
+            paths += [os.path.join(directory, f) for f in files if f.endswith('.pkl')]
+        return [os.path.abspath(p) for p in paths if os.path.exists(p)]
+
+    def refresh(self):
+        """Load new or changed artifacts and drop ones no longer active. Returns the number (re)loaded."""
+        loaded = 0
+        active = set(self.artifact_paths())
+        for path in list(self.models):
+            if path not in active:
+                del self.models[path]
+        for path in active:
+            fingerprint = _fingerprint(path)
+            cached = self.models.get(path)
+            if cached is not None and cached[0] == fingerprint:
+                continue
+            try:
+                with metrics.timer('model_load', source='zygote'):
+                    self.models[path] = (fingerprint, self._load(path))
+                loaded += 1
+            except Exception as e:
+                self.models.pop(path, None)
+                print(f"ZYGOTE: could not preload {path}: {e}", file=sys.stderr)
+        return loaded
+
+    def _load(self, path):
+        if self._joblib_load is not None:
+            return self._joblib_load(path)
+        with open(path, 'rb') as f:
+            return self._pickle_load(f)
+
+    def lookup(self, path):
+        try:
+            path = os.path.abspath(os.fspath(path))
+            cached = self.models.get(path)
+            if cached is not None and cached[0] == _fingerprint(path):
+                return True, cached[1]
+        except (TypeError, OSError):
+            pass
+        return False, None
+
+    def install(self):
+        """Route joblib.load / pickle.load of preloaded files to the cache."""
+        cache = self
+        try:
+            import joblib
+            self._joblib_load = joblib.load
+
+            def joblib_load(filename, *args, **kwargs):
+                hit, obj = cache.lookup(filename)
+                return obj if hit else cache._joblib_load(filename, *args, **kwargs)
+
+            joblib.load = joblib_load
+        except ImportError:
+            pass
+
+        def pickle_load(file, *args, **kwargs):
+            hit, obj = cache.lookup(getattr(file, 'name', None))
+            return obj if hit else cache._pickle_load(file, *args, **kwargs)
+
+        pickle.load = pickle_load
+
+
+def _exit_code(status):
+    code = os.waitstatus_to_exitcode(status)
+    # Killed by a signal: report it the way a shell would
+    return 128 - code if code < 0 else code
+
+
+def _run_child(request, fds):
+    """Runs in the forked child; never returns."""
+    code = 1
+    try:
+        for target, fd in zip((0, 1, 2), fds):
+            if fd != target:
+                os.dup2(fd, target)
+                os.close(fd)
+        script = os.path.abspath(os.path.join(request.get('cwd') or '.', request['script']))
+        os.chdir(request.get('cwd') or os.path.dirname(script))
+        sys.argv = [script] + [str(a) for a in request.get('argv', [])]
+        sys.path.insert(0, os.path.dirname(script))
+        metrics.REGISTRY.reset()
+        metrics.REGISTRY.started = time.time()
+        metrics.init(os.path.splitext(os.path.basename(script))[0])
+        if 'numpy' in sys.modules:
+            # Children would otherwise all continue the parent's random stream
+            sys.modules['numpy'].random.seed()
+        code = 0
+        try:
+            runpy.run_path(script, run_name='__main__')
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        # Same exit path as a normal interpreter, minus the parent's stack
+        atexit._run_exitfuncs()
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _recv_exact(conn, size):
+    chunks = []
+    while size:
+        chunk = conn.recv(min(size, 1 << 16))
+        if not chunk:
+            raise ConnectionError("client closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class Zygote:
+    def __init__(self, socket_path=SOCKET_PATH, model_dir=BACKEND_DIR):
+        self.socket_path = socket_path
+        self.models = ModelCache(model_dir)
+        self.children = {}   # pid -> (conn, fork_ms, started)
+        self.selector = selectors.DefaultSelector()
+
+    def prepare(self, modules=None):
+        loaded, skipped = preload_modules(PRELOAD_MODULES if modules is None else modules)
+        self.models.install()
+        self.models.refresh()
+        return {'modules': loaded, 'skipped': skipped, 'models': sorted(self.models.models)}
+
+    def _listen(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        listener.listen(64)
+        listener.setblocking(False)
+        return listener
+
+    def _read_request(self, conn):
+        conn.settimeout(REQUEST_TIMEOUT)
+        header, fds, _, _ = socket.recv_fds(conn, HEADER.size, 3)
+        if len(header) < HEADER.size:
+            header += _recv_exact(conn, HEADER.size - len(header))
+        (length,) = HEADER.unpack(header)
+        if len(fds) != 3 or length > MAX_REQUEST_BYTES:
+            for fd in fds:
+                os.close(fd)
+            raise ValueError("expected 3 file descriptors and a request body")
+        return json.loads(_recv_exact(conn, length)), fds
+
+    def _reply(self, conn, message):
+        try:
+            conn.settimeout(REQUEST_TIMEOUT)
+            conn.sendall((json.dumps(message) + '\n').encode())
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _spawn(self, listener, wakeup, conn):
+        try:
+            request, fds = self._read_request(conn)
+        except (OSError, ValueError, ConnectionError) as e:
+            return self._reply(conn, {'started': False, 'error': f'Bad request: {e}'})
+        try:
+            self.models.refresh()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            started = time.perf_counter()
+            pid = os.fork()
+        except Exception as e:
+            for fd in fds:
+                os.close(fd)
+            return self._reply(conn, {'started': False, 'error': f'Fork failed: {e}'})
+        if pid == 0:
+            self.selector.close()
+            listener.close()
+            for sock in wakeup:
+                sock.close()
+            conn.close()
+            for other, _, _ in self.children.values():
+                other.close()
+            signal.set_wakeup_fd(-1)
+            for signum in (signal.SIGCHLD, signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, signal.SIG_DFL)
+            _run_child(request, fds)
+        fork_ms = (time.perf_counter() - started) * 1000.0
+        for fd in fds:
+            os.close(fd)
+        metrics.observe('zygote_fork_seconds', fork_ms / 1000.0)
+        self.children[pid] = (conn, fork_ms, started)
+
+    def _reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            conn, fork_ms, started = self.children.pop(pid, (None, 0.0, time.perf_counter()))
+            code = _exit_code(status)
+            metrics.inc('zygote_requests_total', exit_code=code)
+            if conn is not None:
+                self._reply(conn, {'started': True, 'pid': pid, 'exit_code': code, 'fork_ms': round(fork_ms, 3),
+                                   'run_ms': round((time.perf_counter() - started) * 1000.0, 3)})
+
+    def serve(self):
+        listener = self._listen()
+        wake_r, wake_w = socket.socketpair()
+        wake_r.setblocking(False)
+        wake_w.setblocking(False)
+        signal.set_wakeup_fd(wake_w.fileno())
+        # A Python-level handler is required for the wakeup fd to fire on SIGCHLD
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        self.selector.register(listener, selectors.EVENT_READ, 'accept')
+        self.selector.register(wake_r, selectors.EVENT_READ, 'wakeup')
+        print(f"ZYGOTE: listening on {self.socket_path} (pid {os.getpid()})", file=sys.stderr, flush=True)
+        try:
+            while True:
+                for key, _ in self.selector.select():
+                    if key.data == 'accept':
+                        try:
+                            conn, _ = listener.accept()
+                        except BlockingIOError:
+                            continue
+                        self._spawn(listener, (wake_r, wake_w), conn)
+                    else:
+                        try:
+                            while wake_r.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                self._reap()
+        finally:
+            listener.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fork-server for isolated per-request predictions.")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--model-dir", default=BACKEND_DIR,
+                        help="Legacy artifact directory used when a model has no active registry version")
+    args = parser.parse_args()
+    if not hasattr(os, 'fork') or not hasattr(socket, 'recv_fds'):
+        print(json.dumps({'error': 'zygote.py needs fork() and SCM_RIGHTS (POSIX)'}))
+        return 1
+    metrics.init('zygote')
+    zygote = Zygote(args.socket, args.model_dir)
+    started = time.perf_counter()
+    summary = zygote.prepare()
+    # Children inherit the parent's library thread settings and affinity
+    summary['threads'] = runtime_config.configure()
+    summary['preload_seconds'] = round(time.perf_counter() - started, 2)
+    print(f"ZYGOTE: {json.dumps(summary)}", file=sys.stderr, flush=True)
+    try:
+        zygote.serve()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
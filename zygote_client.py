@@ -0,0 +1,73 @@
+"""
+Client shim for zygote.py with the plain-script contract:
+
+    python zygote_client.py predict_asd_risk.py '{"communication": 3, ...}'
+
+produces exactly what `python predict_asd_risk.py '{...}'` would: the script
+runs in a child forked from the zygote with this process's stdin/stdout/stderr,
+and this process exits with the child's exit code. When no zygote is listening
+(or on platforms without fork/SCM_RIGHTS) the script is executed directly, so
+callers can switch to the shim unconditionally.
+
+Kept to stdlib imports so the shim itself starts in a few milliseconds.
+"""
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+
+SOCKET_PATH = os.environ.get('ASD_ZYGOTE_SOCKET', os.path.join(tempfile.gettempdir(), 'asd_zygote.sock'))
+HEADER = struct.Struct('>I')
+
+
+def request(script, argv, fds=(0, 1, 2), socket_path=SOCKET_PATH, cwd=None):
+    """Run `script argv...` in a zygote child writing to `fds`. Returns the zygote's reply dict.
+
+    Raises OSError when no zygote is reachable (nothing has run yet in that case).
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        body = json.dumps({'script': os.path.abspath(script), 'argv': list(argv), 'cwd': cwd or os.getcwd()}).encode()
+        socket.send_fds(sock, [HEADER.pack(len(body))], list(fds))
+        sock.sendall(body)
+        reply = sock.makefile('rb').readline()
+    finally:
+        sock.close()
+    if not reply:
+        return {'started': True, 'exit_code': 1, 'error': 'Zygote closed the connection before the child finished'}
+    return json.loads(reply)
+
+
+def run_direct(script, argv):
+    args = [sys.executable, script] + list(argv)
+    if os.name == 'posix':
+        sys.stdout.flush()
+        os.execv(sys.executable, args)
+    return subprocess.call(args)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(json.dumps({'error': 'Usage: zygote_client.py <script> [args...]'}))
+        return 1
+    script, argv = sys.argv[1], sys.argv[2:]
+    if not hasattr(socket, 'send_fds') or not hasattr(socket, 'AF_UNIX'):
+        return run_direct(script, argv)
+    try:
+        reply = request(script, argv)
+    except OSError:
+        return run_direct(script, argv)
+    if not reply.get('started'):
+        print(f"ZYGOTE_CLIENT: {reply.get('error')}; running directly", file=sys.stderr)
+        return run_direct(script, argv)
+    if reply.get('error'):
+        print(f"ZYGOTE_CLIENT: {reply['error']}", file=sys.stderr)
+    return reply.get('exit_code', 1)
+
+
+if __name__ == '__main__':
+    sys.exit(main())